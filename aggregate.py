@@ -0,0 +1,220 @@
+from collections import Counter
+
+import numpy as np
+
+from scan_table import as_scan_table, mtime_years
+from sketch import SizeSketch
+
+
+# Every aggregate the reports and the JSON export need, computed once from the
+# scan columns with grouped NumPy operations. update() folds in one more table,
+# so the same object works for a whole scan or for a stream of batches; its size
+# depends on the number of extensions and years, never on the number of files.
+# Byte totals come twice: apparent (st_size) and allocated (blocks on disk, hard
+# links counted once - what du reports).
+class ScanSummary:
+    def __init__(self, top_k=20, relative_accuracy=0.01):
+        self.top_k = top_k
+        self.total_files = 0
+        self.total_size = 0
+        self.total_allocated = 0
+        self.min_size = None
+        self.max_size = None
+        self.mean_size = 0.0
+        self.m2_size = 0.0
+        self.ext_counts = {}
+        self.ext_sizes = {}
+        self.ext_allocated = {}
+        self.year_counts = {}
+        self.largest = []
+        self.sketch = SizeSketch(relative_accuracy)
+
+    def __len__(self):
+        return self.total_files
+
+    def update(self, file_data):
+        table = as_scan_table(file_data)
+        if not table:
+            return self
+
+        sizes = table.size
+        batch_mean = float(sizes.mean())
+        self._add_moments(len(table), batch_mean, float(np.square(sizes - batch_mean).sum()),
+                          int(sizes.min()), int(sizes.max()))
+        self.total_files += len(table)
+        self.total_size += int(sizes.sum())
+        self.total_allocated += int(table.allocated_or_size().sum())
+        self.sketch.add(sizes)
+
+        counts, totals, allocated = table.extension_totals(with_allocated=True)
+        for ext, count, total, alloc in zip(table.extensions, counts.tolist(), totals.tolist(), allocated.tolist()):
+            if count:
+                self.ext_counts[ext] = self.ext_counts.get(ext, 0) + count
+                self.ext_sizes[ext] = self.ext_sizes.get(ext, 0) + total
+                self.ext_allocated[ext] = self.ext_allocated.get(ext, 0) + alloc
+
+        years = mtime_years(table.mtime)
+        first_year = int(years.min())
+        for offset, count in enumerate(np.bincount(years - first_year).tolist()):
+            if count:
+                self.year_counts[first_year + offset] = self.year_counts.get(first_year + offset, 0) + count
+
+        k = min(self.top_k, len(table))
+        if k:
+            top = np.argpartition(-table.size, k - 1)[:k]
+            top = top[np.lexsort((top, -table.size[top]))]
+            self._add_largest([(int(table.size[i]), table.path(i)) for i in top.tolist()])
+        return self
+
+    def remove(self, file_data):
+        # Inverse of update() for rows that were added before. Counts, totals,
+        # moments and the sketch stay exact; removed files leave `largest`, but
+        # min_size/max_size and the refill of `largest` need the remaining rows,
+        # so the owner of those rows recomputes them when it needs them.
+        table = as_scan_table(file_data)
+        if not table:
+            return self
+
+        sizes = table.size
+        count = len(table)
+        remaining = self.total_files - count
+        if remaining > 0:
+            batch_mean = float(sizes.mean())
+            mean = (self.mean_size * self.total_files - batch_mean * count) / remaining
+            delta = batch_mean - mean
+            self.m2_size = max(self.m2_size - float(np.square(sizes - batch_mean).sum())
+                               - delta * delta * remaining * count / self.total_files, 0.0)
+            self.mean_size = mean
+        else:
+            self.mean_size = self.m2_size = 0.0
+            self.min_size = self.max_size = None
+        self.total_files = remaining
+        self.total_size -= int(sizes.sum())
+        self.total_allocated -= int(table.allocated_or_size().sum())
+        self.sketch.remove(sizes)
+
+        counts, totals, allocated = table.extension_totals(with_allocated=True)
+        for ext, count, total, alloc in zip(table.extensions, counts.tolist(), totals.tolist(), allocated.tolist()):
+            if count:
+                self.ext_counts[ext] -= count
+                self.ext_sizes[ext] -= total
+                self.ext_allocated[ext] -= alloc
+                if not self.ext_counts[ext]:
+                    del self.ext_counts[ext], self.ext_sizes[ext], self.ext_allocated[ext]
+
+        years = mtime_years(table.mtime)
+        for year, count in zip(*np.unique(years, return_counts=True)):
+            year = int(year)
+            self.year_counts[year] -= int(count)
+            if not self.year_counts[year]:
+                del self.year_counts[year]
+
+        removed = set(zip(sizes.tolist(), table.paths()))
+        self.largest = [item for item in self.largest if item not in removed]
+        return self
+
+    def merge(self, other):
+        if other.total_files:
+            self._add_moments(other.total_files, other.mean_size, other.m2_size, other.min_size, other.max_size)
+        self.total_files += other.total_files
+        self.total_size += other.total_size
+        self.total_allocated += other.total_allocated
+        self.sketch.merge(other.sketch)
+        for ext, count in other.ext_counts.items():
+            self.ext_counts[ext] = self.ext_counts.get(ext, 0) + count
+        for ext, total in other.ext_sizes.items():
+            self.ext_sizes[ext] = self.ext_sizes.get(ext, 0) + total
+        for ext, total in other.ext_allocated.items():
+            self.ext_allocated[ext] = self.ext_allocated.get(ext, 0) + total
+        for year, count in other.year_counts.items():
+            self.year_counts[year] = self.year_counts.get(year, 0) + count
+        self._add_largest(other.largest)
+        return self
+
+    def to_dict(self):
+        # Exact, mergeable form of the summary (unlike the rounded top-20 lists of
+        # the JSON export): from_dict(a.to_dict()).merge(b) equals a scan of both
+        return {
+            "top_k": self.top_k,
+            "total_files": self.total_files,
+            "total_size": self.total_size,
+            "total_allocated": self.total_allocated,
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "mean_size": self.mean_size,
+            "m2_size": self.m2_size,
+            "extensions": {ext: [self.ext_counts[ext], self.ext_sizes[ext], self.ext_allocated[ext]]
+                           for ext in self.ext_counts},
+            "year_counts": {str(year): count for year, count in sorted(self.year_counts.items())},
+            "largest": [[size, path] for size, path in self.largest],
+            "sketch": self.sketch.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = SizeSketch.from_dict(data["sketch"])
+        summary = cls(data["top_k"], sketch.relative_accuracy)
+        summary.sketch = sketch
+        summary.total_files = data["total_files"]
+        summary.total_size = data["total_size"]
+        summary.total_allocated = data["total_allocated"]
+        summary.min_size = data["min_size"]
+        summary.max_size = data["max_size"]
+        summary.mean_size = data["mean_size"]
+        summary.m2_size = data["m2_size"]
+        for ext, (count, total, allocated) in data["extensions"].items():
+            summary.ext_counts[ext] = count
+            summary.ext_sizes[ext] = total
+            summary.ext_allocated[ext] = allocated
+        summary.year_counts = {int(year): count for year, count in data["year_counts"].items()}
+        summary.largest = [(size, path) for size, path in data["largest"]]
+        return summary
+
+    def _add_moments(self, count, mean, m2, min_size, max_size):
+        # Chan et al. pairwise update: mean and sum of squared deviations of the union
+        total = self.total_files + count
+        delta = mean - self.mean_size
+        self.mean_size += delta * count / total
+        self.m2_size += m2 + delta * delta * self.total_files * count / total
+        self.min_size = min_size if self.min_size is None else min(self.min_size, min_size)
+        self.max_size = max_size if self.max_size is None else max(self.max_size, max_size)
+
+    @property
+    def std_size(self):
+        return (self.m2_size / self.total_files) ** 0.5 if self.total_files else 0.0
+
+    def _add_largest(self, candidates):
+        # Stable sort: on equal sizes the files seen first stay first
+        self.largest = sorted(self.largest + candidates, key=lambda item: item[0], reverse=True)[:self.top_k]
+
+    @property
+    def no_ext_count(self):
+        return self.ext_counts.get("", 0)
+
+    def extension_counter(self):
+        return Counter({ext: count for ext, count in self.ext_counts.items() if ext})
+
+    def extension_sizes(self):
+        ext_total = [(ext if ext else "no_ext", self.ext_sizes[ext], count) for ext, count in self.ext_counts.items()]
+        ext_total.sort(key=lambda x: x[1], reverse=True)
+        return ext_total
+
+    def extension_allocated(self):
+        # Allocated bytes per extension, keyed like extension_sizes()
+        return {ext if ext else "no_ext": total for ext, total in self.ext_allocated.items()}
+
+    def large_files(self, threshold_bytes):
+        return [{"path": path, "size": size} for size, path in self.largest if size > threshold_bytes]
+
+
+def summarize(file_data, top_k=20, relative_accuracy=0.01):
+    if isinstance(file_data, ScanSummary):
+        return file_data
+    return ScanSummary(top_k, relative_accuracy).update(file_data)
+
+
+def summarize_stream(batches, top_k=20, relative_accuracy=0.01):
+    summary = ScanSummary(top_k, relative_accuracy)
+    for batch in batches:
+        summary.update(batch)
+    return summary
@@ -1,47 +1,85 @@
 import numpy as np
 from collections import Counter
 
-def analyze_extensions(file_data, top_n=20):
-    extensions = [f["extension"] for f in file_data if f["extension"]]
-    no_ext_count = sum(1 for f in file_data if not f["extension"])
+from aggregate import ScanSummary, summarize
+from dir_tree import DirectoryTree
+from pdf_cdf import calculate_percentiles
+from scan_table import as_scan_table
 
-    ext_counter = Counter(extensions)
+def analyze_extensions(file_data, top_n=20):
+    summary = summarize(file_data)
+    ext_counter = summary.extension_counter()
 
     print(f"\n=== FILE EXTENSIONS ANALYSIS (TOP-{top_n}) ===")
     print(f"Total unique extensions: {len(ext_counter)}")
-    print(f"Files without extension: {no_ext_count}")
+    print(f"Files without extension: {summary.no_ext_count}")
     print(f"\nTop {top_n} extensions by file count:")
     for i, (ext, count) in enumerate(ext_counter.most_common(top_n), 1):
-        percentage = (count / len(file_data)) * 100
+        percentage = (count / summary.total_files) * 100
         print(f"  {i:2}. {ext:15} : {count:8} files ({percentage:5.2f}%)")
 
     return ext_counter
 
-def analyze_by_extension_size(file_data, top_n=20):
-    ext_sizes = {}
-    for f in file_data:
-        ext = f["extension"] if f["extension"] else "no_ext"
-        if ext not in ext_sizes:
-            ext_sizes[ext] = []
-        ext_sizes[ext].append(f["size"])
-
-    ext_total = [(ext, sum(sizes), len(sizes)) for ext, sizes in ext_sizes.items()]
-    ext_total.sort(key=lambda x: x[1], reverse=True)
-
-    total_size = sum(f["size"] for f in file_data)
+def analyze_by_extension_size(file_data, top_n=20, duplicates=None):
+    summary = summarize(file_data)
+    ext_total = summary.extension_sizes()
+    ext_allocated = summary.extension_allocated()
+    total_size = summary.total_size
+    reclaimable = duplicates.reclaimable_by_extension() if duplicates else None
 
     print(f"\n=== DISK USAGE BY EXTENSION (TOP-{top_n}) ===")
     for i, (ext, total, count) in enumerate(ext_total[:top_n], 1):
         percentage = (total / total_size) * 100
         avg_size = total / count
-        print(f"  {i:2}. {ext:15} : {total / (1024 * 1024 * 1024):8.2f} GB ({percentage:5.2f}%) | {count:8} files | Avg: {avg_size / 1024:8.2f} KB")
+        line = f"  {i:2}. {ext:15} : {total / (1024 * 1024 * 1024):8.2f} GB ({percentage:5.2f}%) | {count:8} files | Avg: {avg_size / 1024:8.2f} KB"
+        line += f" | Alloc: {ext_allocated.get(ext, total) / (1024 * 1024 * 1024):8.2f} GB"
+        if reclaimable is not None:
+            line += f" | Dup: {reclaimable.get(ext, 0) / (1024 * 1024 * 1024):8.2f} GB"
+        print(line)
 
     return ext_total
 
+def analyze_duplicates(duplicates, top_n=20):
+    print(f"\n=== DUPLICATE FILES (TOP-{top_n} GROUPS) ===")
+    print(f"Duplicate groups: {len(duplicates.groups)}")
+    print(f"Redundant copies: {duplicates.duplicate_files}")
+    print(f"Reclaimable:      {duplicates.reclaimable_bytes / (1024 * 1024 * 1024):.2f} GB")
+    stats = duplicates.stats
+    print(f"Hashed: {stats['partial_hashed']} partial, {stats['full_hashed']} full "
+          f"({stats['size_candidates']} size candidates, {stats['hard_links']} hard links skipped, "
+          f"{stats['cache_hits']} cache hits)")
+
+    for i, (size, rows) in enumerate(duplicates.groups[:top_n], 1):
+        wasted = duplicates.reclaimable(rows)
+        print(f"\n{i:2}. {len(rows)} copies x {size / (1024 * 1024):.2f} MB = {wasted / (1024 * 1024):.2f} MB reclaimable")
+        for row in rows:
+            print(f"      {duplicates.table.path(row)}")
+            for link in duplicates.links.get(row, ()):
+                print(f"        (hard link) {duplicates.table.path(link)}")
+
+    by_ext = sorted(duplicates.reclaimable_by_extension().items(), key=lambda x: x[1], reverse=True)
+    print(f"\nReclaimable by extension:")
+    for ext, wasted in by_ext[:top_n]:
+        print(f"  {ext:15} : {wasted / (1024 * 1024 * 1024):8.2f} GB")
+
+    return duplicates
+
+def analyze_directories(file_data, depth=1, top_n=20, drill_down=3):
+    tree = DirectoryTree(file_data)
+    total_size = int(tree.total_bytes[tree.parent < 0].sum())
+
+    print(f"\n=== HEAVIEST DIRECTORIES AT DEPTH {depth} (TOP-{top_n}) ===")
+    for i, (path, total, count, _, allocated) in enumerate(tree.top_subtrees(depth, top_n), 1):
+        percentage = (total / total_size) * 100 if total_size else 0
+        print(f"  {i:2}. {total / (1024 * 1024 * 1024):8.2f} GB ({percentage:5.2f}%) | {count:8} files | "
+              f"Alloc: {allocated / (1024 * 1024 * 1024):8.2f} GB | {path}")
+        for child_path, child_total, child_count, _, _ in tree.children(path, drill_down):
+            print(f"        {child_total / (1024 * 1024 * 1024):8.2f} GB | {child_count:8} files | {child_path}")
+
+    return tree
+
 def analyze_time_distribution(file_data):
-    dates = [f["modified_date"] for f in file_data]
-    years = [d.year for d in dates]
-    year_counter = Counter(years)
+    year_counter = Counter(summarize(file_data).year_counts)
 
     print("\n=== FILE DISTRIBUTION BY YEAR ===")
     for year in sorted(year_counter.keys()):
@@ -49,27 +87,42 @@ def analyze_time_distribution(file_data):
 
     return year_counter
 
-def calculate_statistics(file_sizes):
-    sizes = np.array(file_sizes)
+def calculate_statistics(file_sizes, mode="exact", relative_accuracy=0.01):
+    if isinstance(file_sizes, ScanSummary):
+        # Exact moments kept by the summary, percentiles read from its size sketch
+        mean, std = file_sizes.mean_size, file_sizes.std_size
+        min_size, max_size = file_sizes.min_size, file_sizes.max_size
+        percentiles = calculate_percentiles(file_sizes.sketch)
+    else:
+        sizes = np.asarray(file_sizes)
+        mean, std = np.mean(sizes), np.std(sizes)
+        min_size, max_size = np.min(sizes), np.max(sizes)
+        percentiles = calculate_percentiles(sizes, mode=mode, relative_accuracy=relative_accuracy)
 
     print("\n=== STATISTICAL SUMMARY ===")
-    print(f"Mean:   {np.mean(sizes) / 1024:.2f} KB")
-    print(f"Median: {np.median(sizes) / 1024:.2f} KB")
-    print(f"Std:    {np.std(sizes) / 1024:.2f} KB")
-    print(f"Min:    {np.min(sizes)} bytes")
-    print(f"Max:    {np.max(sizes) / (1024 * 1024):.2f} MB")
+    print(f"Mean:   {mean / 1024:.2f} KB")
+    print(f"Median: {percentiles[50] / 1024:.2f} KB")
+    print(f"Std:    {std / 1024:.2f} KB")
+    print(f"Min:    {min_size} bytes")
+    print(f"Max:    {max_size / (1024 * 1024):.2f} MB")
     print(f"\nPercentiles:")
-    print(f"  25%: {np.percentile(sizes, 25) / 1024:.2f} KB")
-    print(f"  50%: {np.percentile(sizes, 50) / 1024:.2f} KB")
-    print(f"  75%: {np.percentile(sizes, 75) / 1024:.2f} KB")
-    print(f"  90%: {np.percentile(sizes, 90) / 1024:.2f} KB")
-    print(f"  95%: {np.percentile(sizes, 95) / (1024 * 1024):.2f} MB")
-    print(f"  99%: {np.percentile(sizes, 99) / (1024 * 1024):.2f} MB")
+    print(f"  25%: {percentiles[25] / 1024:.2f} KB")
+    print(f"  50%: {percentiles[50] / 1024:.2f} KB")
+    print(f"  75%: {percentiles[75] / 1024:.2f} KB")
+    print(f"  90%: {percentiles[90] / 1024:.2f} KB")
+    print(f"  95%: {percentiles[95] / (1024 * 1024):.2f} MB")
+    print(f"  99%: {percentiles[99] / (1024 * 1024):.2f} MB")
 
 def find_large_files(file_data, threshold_mb=100):
     threshold_bytes = threshold_mb * 1024 * 1024
-    large_files = [f for f in file_data if f["size"] > threshold_bytes]
-    large_files.sort(key=lambda x: x["size"], reverse=True)
+    if isinstance(file_data, ScanSummary):
+        # A summary only keeps its top_k largest files
+        large_files = file_data.large_files(threshold_bytes)
+    else:
+        table = as_scan_table(file_data)
+        large = np.nonzero(table.size > threshold_bytes)[0]
+        large = large[np.argsort(-table.size[large], kind="stable")]
+        large_files = [table[i] for i in large.tolist()]
 
     print(f"\n=== FILES LARGER THAN {threshold_mb}MB (TOP 20) ===")
     for i, f in enumerate(large_files[:20], 1):
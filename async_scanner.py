@@ -0,0 +1,132 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from scan_table import ScanTableBuilder
+from scanner import DEFAULT_FILTER, _child_dirs, allocation
+
+
+# Thin filesystem layer so the async scanner can run against a fake, slow mount
+class LocalFilesystem:
+    def list_directory(self, dir_path):
+        files = []
+        subdirs = []
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir():
+                        if not entry.is_symlink():
+                            subdirs.append(entry.name)
+                        continue
+                except OSError:
+                    continue
+                files.append(entry.name)
+        return files, subdirs
+
+    def stat(self, path):
+        return os.stat(path)
+
+
+# Adds a fixed round-trip delay to every call, like an NFS/SMB mount would
+class LatencyFilesystem(LocalFilesystem):
+    def __init__(self, latency=0.002):
+        self.latency = latency
+
+    def list_directory(self, dir_path):
+        time.sleep(self.latency)
+        return super().list_directory(dir_path)
+
+    def stat(self, path):
+        time.sleep(self.latency)
+        return super().stat(path)
+
+
+async def scan_files_async(folder_path, concurrency=64, max_files=None, fs=None, queue_size=256, scan_filter=None):
+    # Keeps up to `concurrency` listdir/stat calls in flight on a bounded thread
+    # pool so per-call latency overlaps instead of adding up. Finished directories
+    # go through a bounded queue to a single consumer that builds the ScanTable;
+    # when it falls behind, the producers block on put() (backpressure).
+    fs = fs or LocalFilesystem()
+    scan_filter = (scan_filter or DEFAULT_FILTER).bind(folder_path)
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    in_flight = asyncio.Semaphore(concurrency)
+    dir_queue = asyncio.Queue()
+    results = asyncio.Queue(maxsize=queue_size)
+    builder = ScanTableBuilder()
+    done = asyncio.Event()
+
+    async def call(func, *args):
+        async with in_flight:
+            return await loop.run_in_executor(executor, func, *args)
+
+    async def stat_file(dir_path, name):
+        path = os.path.join(dir_path, name)
+        try:
+            st = await call(fs.stat, path)
+        except OSError:
+            return None
+        if not scan_filter.keep_stat(st.st_size, st.st_mtime):
+            return None
+        return (path, st.st_size, st.st_mtime, os.path.splitext(name)[1].lower(), *allocation(st))
+
+    async def scan_directory(dir_path):
+        try:
+            files, subdirs = await call(fs.list_directory, dir_path)
+        except OSError:
+            return
+        for child in _child_dirs(dir_path, subdirs, scan_filter):
+            dir_queue.put_nowait(child)
+        if scan_filter.filters_names:
+            files = [name for name in files if scan_filter.keep_name(dir_path, name)]
+        # Stat in slices so a huge directory does not create one task per file up front
+        step = concurrency * 4
+        await results.put((dir_path, []))
+        for start in range(0, len(files), step):
+            if done.is_set():
+                return
+            rows = await asyncio.gather(*(stat_file(dir_path, name) for name in files[start:start + step]))
+            await results.put((dir_path, [row for row in rows if row is not None]))
+
+    async def dir_worker():
+        while True:
+            dir_path = await dir_queue.get()
+            try:
+                if not done.is_set():
+                    await scan_directory(dir_path)
+            finally:
+                dir_queue.task_done()
+
+    async def consumer():
+        while True:
+            dir_path, rows = await results.get()
+            if done.is_set():
+                results.task_done()
+                continue
+            builder.enter_directory(dir_path)
+            before = len(builder)
+            for row in rows:
+                builder.append(*row)
+                if max_files and len(builder) >= max_files:
+                    done.set()
+                    break
+            if len(builder) // 5000 > before // 5000:
+                print(f"\rScanned {len(builder)} files...", end="", flush=True)
+            results.task_done()
+
+    dir_queue.put_nowait(folder_path)
+    workers = [asyncio.create_task(dir_worker()) for _ in range(concurrency)]
+    drain = asyncio.create_task(consumer())
+    try:
+        await dir_queue.join()
+        await results.join()
+    finally:
+        for task in workers + [drain]:
+            task.cancel()
+        executor.shutdown(wait=False)
+    return builder.build()
+
+
+def scan_async(folder_path, concurrency=64, max_files=None, fs=None, scan_filter=None):
+    return asyncio.run(scan_files_async(folder_path, concurrency, max_files, fs, scan_filter=scan_filter))
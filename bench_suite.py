@@ -0,0 +1,350 @@
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, peak RSS is not reported
+    resource = None
+
+import numpy as np
+
+from benchmark import quiet
+from create_test_folder import EXTENSION_MIXES, SIZE_DISTRIBUTIONS, generate_tree
+
+# Reproducible benchmark suite: a seeded generate_tree() tree, then every stage
+# of the pipeline - the scan engines, the analyze.py reports, pdf_cdf and the
+# exports - each timed in a fresh spawned process, so its peak RSS is its own
+# rather than the high-water mark of whatever ran before. Results are written
+# as a JSON baseline; --compare checks a run against one and exits non-zero on
+# regressions beyond the tolerances.
+BASELINE_FORMAT = "fsa-benchmark"
+BASELINE_VERSION = 1
+
+
+def _scan(engine):
+    def stage(folder, table, output, workers):
+        from scanner import scan_files
+        return len(scan_files(folder, engine=engine, workers=workers))
+    return stage
+
+
+def _on_table(func):
+    def stage(folder, table, output, workers):
+        func(table, output)
+        return len(table)
+    return stage
+
+
+def _summary(table, output):
+    from aggregate import summarize
+    return summarize(table)
+
+
+def _extensions(table, output):
+    from analyze import analyze_extensions
+    return analyze_extensions(table)
+
+
+def _extension_sizes(table, output):
+    from analyze import analyze_by_extension_size
+    return analyze_by_extension_size(table)
+
+
+def _statistics(table, output):
+    from analyze import calculate_statistics
+    return calculate_statistics(table.size)
+
+
+def _large_files(table, output):
+    from analyze import find_large_files
+    return find_large_files(table, threshold_mb=50)
+
+
+def _years(table, output):
+    from analyze import analyze_time_distribution
+    return analyze_time_distribution(table)
+
+
+def _directories(table, output):
+    from analyze import analyze_directories
+    return analyze_directories(table)
+
+
+def _pdf(table, output):
+    from pdf_cdf import calculate_pdf
+    return calculate_pdf(table.size)
+
+
+def _cdf(table, output):
+    from pdf_cdf import calculate_cdf
+    return calculate_cdf(table.size)
+
+
+def _percentiles(table, output):
+    from pdf_cdf import calculate_percentiles
+    return calculate_percentiles(table.size)
+
+
+def _plot_data(table, output):
+    from pdf_cdf import plot_data
+    return plot_data(table.size)
+
+
+def _export_json(table, output):
+    from export_results import export_to_json
+    return export_to_json(table, output + ".json")
+
+
+def _export_snapshot(table, output):
+    from export_results import export_to_snapshot
+    return export_to_snapshot(table, output + ".fsnap")
+
+
+STAGES = {
+    "scan.walk": _scan("walk"),
+    "scan.parallel": _scan("parallel"),
+    "scan.process": _scan("process"),
+    "analyze.summary": _on_table(_summary),
+    "analyze.extensions": _on_table(_extensions),
+    "analyze.extension_sizes": _on_table(_extension_sizes),
+    "analyze.statistics": _on_table(_statistics),
+    "analyze.large_files": _on_table(_large_files),
+    "analyze.years": _on_table(_years),
+    "analyze.directories": _on_table(_directories),
+    "pdf_cdf.pdf": _on_table(_pdf),
+    "pdf_cdf.cdf": _on_table(_cdf),
+    "pdf_cdf.percentiles": _on_table(_percentiles),
+    "pdf_cdf.plot_data": _on_table(_plot_data),
+    "export.json": _on_table(_export_json),
+    "export.snapshot": _on_table(_export_snapshot),
+}
+
+
+def _proc_status_mb(field):
+    # VmRSS (current) or VmHWM (peak) of this process, None where /proc is missing
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+
+def peak_rss_mb():
+    # VmHWM belongs to this address space. getrusage's ru_maxrss is only the
+    # fallback: Linux carries it across exec, so a spawned child would report
+    # the parent's high-water mark from the moment it forked.
+    peak = _proc_status_mb("VmHWM")
+    if peak is not None or resource is None:
+        return peak
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def reset_peak_rss():
+    # Linux: restart VmHWM from the current RSS, so setup does not count towards the stage's peak
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _load_table(snapshot_path):
+    # The scan result as an in-memory ScanTable: the snapshot is an mmap, and
+    # copying the columns keeps page faults out of the timed section
+    from scan_table import ScanTable
+    from snapshot import load_snapshot
+    _, mapped = load_snapshot(snapshot_path)
+    table = ScanTable(np.array(mapped.size), np.array(mapped.mtime), np.array(mapped.ext_code), mapped.extensions,
+                      np.array(mapped.path_pool), np.array(mapped.path_offsets),
+                      allocated=np.array(mapped.allocated) if mapped.allocated is not None else None)
+    if mapped.dir_id is not None:
+        table.dir_id = np.array(mapped.dir_id)
+        table.dir_parent = mapped.dir_parent
+        table.dir_paths = mapped.dir_paths
+    return table
+
+
+def run_stage(name, folder, snapshot_path, output, workers):
+    # Runs in its own process: setup, then the timed stage
+    # Peak RSS covers this process only: the process engine's workers are not included
+    table = _load_table(snapshot_path) if not name.startswith("scan.") else None
+    reset_peak_rss()
+    setup_rss = _proc_status_mb("VmRSS") or peak_rss_mb()
+    start = time.perf_counter()
+    rows = quiet(STAGES[name], folder, table, output, workers)
+    seconds = time.perf_counter() - start
+    peak = peak_rss_mb()
+    return {"seconds": seconds, "rows": rows, "files_per_sec": rows / seconds if seconds else None,
+            "peak_rss_mb": peak, "rss_growth_mb": peak - setup_rss if peak is not None else None}
+
+
+def measure(name, folder, snapshot_path, output, workers, repeat):
+    # Best wall time over `repeat` fresh processes; peak RSS is the largest seen
+    context = multiprocessing.get_context("spawn")
+    best = None
+    for _ in range(repeat):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+            result = pool.submit(run_stage, name, folder, snapshot_path, output, workers).result()
+        if best is None:
+            best = result
+        else:
+            if result["seconds"] < best["seconds"]:
+                best.update(seconds=result["seconds"], files_per_sec=result["files_per_sec"])
+            if result["peak_rss_mb"] is not None:
+                best["peak_rss_mb"] = max(best["peak_rss_mb"], result["peak_rss_mb"])
+                best["rss_growth_mb"] = max(best["rss_growth_mb"], result["rss_growth_mb"])
+    return best
+
+
+def select_stages(patterns):
+    # Stage names, or prefixes such as "scan" or "pdf_cdf"
+    if not patterns:
+        return list(STAGES)
+    selected = [name for name in STAGES if any(name == p or name.startswith(p + ".") for p in patterns)]
+    if not selected:
+        raise ValueError(f"No stage matches {patterns}; stages: {', '.join(STAGES)}")
+    return selected
+
+
+def environment():
+    return {"python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(),
+            "processor": platform.processor(), "cpu_count": os.cpu_count(),
+            "date": datetime.datetime.now().isoformat()}
+
+
+def run_suite(folder, stages, repeat=3, workers=None, tree=None):
+    from scanner import scan_files
+    from snapshot import save_snapshot
+
+    work_dir = tempfile.mkdtemp(prefix="fsa_suite_")
+    try:
+        # One scan shared by every table stage, handed over as a snapshot
+        snapshot_path = os.path.join(work_dir, "scan.fsnap")
+        save_snapshot(quiet(scan_files, folder), snapshot_path, {})
+        output = os.path.join(work_dir, "export")
+
+        results = {}
+        print(f"{'Stage':<26} {'Rows':>10} {'Seconds':>9} {'Files/sec':>12} {'Peak RSS MB':>12} {'Growth MB':>10}")
+        print("-" * 84)
+        for name in stages:
+            result = measure(name, folder, snapshot_path, output, workers, repeat)
+            results[name] = result
+            print(f"{name:<26} {result['rows']:>10,} {result['seconds']:>9.3f} {result['files_per_sec']:>12,.0f} "
+                  f"{_mb(result['peak_rss_mb']):>12} {_mb(result['rss_growth_mb']):>10}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    return {"format": BASELINE_FORMAT, "version": BASELINE_VERSION, "environment": environment(),
+            "tree": tree or {"path": os.path.abspath(folder)}, "repeat": repeat, "workers": workers,
+            "results": results}
+
+
+def _mb(value):
+    return "-" if value is None else f"{value:.1f}"
+
+
+def compare_baselines(baseline, current, time_tolerance=0.2, rss_tolerance=0.2, time_floor=0.01):
+    # Returns the names of the stages that regressed: slower than baseline * (1 + time_tolerance)
+    # and by more than time_floor seconds (millisecond stages are mostly noise), or with a
+    # peak RSS above baseline * (1 + rss_tolerance)
+    if baseline.get("format") != BASELINE_FORMAT:
+        raise ValueError("Not a benchmark baseline")
+    fields = ("files", "depth", "fanout", "sizes", "extensions", "seed")
+    if any(baseline["tree"].get(f) != current["tree"].get(f) for f in fields):
+        print("WARNING: the baseline was measured on a different tree; ratios are not comparable")
+
+    regressions = []
+    print(f"\n{'Stage':<26} {'Base s':>9} {'Now s':>9} {'Ratio':>7} {'Base MB':>9} {'Now MB':>9}  Status")
+    print("-" * 84)
+    for name, now in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name:<26} {'-':>9} {now['seconds']:>9.3f} {'-':>7} {'-':>9} {_mb(now['peak_rss_mb']):>9}  new")
+            continue
+        ratio = now["seconds"] / base["seconds"] if base["seconds"] else 1.0
+        slower = ratio > 1 + time_tolerance and now["seconds"] - base["seconds"] > time_floor
+        heavier = (base["peak_rss_mb"] is not None and now["peak_rss_mb"] is not None
+                   and now["peak_rss_mb"] > base["peak_rss_mb"] * (1 + rss_tolerance))
+        status = "REGRESSION" if slower or heavier else "ok"
+        if slower or heavier:
+            regressions.append(name)
+        print(f"{name:<26} {base['seconds']:>9.3f} {now['seconds']:>9.3f} {ratio:>6.2f}x "
+              f"{_mb(base['peak_rss_mb']):>9} {_mb(now['peak_rss_mb']):>9}  {status}")
+    return regressions
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Reproducible benchmark suite with JSON baselines")
+    parser.add_argument("--folder", help="Existing folder to benchmark (default: generate a seeded tree)")
+    parser.add_argument("--files", type=int, default=100000)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--fanout", type=int, default=8)
+    parser.add_argument("--sizes", choices=sorted(SIZE_DISTRIBUTIONS), default="lognormal")
+    parser.add_argument("--extensions", choices=sorted(EXTENSION_MIXES), default="desktop")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--stages", nargs="+", help=f"Stages or prefixes (default: all). Stages: {', '.join(STAGES)}")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, help="Workers for the parallel and process engines")
+    parser.add_argument("--save", metavar="PATH", help="Write the results as a JSON baseline")
+    parser.add_argument("--compare", metavar="PATH", help="Compare against a saved baseline; exit 1 on regressions")
+    parser.add_argument("--time-tolerance", type=float, default=0.2)
+    parser.add_argument("--rss-tolerance", type=float, default=0.2)
+    parser.add_argument("--time-floor", type=float, default=0.01,
+                        help="Ignore slowdowns smaller than this many seconds")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    stages = select_stages(args.stages)
+
+    tmp_dir = None
+    try:
+        if args.folder:
+            folder, tree = args.folder, None
+        else:
+            tmp_dir = tempfile.mkdtemp(prefix="fsa_suite_tree_")
+            folder = os.path.join(tmp_dir, "tree")
+            print(f"Generating {args.files:,} files (depth {args.depth}, fanout {args.fanout}, "
+                  f"{args.sizes} sizes, {args.extensions} extensions, seed {args.seed}) ...")
+            start = time.perf_counter()
+            tree = generate_tree(folder, args.files, args.depth, args.fanout, args.sizes, args.extensions, args.seed)
+            tree["generate_seconds"] = time.perf_counter() - start
+            del tree["path"]
+        print(f"\n=== BENCHMARK SUITE: {folder} (best of {args.repeat}) ===")
+        current = run_suite(folder, stages, args.repeat, args.workers, tree)
+    finally:
+        if tmp_dir:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+        print(f"\nBaseline saved to: {args.save}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            regressions = compare_baselines(json.load(f), current, args.time_tolerance,
+                                            args.rss_tolerance, args.time_floor)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+            return 1
+        print("\nNo regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,594 @@
+import argparse
+import contextlib
+import functools
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from aggregate import summarize
+from async_scanner import LatencyFilesystem, scan_async
+from create_test_folder import create_test_folder
+from scan_filter import ScanFilter
+from scan_table import ScanTable
+from scanner import scan_files
+
+
+def quiet(func, *args, **kwargs):
+    with contextlib.redirect_stdout(io.StringIO()):
+        return func(*args, **kwargs)
+
+
+def best_time(func, *args, repeat=3, **kwargs):
+    best = None
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = quiet(func, *args, **kwargs)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def build_test_tree(base_path, trees, files_per_tree):
+    for i in range(trees):
+        quiet(create_test_folder, os.path.join(base_path, f"tree_{i:03d}"), files_per_tree, sparse=True, seed=i)
+    return base_path
+
+
+def bench_scan(folder, repeat, worker_counts):
+    print(f"\n=== SCAN ENGINES: {folder} (best of {repeat}) ===")
+    print(f"{'Engine':<20} {'Files':>10} {'Seconds':>10} {'Files/sec':>12} {'Speedup':>9}")
+    print("-" * 65)
+
+    configs = [("walk", None)] + [("parallel", w) for w in worker_counts]
+    baseline = None
+    for engine, workers in configs:
+        elapsed, file_data = best_time(scan_files, folder, repeat=repeat, engine=engine, workers=workers)
+        baseline = baseline or elapsed
+        label = engine if workers is None else f"{engine} x{workers}"
+        print(f"{label:<20} {len(file_data):>10,} {elapsed:>10.3f} {len(file_data) / elapsed:>12,.0f} {baseline / elapsed:>8.2f}x")
+
+
+def bench_process_scaling(folder, repeat, worker_counts):
+    print(f"\n=== PROCESS ENGINE SCALING: {folder} (best of {repeat}) ===")
+    print(f"{'Workers':>8} {'Files':>10} {'Seconds':>10} {'Files/sec':>12} {'Speedup':>9} {'Efficiency':>11}")
+    print("-" * 65)
+
+    baseline = None
+    for workers in worker_counts:
+        elapsed, file_data = best_time(scan_files, folder, repeat=repeat, engine="process", workers=workers)
+        baseline = baseline or elapsed * worker_counts[0]
+        speedup = baseline / elapsed
+        print(f"{workers:>8} {len(file_data):>10,} {elapsed:>10.3f} {len(file_data) / elapsed:>12,.0f} "
+              f"{speedup:>8.2f}x {speedup / workers * 100:>10.0f}%")
+
+
+def bench_latency(folder, repeat, concurrency_levels, latency_ms):
+    # Concurrency 1 issues one call at a time, like the blocking scanners on a remote mount
+    fs = LatencyFilesystem(latency_ms / 1000)
+    print(f"\n=== ASYNC ENGINE, {latency_ms} ms PER CALL: {folder} (best of {repeat}) ===")
+    print(f"{'In flight':>10} {'Files':>10} {'Seconds':>10} {'Files/sec':>12} {'Speedup':>9}")
+    print("-" * 55)
+
+    baseline = None
+    for concurrency in concurrency_levels:
+        elapsed, file_data = best_time(scan_async, folder, concurrency, repeat=repeat, fs=fs)
+        baseline = baseline or elapsed
+        print(f"{concurrency:>10} {len(file_data):>10,} {elapsed:>10.3f} {len(file_data) / elapsed:>12,.0f} {baseline / elapsed:>8.2f}x")
+
+
+def build_filter_tree(base_path, kept_trees, excluded_trees, files_per_tree):
+    # Most of the data sits under build_cache/, which the benchmark filter excludes
+    build_test_tree(os.path.join(base_path, "src"), kept_trees, files_per_tree)
+    build_test_tree(os.path.join(base_path, "build_cache"), excluded_trees, files_per_tree)
+    return base_path
+
+
+FILTER_EXCLUDE = ["build_cache", "*.iso", "*.mkv", "*.avi"]
+
+
+def post_filter(file_data, exclude=FILTER_EXCLUDE):
+    # What filtering looked like before: catalog everything, then drop rows afterwards
+    patterns = [p for p in exclude if not p.startswith("*")]
+    extensions = {p[1:] for p in exclude if p.startswith("*")}
+    keep = [i for i, path in enumerate(file_data.paths())
+            if file_data.extension(i) not in extensions
+            and not any(os.sep + p + os.sep in path for p in patterns)]
+    return file_data.take(keep)
+
+
+def bench_filter(folder, repeat, worker_counts):
+    scan_filter = ScanFilter(exclude=FILTER_EXCLUDE)
+    print(f"\n=== FILTER PUSHDOWN: {folder} (best of {repeat}) ===")
+    print(f"Exclude: {', '.join(FILTER_EXCLUDE)}")
+    print(f"{'Method':<28} {'Files kept':>11} {'Seconds':>10} {'Speedup':>9}")
+    print("-" * 61)
+
+    baseline, file_data = best_time(lambda: post_filter(scan_files(folder)), repeat=repeat)
+    print(f"{'walk + post-filter':<28} {len(file_data):>11,} {baseline:>10.3f} {1:>8.2f}x")
+    configs = [("walk", None)] + [("parallel", w) for w in worker_counts]
+    for engine, workers in configs:
+        elapsed, file_data = best_time(scan_files, folder, repeat=repeat, engine=engine, workers=workers,
+                                       scan_filter=scan_filter)
+        label = f"{engine} + pushdown" if workers is None else f"{engine} x{workers} + pushdown"
+        print(f"{label:<28} {len(file_data):>11,} {elapsed:>10.3f} {baseline / elapsed:>8.2f}x")
+
+
+def mutate_tree(root, step, rng):
+    # One round of the kinds of changes a watcher has to follow
+    subdirs = sorted(d for d in os.listdir(root) if os.path.isdir(os.path.join(root, d)))
+    target = os.path.join(root, subdirs[step % len(subdirs)])
+    for i in range(200):
+        with open(os.path.join(target, f"new_{step}_{i}.dat"), "wb") as f:
+            f.truncate(int(rng.integers(0, 10 ** 6)))
+    files = sorted(os.listdir(target))
+    for name in files[:20]:
+        path = os.path.join(target, name)
+        if os.path.isfile(path):
+            os.truncate(path, int(rng.integers(0, 10 ** 6)))
+    for name in files[20:40]:
+        path = os.path.join(target, name)
+        if os.path.isfile(path):
+            os.remove(path)
+    moved = os.path.join(root, f"moved_{step}")
+    os.makedirs(os.path.join(moved, "nested"))
+    with open(os.path.join(moved, "nested", "file.bin"), "wb") as f:
+        f.truncate(4096)
+    os.rename(moved, moved + "_renamed")
+
+
+def bench_watch(trees, files, rounds, seed=0):
+    from watcher import Watcher
+    tmp_dir = tempfile.mkdtemp(prefix="fsa_watch_")
+    rng = np.random.default_rng(seed)
+    try:
+        print(f"Generating {trees} x {files} files in {tmp_dir} ...")
+        build_test_tree(tmp_dir, trees, files)
+        root = os.path.join(tmp_dir, "tree_000")
+        start = time.perf_counter()
+        watcher = quiet(Watcher, root)
+        print(f"\n=== WATCH MODE: {root} ===")
+        print(f"Seed scan + watches: {time.perf_counter() - start:.3f}s for {len(watcher.index):,} files")
+        print(f"{'Round':>6} {'Events':>8} {'Apply (ms)':>11} {'Rescan (ms)':>12} {'Consistent':>11}")
+        print("-" * 52)
+        for step in range(rounds):
+            events_before = watcher.stats["events"]
+            mutate_tree(root, step, rng)
+            applied = 0.0
+            while True:
+                start = time.perf_counter()
+                if not watcher.poll(0.1):
+                    break
+                watcher.index.current_summary()
+                applied += time.perf_counter() - start
+            rescan_time, fresh = best_time(scan_files, root, repeat=1)
+            live = watcher.index.table()
+            consistent = sorted(zip(live.paths(), live.size.tolist())) == sorted(zip(fresh.paths(), fresh.size.tolist()))
+            print(f"{step + 1:>6} {watcher.stats['events'] - events_before:>8,} {applied * 1000:>11.1f} "
+                  f"{rescan_time * 1000:>12.1f} {str(consistent):>11}")
+        watcher.close()
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def bench_checkpoint(folder, repeat, intervals, kill_after=0.5):
+    checkpoint_path = os.path.join(tempfile.gettempdir(), f"fsa_bench_{os.getpid()}.ckpt")
+    print(f"\n=== CHECKPOINTED SCAN: {folder} (best of {repeat}) ===")
+    print(f"{'Interval (s)':<14} {'Files':>10} {'Seconds':>10} {'Overhead':>9}")
+    print("-" * 46)
+    # Same crawler with an interval that never elapses, so no record is written
+    baseline, reference = best_time(scan_files, folder, repeat=repeat, checkpoint_path=checkpoint_path,
+                                    checkpoint_interval=float("inf"))
+    print(f"{'never':<14} {len(reference):>10,} {baseline:>10.3f} {'-':>9}")
+    for interval in intervals:
+        elapsed, file_data = best_time(scan_files, folder, repeat=repeat, checkpoint_path=checkpoint_path,
+                                       checkpoint_interval=interval)
+        print(f"{interval:<14g} {len(file_data):>10,} {elapsed:>10.3f} {(elapsed / baseline - 1) * 100:>8.1f}%")
+
+    # Kill a checkpointed scan in a child process, then resume it here
+    code = (f"import sys; sys.path.insert(0, {os.path.dirname(os.path.abspath(__file__))!r}); "
+            f"from scanner import scan_files; "
+            f"scan_files({folder!r}, checkpoint_path={checkpoint_path!r}, checkpoint_interval={min(intervals)!r})")
+    child = subprocess.Popen([sys.executable, "-c", code], stdout=subprocess.DEVNULL)
+    time.sleep(kill_after)
+    child.kill()
+    child.wait()
+    if not os.path.exists(checkpoint_path):
+        print(f"\nScan finished before the kill at {kill_after}s; nothing to resume")
+        return
+    start = time.perf_counter()
+    resumed = quiet(scan_files, folder, checkpoint_path=checkpoint_path, resume=True)
+    elapsed = time.perf_counter() - start
+    paths = list(resumed.paths())
+    consistent = len(set(paths)) == len(paths) and sorted(paths) == sorted(reference.paths())
+    print(f"\nKilled after {kill_after}s, resumed in {elapsed:.3f}s: {len(resumed):,} files, "
+          f"no duplicates or gaps: {consistent}")
+
+
+def bench_sample(folder, repeat, target_error=0.05):
+    from pdf_cdf import calculate_percentiles
+    from sampling import sample_scan
+    print(f"\n=== SAMPLING SCAN: {folder} (full scan best of {repeat}) ===")
+    full_time, file_data = best_time(scan_files, folder, repeat=repeat)
+    start = time.perf_counter()
+    estimate = quiet(sample_scan, folder, target_error=target_error, seed=0)
+    sample_time = time.perf_counter() - start
+    print(f"Full scan: {full_time:.3f}s for {len(file_data):,} files | sampling: {sample_time:.3f}s, "
+          f"{estimate.probes:,} probes, {estimate.files_seen:,} files read ({full_time / sample_time:.1f}x faster)")
+
+    sizes = np.sort(file_data.size)
+    percentiles = calculate_percentiles(sizes)
+    exact = [("Total bytes", sizes.sum(), estimate.total_bytes),
+             ("Total files", len(sizes), estimate.total_files),
+             ("CDF(100KB)", (sizes <= estimate.threshold).mean(), estimate.cdf_threshold),
+             ("Top 10% share", sizes[len(sizes) - len(sizes) // 10:].sum() / sizes.sum(), estimate.top_share)]
+    exact += [(f"P{q}", percentiles[q], estimate.percentiles[q]) for q in (50, 90, 99)]
+    print(f"{'Statistic':<14} {'Exact':>16} {'Estimate':>16} {'95% interval':>35} {'Covered':>8}")
+    print("-" * 93)
+    for name, value, (guess, low, high) in exact:
+        print(f"{name:<14} {value:>16,.4g} {guess:>16,.4g} {f'[{low:,.4g} - {high:,.4g}]':>35} {str(low <= value <= high):>8}")
+
+
+def bench_metrics(folder, repeat, worker_counts):
+    import metrics
+    print(f"\n=== INSTRUMENTATION OVERHEAD: {folder} (best of {repeat}) ===")
+    print(f"{'Engine':<20} {'Off (s)':>10} {'On (s)':>10} {'Overhead':>10} {'Dirs':>8} {'Stat calls':>11}")
+    print("-" * 74)
+    for engine, workers in [("walk", None)] + [("parallel", w) for w in worker_counts]:
+        off_time, _ = best_time(scan_files, folder, repeat=repeat, engine=engine, workers=workers)
+        on_time = None
+        for _ in range(repeat):
+            with metrics.Metrics() as recorder:
+                elapsed, _ = best_time(scan_files, folder, repeat=1, engine=engine, workers=workers)
+            on_time = elapsed if on_time is None else min(on_time, elapsed)
+        label = engine if workers is None else f"{engine} x{workers}"
+        print(f"{label:<20} {off_time:>10.3f} {on_time:>10.3f} {(on_time / off_time - 1) * 100:>9.1f}% "
+              f"{recorder.dirs:>8,} {recorder.stat_calls:>11,}")
+
+
+STARTUP_HEAVY_MODULES = ("numpy", "matplotlib")
+
+
+def run_seconds(command, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def imported_modules(command):
+    # Top-level packages a command imports, from CPython's -X importtime log
+    result = subprocess.run([command[0], "-X", "importtime"] + command[1:], capture_output=True, text=True)
+    return {line.rsplit("|", 1)[1].strip().split(".")[0] for line in result.stderr.splitlines()
+            if line.startswith("import time:") and "|" in line}
+
+
+def bench_startup(folder, repeat):
+    main_py = os.path.join(os.path.dirname(os.path.abspath(__file__)), "main.py")
+    output = os.path.join(tempfile.gettempdir(), f"fsa_startup_{os.getpid()}")
+    python = sys.executable
+    commands = [
+        ("interpreter only", [python, "-c", "pass"]),
+        ("main.py --help", [python, main_py, "--help"]),
+        ("scan, questions, no export", [python, main_py, folder, "--analyses", "questions", "--format", "none"]),
+        ("scan, reports, JSON export", [python, main_py, folder, "--analyses", "questions", "stats", "extensions",
+                                        "sizes", "large", "directories", "years", "--output", output]),
+        ("eager numpy + matplotlib", [python, "-c", "import numpy, matplotlib.pyplot"]),
+    ]
+    print(f"\n=== STARTUP TIME: {folder} (best of {repeat}) ===")
+    print(f"{'Command':<30} {'ms':>9}  Heavy modules imported")
+    print("-" * 70)
+    for label, command in commands:
+        elapsed = run_seconds(command, repeat)
+        heavy = sorted(imported_modules(command) & set(STARTUP_HEAVY_MODULES))
+        print(f"{label:<30} {elapsed * 1000:>9.1f}  {', '.join(heavy) or '-'}")
+    if os.path.exists(output + ".json"):
+        os.remove(output + ".json")
+
+
+def default_worker_counts():
+    counts = [1]
+    while counts[-1] * 2 <= max(os.cpu_count() or 1, 8):
+        counts.append(counts[-1] * 2)
+    return counts
+
+
+SYNTHETIC_EXTENSIONS = ['.txt', '.pdf', '.docx', '.jpg', '.png', '.psd', '.tga', '.dds', '.mp4', '.mov',
+                        '.wav', '.ogg', '.mp3', '.fbx', '.obj', '.blend', '.zip', '.pak', '.exe', '.dll',
+                        '.py', '.cpp', '.h', '.cs', '.json', '.xml', '.ini', '.log', '.bin', '']
+
+
+def synthetic_table(rows, seed=0):
+    # A ScanTable with realistic-looking columns, built without touching the disk
+    rng = np.random.default_rng(seed)
+    size = rng.lognormal(10, 2.5, rows).astype(np.int64)
+    mtime = time.time() - rng.uniform(0, 5 * 365 * 86400, rows)
+    ext_code = rng.integers(0, len(SYNTHETIC_EXTENSIONS), rows).astype(np.int32)
+
+    prefix = np.frombuffer(b"/synthetic/file_", dtype=np.uint8)
+    width = 10
+    names = np.empty((rows, len(prefix) + width), dtype=np.uint8)
+    names[:, :len(prefix)] = prefix
+    ids = np.arange(rows, dtype=np.int64)
+    for col in range(width):
+        names[:, len(prefix) + width - 1 - col] = 48 + (ids // 10 ** col) % 10
+    offsets = np.arange(rows + 1, dtype=np.int64) * names.shape[1]
+    return ScanTable(size, mtime, ext_code, list(SYNTHETIC_EXTENSIONS), names.reshape(-1), offsets)
+
+
+def legacy_analysis(file_data, threshold_mb=50):
+    # The per-function loops analyze.py and export_results.py used over a list of dicts
+    ext_counter = Counter(f["extension"] for f in file_data if f["extension"])
+    no_ext_count = sum(1 for f in file_data if not f["extension"])
+    ext_sizes = {}
+    for f in file_data:
+        ext = f["extension"] if f["extension"] else "no_ext"
+        ext_sizes.setdefault(ext, []).append(f["size"])
+    ext_total = sorted(((ext, sum(sizes), len(sizes)) for ext, sizes in ext_sizes.items()),
+                       key=lambda x: x[1], reverse=True)
+    total_size = sum(f["size"] for f in file_data)
+    year_counter = Counter(f["modified_date"].year for f in file_data)
+    large_files = sorted((f for f in file_data if f["size"] > threshold_mb * 1024 * 1024),
+                         key=lambda x: x["size"], reverse=True)
+    export_sizes = {}
+    for f in file_data:
+        ext = f["extension"] if f["extension"] else "no_ext"
+        entry = export_sizes.setdefault(ext, {"total_size": 0, "count": 0})
+        entry["total_size"] += f["size"]
+        entry["count"] += 1
+    return ext_counter, no_ext_count, ext_total, total_size, year_counter, large_files, export_sizes
+
+
+def bench_analysis(row_counts, repeat, legacy_max_rows):
+    print(f"\n=== ANALYTICS ENGINE (best of {repeat}) ===")
+    print(f"{'Rows':>12} {'Legacy (s)':>12} {'Summary (s)':>12} {'Speedup':>9}")
+    print("-" * 48)
+
+    for rows in row_counts:
+        table = synthetic_table(rows)
+        new_time, _ = best_time(summarize, table, repeat=repeat)
+        if rows <= legacy_max_rows:
+            records = [dict(row) for row in table]
+            legacy_time, _ = best_time(legacy_analysis, records, repeat=repeat)
+            del records
+            print(f"{rows:>12,} {legacy_time:>12.3f} {new_time:>12.3f} {legacy_time / new_time:>8.1f}x")
+        else:
+            print(f"{rows:>12,} {'skipped':>12} {new_time:>12.3f} {'-':>9}")
+
+
+def legacy_render(sizes, output):
+    # The old pipeline: every sorted size handed to matplotlib, linear bins reused on the log axis
+    from pdf_cdf import calculate_cdf, calculate_pdf
+    from plotter import plot_both, plot_size_distribution_log
+    counts, bins = calculate_pdf(sizes)
+    sorted_sizes, cdf = calculate_cdf(sizes)
+    plot_both(counts, bins, sorted_sizes, cdf, output=output + "_pdf_cdf.png")
+    plot_size_distribution_log(counts, bins, sorted_sizes, cdf, output=output + "_log.png")
+
+
+def bench_plots(row_counts, repeat, legacy_max_rows):
+    from pdf_cdf import plot_data
+    from plotter import render_plots
+    out_dir = tempfile.mkdtemp(prefix="fsa_plots_")
+    print(f"\n=== HEADLESS PLOTTING, PNG (best of {repeat}) ===")
+    print(f"{'Rows':>12} {'Full array (s)':>15} {'Binned (s)':>11} {'  of which binning':>19} {'Speedup':>9}")
+    print("-" * 72)
+    try:
+        for rows in row_counts:
+            sizes = synthetic_table(rows).size
+            output = os.path.join(out_dir, str(rows))
+            bin_time, data = best_time(plot_data, sizes, repeat=repeat)
+            new_time, _ = best_time(render_plots, data, output, repeat=repeat)
+            new_time += bin_time
+            if rows <= legacy_max_rows:
+                legacy_time, _ = best_time(legacy_render, sizes, output + "_legacy", repeat=repeat)
+                print(f"{rows:>12,} {legacy_time:>15.3f} {new_time:>11.3f} {bin_time:>19.3f} {legacy_time / new_time:>8.1f}x")
+            else:
+                print(f"{rows:>12,} {'skipped':>15} {new_time:>11.3f} {bin_time:>19.3f} {'-':>9}")
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+SERVER_QUERIES = [("extensions", {"top": "20"}), ("percentiles", {"q": "50,90,99"}),
+                  ("large", {"top": "20"}), ("cdf", {"size": "100KB"})]
+
+
+def http_get(address, path):
+    import http.client
+    connection = http.client.HTTPConnection(*address)
+    try:
+        connection.request("GET", path)
+        response = connection.getresponse()
+        return response.status, response.read()
+    finally:
+        connection.close()
+
+
+def load_clients(address, requests, clients):
+    # (seconds, statuses) for `clients` threads issuing the requests concurrently
+    from concurrent.futures import ThreadPoolExecutor
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        statuses = list(pool.map(lambda url: http_get(address, url)[0], requests))
+    return time.perf_counter() - start, statuses
+
+
+def bench_server(row_counts, repeat, clients, hits=200):
+    # A cold process that opens the snapshot and answers one query, against the
+    # query server answering it for the first time (miss) and from its cache (hit)
+    from urllib.parse import urlencode
+    from query_server import QueryService, ResultCache, make_server
+    from snapshot import save_snapshot
+    here = os.path.dirname(os.path.abspath(__file__))
+    out_dir = tempfile.mkdtemp(prefix="fsa_server_")
+    print(f"\n=== QUERY SERVER vs COLD PROCESS (best of {repeat}; hits: median of {hits}) ===")
+    print(f"{'Rows':>12} {'Query':<12} {'Cold (ms)':>10} {'Miss (ms)':>10} {'Hit (ms)':>9} {'Speedup':>9}")
+    print("-" * 67)
+    try:
+        for rows in row_counts:
+            path = os.path.join(out_dir, f"synthetic_{rows}.fsnap")
+            save_snapshot(synthetic_table(rows), path, {}, root="/synthetic")
+            service = QueryService({"s": path})
+            server = make_server(service, port=0, workers=max(clients, 1))
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            address = server.server_address
+            try:
+                http_get(address, "/summary")  # maps the snapshot in
+                for kind, params in SERVER_QUERIES:
+                    url = f"/{kind}?{urlencode(params)}"
+                    code = (f"import sys; sys.path.insert(0, {here!r}); from query_server import QueryService; "
+                            f"QueryService({{'s': {path!r}}}).handle({kind!r}, {params!r})")
+                    cold = run_seconds([sys.executable, "-c", code], repeat)
+                    miss = None
+                    for _ in range(repeat):
+                        service.cache = ResultCache(service.cache.budget_bytes)
+                        start = time.perf_counter()
+                        http_get(address, url)
+                        elapsed = time.perf_counter() - start
+                        miss = elapsed if miss is None else min(miss, elapsed)
+                    times = []
+                    for _ in range(hits):
+                        start = time.perf_counter()
+                        http_get(address, url)
+                        times.append(time.perf_counter() - start)
+                    hit = sorted(times)[len(times) // 2]
+                    print(f"{rows:>12,} {kind:<12} {cold * 1000:>10.1f} {miss * 1000:>10.2f} {hit * 1000:>9.3f} "
+                          f"{cold / hit:>8.0f}x")
+
+                urls = [f"/{kind}?{urlencode(params)}" for kind, params in SERVER_QUERIES]
+                requests = [urls[i % len(urls)] for i in range(clients * 100)]
+                for url in urls:
+                    http_get(address, url)  # the miss runs above reset the cache
+                # Clients run in another process so they do not compete with the server for the GIL
+                with ProcessPoolExecutor(max_workers=1) as pool:
+                    elapsed, statuses = pool.submit(load_clients, address, requests, clients).result()
+                print(f"{'':>12} {clients} concurrent clients: {len(requests) / elapsed:,.0f} cached requests/sec, "
+                      f"{sum(status == 200 for status in statuses)}/{len(statuses)} OK")
+            finally:
+                server.shutdown()
+                server.server_close()
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks for the file system analyzer")
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--repeat", type=int, default=3)
+    commands = parser.add_subparsers(dest="command")
+
+    scan_parser = commands.add_parser("scan", parents=[common], help="Compare scan engines (default)")
+    scan_parser.add_argument("--folder", help="Existing folder to scan (default: generate a test tree)")
+    scan_parser.add_argument("--trees", type=int, default=20, help="Number of create_test_folder trees to generate")
+    scan_parser.add_argument("--files", type=int, default=2000, help="Files per generated tree")
+    scan_parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8], help="Worker counts for the parallel engine")
+
+    scaling_parser = commands.add_parser("scaling", parents=[common], help="Process engine scaling curve from 1 to N workers")
+    scaling_parser.add_argument("--folder", help="Existing folder to scan (default: generate a test tree)")
+    scaling_parser.add_argument("--trees", type=int, default=20, help="Number of create_test_folder trees to generate")
+    scaling_parser.add_argument("--files", type=int, default=2000, help="Files per generated tree")
+    scaling_parser.add_argument("--workers", type=int, nargs="+", default=default_worker_counts())
+
+    latency_parser = commands.add_parser("latency", parents=[common], help="Async engine on a latency-injecting fake filesystem")
+    latency_parser.add_argument("--folder", help="Existing folder to scan (default: generate a test tree)")
+    latency_parser.add_argument("--trees", type=int, default=2, help="Number of create_test_folder trees to generate")
+    latency_parser.add_argument("--files", type=int, default=500, help="Files per generated tree")
+    latency_parser.add_argument("--latency-ms", type=float, default=2.0, help="Injected delay per listdir/stat call")
+    latency_parser.add_argument("--workers", type=int, nargs="+", default=[1, 8, 32, 128], help="Calls kept in flight")
+
+    filter_parser = commands.add_parser("filter", parents=[common], help="Filter pushdown vs scanning everything and filtering afterwards")
+    filter_parser.add_argument("--folder", help="Existing folder to scan (default: generate a test tree)")
+    filter_parser.add_argument("--trees", type=int, default=2, help="Generated trees that are kept")
+    filter_parser.add_argument("--excluded-trees", type=int, default=18, help="Generated trees under the excluded build_cache/")
+    filter_parser.add_argument("--files", type=int, default=2000, help="Files per generated tree")
+    filter_parser.add_argument("--workers", type=int, nargs="+", default=[4], help="Worker counts for the parallel engine")
+
+    watch_parser = commands.add_parser("watch", parents=[common], help="Watch mode on a generated tree mutated by a script, checked against rescans")
+    watch_parser.add_argument("--trees", type=int, default=1, help="Number of create_test_folder trees to generate")
+    watch_parser.add_argument("--files", type=int, default=20000, help="Files per generated tree")
+    watch_parser.add_argument("--rounds", type=int, default=5, help="Mutation rounds")
+
+    checkpoint_parser = commands.add_parser("checkpoint", parents=[common], help="Checkpointing overhead, and resuming a killed scan")
+    checkpoint_parser.add_argument("--folder", help="Existing folder to scan (default: generate a test tree)")
+    checkpoint_parser.add_argument("--trees", type=int, default=20, help="Number of create_test_folder trees to generate")
+    checkpoint_parser.add_argument("--files", type=int, default=2000, help="Files per generated tree")
+    checkpoint_parser.add_argument("--intervals", type=float, nargs="+", default=[1.0, 0.1, 0.01],
+                                   help="Seconds between checkpoints")
+
+    sample_parser = commands.add_parser("sample", parents=[common], help="Sampling scan estimates vs the exact full scan")
+    sample_parser.add_argument("--folder", help="Existing folder to scan (default: generate a test tree)")
+    sample_parser.add_argument("--trees", type=int, default=200, help="Number of create_test_folder trees to generate")
+    sample_parser.add_argument("--files", type=int, default=1000, help="Files per generated tree")
+    sample_parser.add_argument("--target-error", type=float, default=0.05)
+
+    metrics_parser = commands.add_parser("metrics", parents=[common], help="Scan time with the metrics recorder off and on")
+    metrics_parser.add_argument("--folder", help="Existing folder to scan (default: generate a test tree)")
+    metrics_parser.add_argument("--trees", type=int, default=20, help="Number of create_test_folder trees to generate")
+    metrics_parser.add_argument("--files", type=int, default=2000, help="Files per generated tree")
+    metrics_parser.add_argument("--workers", type=int, nargs="+", default=[4], help="Worker counts for the parallel engine")
+
+    startup_parser = commands.add_parser("startup", parents=[common], help="main.py start-up time and which heavy modules each run imports")
+    startup_parser.add_argument("--folder", help="Existing folder to scan (default: generate a small test tree)")
+    startup_parser.add_argument("--trees", type=int, default=1, help="Number of create_test_folder trees to generate")
+    startup_parser.add_argument("--files", type=int, default=200, help="Files per generated tree")
+
+    analysis_parser = commands.add_parser("analysis", parents=[common], help="Legacy per-function loops vs the single-pass ScanSummary")
+    analysis_parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    analysis_parser.add_argument("--legacy-max-rows", type=int, default=2_000_000,
+                                 help="Skip the list-of-dicts baseline above this many rows (it needs ~1 GB per million)")
+
+    plots_parser = commands.add_parser("plots", parents=[common], help="Full-array plotting vs pre-binned headless rendering")
+    plots_parser.add_argument("--rows", type=int, nargs="+", default=[100_000, 1_000_000, 10_000_000])
+    plots_parser.add_argument("--legacy-max-rows", type=int, default=1_000_000,
+                              help="Skip the full-array baseline above this many rows (it takes minutes at 10M)")
+
+    server_parser = commands.add_parser("server", parents=[common], help="Query server (cache miss and hit) vs a cold process per query")
+    server_parser.add_argument("--rows", type=int, nargs="+", default=[1_000_000, 10_000_000])
+    server_parser.add_argument("--clients", type=int, default=8, help="Concurrent clients for the throughput run")
+
+    argv = sys.argv[1:]
+    if not argv or argv[0] not in commands.choices and argv[0] not in ("-h", "--help"):
+        argv = ["scan"] + argv
+    args = parser.parse_args(argv)
+
+    if args.command == "analysis":
+        bench_analysis(args.rows, args.repeat, args.legacy_max_rows)
+    elif args.command == "plots":
+        bench_plots(args.rows, args.repeat, args.legacy_max_rows)
+    elif args.command == "server":
+        bench_server(args.rows, args.repeat, args.clients)
+    elif args.command == "watch":
+        bench_watch(args.trees, args.files, args.rounds)
+    else:
+        benches = {"scan": bench_scan, "scaling": bench_process_scaling, "filter": bench_filter, "metrics": bench_metrics,
+                   "checkpoint": lambda folder, repeat, _: bench_checkpoint(folder, repeat, args.intervals),
+                   "sample": lambda folder, repeat, _: bench_sample(folder, repeat, args.target_error),
+                   "startup": lambda folder, repeat, _: bench_startup(folder, repeat),
+                   "latency": functools.partial(bench_latency, latency_ms=getattr(args, "latency_ms", None))}
+        bench = benches[args.command]
+        if args.folder:
+            bench(args.folder, args.repeat, getattr(args, "workers", None))
+        else:
+            tmp_dir = tempfile.mkdtemp(prefix="fsa_bench_")
+            try:
+                if args.command == "filter":
+                    print(f"Generating {args.trees} kept + {args.excluded_trees} excluded x {args.files} files in {tmp_dir} ...")
+                    build_filter_tree(tmp_dir, args.trees, args.excluded_trees, args.files)
+                else:
+                    print(f"Generating {args.trees} x {args.files} files in {tmp_dir} ...")
+                    build_test_tree(tmp_dir, args.trees, args.files)
+                bench(tmp_dir, args.repeat, getattr(args, "workers", None))
+            finally:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -0,0 +1,119 @@
+import json
+import os
+import struct
+import zlib
+
+import numpy as np
+
+from scan_table import ScanTable
+
+# Append-only scan checkpoint: a sequence of CRC-framed records
+#   4-byte kind | uint32 payload length | uint32 crc32(payload) | payload
+# The first record (HEAD) names the scan root. Every later record (PART) holds
+# the directories completed since the previous one as ScanTable columns, plus
+# the pending-directory frontier at that moment and the hard-linked inodes
+# counted so far (so a resumed scan does not count them again). Nothing is ever rewritten, so
+# a checkpoint costs one sequential write and one fsync; a record torn by a
+# crash fails its length or CRC check and is cut off when the file is resumed.
+FORMAT = "fsa-scan-checkpoint"
+RECORD = struct.Struct("<4sII")
+META_LENGTH = struct.Struct("<I")
+PART_COLUMNS = ("size", "mtime", "ext_code", "path_pool", "path_offsets", "dir_id", "dir_parent", "allocated")
+
+
+def _records(f):
+    # (kind, payload, end offset) for every intact record, stopping at the first torn one
+    offset = 0
+    while True:
+        frame = f.read(RECORD.size)
+        if len(frame) < RECORD.size:
+            return
+        kind, length, crc = RECORD.unpack(frame)
+        payload = f.read(length)
+        if len(payload) < length or zlib.crc32(payload) != crc:
+            return
+        offset += RECORD.size + length
+        yield kind, payload, offset
+
+
+def _encode_part(table, frontier, links):
+    columns = [np.ascontiguousarray(getattr(table, name)) for name in PART_COLUMNS]
+    meta = json.dumps({"extensions": table.extensions, "dir_paths": table.dir_paths, "frontier": frontier,
+                       "links": [[dev, ino] for dev, ino, _ in links],
+                       "columns": [[arr.dtype.str, len(arr)] for arr in columns]}).encode("utf-8")
+    return b"".join([META_LENGTH.pack(len(meta)), meta] + [arr.tobytes() for arr in columns])
+
+
+def _decode_part(payload):
+    (length,) = META_LENGTH.unpack_from(payload)
+    meta = json.loads(payload[META_LENGTH.size:META_LENGTH.size + length].decode("utf-8"))
+    offset = META_LENGTH.size + length
+    columns = []
+    for dtype, count in meta["columns"]:
+        dtype = np.dtype(dtype)
+        columns.append(np.frombuffer(payload, dtype=dtype, count=count, offset=offset))
+        offset += count * dtype.itemsize
+    size, mtime, ext_code, path_pool, path_offsets, dir_id, dir_parent, allocated = columns
+    table = ScanTable(size, mtime, ext_code, meta["extensions"], path_pool, path_offsets,
+                      dir_id, dir_parent, meta["dir_paths"], allocated)
+    return table, meta["frontier"], meta["links"]
+
+
+def load_checkpoint(checkpoint_path):
+    # Returns (root, tables, frontier, links, valid_length); frontier is None when no PART was written yet
+    root = None
+    tables = []
+    frontier = None
+    links = []
+    valid_length = 0
+    with open(checkpoint_path, 'rb') as f:
+        for kind, payload, end in _records(f):
+            if kind == b"HEAD":
+                header = json.loads(payload.decode("utf-8"))
+                if header.get("format") != FORMAT:
+                    break
+                root = header["root"]
+            elif kind == b"PART" and root is not None:
+                table, frontier, part_links = _decode_part(payload)
+                tables.append(table)
+                links.extend(part_links)
+            valid_length = end
+    if root is None:
+        raise ValueError(f"Not a scan checkpoint: {checkpoint_path}")
+    return root, tables, frontier, links, valid_length
+
+
+class ScanCheckpoint:
+    def __init__(self, checkpoint_path, root, resume=False):
+        self.checkpoint_path = checkpoint_path
+        self.tables = []
+        self.frontier = None
+        self.links = []
+        root = os.path.abspath(root)
+
+        if resume and os.path.exists(checkpoint_path):
+            saved_root, self.tables, self.frontier, self.links, valid_length = load_checkpoint(checkpoint_path)
+            if saved_root != root:
+                raise ValueError(f"Checkpoint {checkpoint_path} belongs to a scan of {saved_root}")
+            self.f = open(checkpoint_path, 'r+b')
+            self.f.truncate(valid_length)
+            self.f.seek(valid_length)
+        else:
+            self.f = open(checkpoint_path, 'wb')
+            self._append(b"HEAD", json.dumps({"format": FORMAT, "version": 1, "root": root}).encode("utf-8"))
+
+    def _append(self, kind, payload):
+        self.f.write(RECORD.pack(kind, len(payload), zlib.crc32(payload)))
+        self.f.write(payload)
+        self.f.flush()
+        os.fsync(self.f.fileno())
+
+    def write(self, table, frontier, links=()):
+        # Everything scanned since the last write, the directories still to list and
+        # the (dev, ino, row) hard links the rows counted (ScanTableBuilder.links)
+        self._append(b"PART", _encode_part(table, list(frontier), links))
+        self.tables.append(table)
+        self.frontier = list(frontier)
+
+    def close(self):
+        self.f.close()
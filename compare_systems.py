@@ -1,6 +1,9 @@
 import json
 import sys
 
+from file_diff import diff_snapshots, write_changes_csv
+from snapshot import is_snapshot, read_header
+
 def load_json_result(filepath):
     try:
         with open(filepath, 'r', encoding='utf-8') as f:
@@ -13,9 +16,20 @@ def load_json_result(filepath):
         return None
 
 
+def load_result(filepath):
+    # JSON exports are parsed whole; snapshots only have their header read
+    if is_snapshot(filepath):
+        try:
+            return read_header(filepath)["export"]
+        except (ValueError, KeyError):
+            print(f"Error: Invalid snapshot file: {filepath}")
+            return None
+    return load_json_result(filepath)
+
+
 def compare_two_systems(file1, file2):
-    data1 = load_json_result(file1)
-    data2 = load_json_result(file2)
+    data1 = load_result(file1)
+    data2 = load_result(file2)
 
     if not data1 or not data2:
         return
@@ -36,6 +50,8 @@ def compare_two_systems(file1, file2):
     print("-" * 72)
     print(f"{'Total Files':<30} {s1['total_files']:>20,} {s2['total_files']:>20,}")
     print(f"{'Total Size (GB)':<30} {s1['total_size_gb']:>20.2f} {s2['total_size_gb']:>20.2f}")
+    if 'total_allocated_gb' in s1 and 'total_allocated_gb' in s2:
+        print(f"{'Allocated on Disk (GB)':<30} {s1['total_allocated_gb']:>20.2f} {s2['total_allocated_gb']:>20.2f}")
     print(f"{'Unique Extensions':<30} {s1['unique_extensions']:>20} {s2['unique_extensions']:>20}")
     print(f"{'Files w/o Extension':<30} {s1['files_without_extension']:>20} {s2['files_without_extension']:>20}")
 
@@ -84,9 +100,56 @@ def compare_two_systems(file1, file2):
     print("\n" + "=" * 80)
 
 
+def compare_file_level(file1, file2, top_n=20, changes_csv=None):
+    diff = diff_snapshots(file1, file2)
+
+    print("\n### FILE-LEVEL CHANGES ###\n")
+    print(f"{'Change':<12} {'Files':>12} {'Bytes (MB)':>14}")
+    print("-" * 40)
+    print(f"{'Added':<12} {len(diff.added):>12,} {diff.added_bytes / (1024 * 1024):>+14.2f}")
+    print(f"{'Removed':<12} {len(diff.removed):>12,} {-diff.removed_bytes / (1024 * 1024):>+14.2f}")
+    print(f"{'Resized':<12} {len(diff.resized_new):>12,} {diff.resized_bytes / (1024 * 1024):>+14.2f}")
+    print(f"{'Touched':<12} {len(diff.touched_new):>12,} {0:>+14.2f}")
+    print(f"{'Unchanged':<12} {diff.unchanged:>12,}")
+    print(f"\nNet change: {diff.net_bytes / (1024 * 1024):+.2f} MB")
+
+    print(f"\n### EXTENSION BYTE DELTAS (TOP-{top_n}) ###\n")
+    print(f"{'Extension':<15} {'Added':>10} {'Removed':>10} {'Delta (MB)':>14}")
+    print("-" * 52)
+    ext_deltas = sorted(diff.extension_deltas().items(), key=lambda item: abs(item[1][2]), reverse=True)
+    for ext, (added, removed, delta) in ext_deltas[:top_n]:
+        print(f"{ext:<15} {added:>10,} {removed:>10,} {delta / (1024 * 1024):>+14.2f}")
+
+    print(f"\n### DIRECTORY BYTE DELTAS (TOP-{top_n}) ###\n")
+    dir_deltas = sorted(diff.directory_deltas().items(), key=lambda item: abs(item[1]), reverse=True)
+    for directory, delta in dir_deltas[:top_n]:
+        print(f"{delta / (1024 * 1024):>+12.2f} MB  {directory or '.'}")
+
+    print(f"\n### LARGEST FILE CHANGES (TOP-{top_n}) ###\n")
+    for kind, path, delta in diff.largest_changes(top_n):
+        print(f"{kind:<8} {delta / (1024 * 1024):>+12.2f} MB  {path}")
+
+    if changes_csv:
+        write_changes_csv(diff, changes_csv)
+        print(f"\nFull change list written to: {changes_csv}")
+
+    print("\n" + "=" * 80)
+    return diff
+
+
 if __name__ == "__main__":
-    if len(sys.argv) != 3:
-        print("Usage: python compare_systems.py <result1.json> <result2.json>")
+    args = sys.argv[1:]
+    changes_csv = None
+    if "--changes" in args:
+        i = args.index("--changes")
+        changes_csv = args[i + 1] if i + 1 < len(args) else None
+        del args[i:i + 2]
+
+    if len(args) != 2:
+        print("Usage: python compare_systems.py <result1.json|.fsnap> <result2.json|.fsnap> [--changes changes.csv]")
         sys.exit(1)
 
-    compare_two_systems(sys.argv[1], sys.argv[2])
+    compare_two_systems(args[0], args[1])
+    # Two snapshots carry the full per-file tables: diff them file by file
+    if is_snapshot(args[0]) and is_snapshot(args[1]):
+        compare_file_level(args[0], args[1], changes_csv=changes_csv)
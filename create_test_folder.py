@@ -1,8 +1,52 @@
+import argparse
 import os
 import random
+import sys
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
-def create_test_folder(base_path="test_folder", num_files=200):
+# generate_tree(): seeded, scalable trees for benchmarks. Every directory draws
+# its files from its own RNG seeded with (seed, directory index), so the same
+# arguments give byte-for-byte the same tree whatever the thread count; mtimes
+# count back from a fixed reference time for the same reason.
+REFERENCE_TIME = 1735689600  # 2025-01-01 00:00 UTC
+MAX_SIZE = 1 << 40
+WRITE_CHUNK = b'X' * (1 << 20)
+UTIME_FD = os.utime in os.supports_fd
+
+SIZE_DISTRIBUTIONS = {
+    # create_test_folder's mix: 70% 1KB-100KB, 20% 100KB-5MB, 10% 5MB-100MB
+    "mixed": lambda rng: (rng.randint(1000, 100000) if (r := rng.random()) < 0.7 else
+                          rng.randint(100000, 5000000) if r < 0.9 else rng.randint(5000000, 100000000)),
+    # Median ~22KB with a long tail, close to measured desktop and repository trees
+    "lognormal": lambda rng: min(int(rng.lognormvariate(10, 2.5)), MAX_SIZE),
+    # Heavy tail: a few files hold most of the bytes
+    "pareto": lambda rng: min(int(1024 * rng.paretovariate(1.1)), MAX_SIZE),
+    # Metadata-only trees
+    "empty": lambda rng: 0,
+}
+
+EXTENSION_MIXES = {
+    "desktop": {'.txt': 1, '.pdf': 1, '.docx': 1, '.xlsx': 1, '.pptx': 1, '.jpg': 1, '.png': 1, '.gif': 1,
+                '.bmp': 1, '.mp4': 1, '.avi': 1, '.mkv': 1, '.mov': 1, '.mp3': 1, '.wav': 1, '.flac': 1,
+                '.m4a': 1, '.zip': 1, '.rar': 1, '.exe': 1, '.iso': 1, '.py': 1, '.java': 1, '.cpp': 1,
+                '.html': 1, '.css': 1},
+    "game": {'.png': 20, '.tga': 8, '.dds': 8, '.psd': 4, '.wav': 10, '.ogg': 10, '.fbx': 6, '.uasset': 20,
+             '.json': 6, '.cs': 6, '.shader': 2},
+    "source": {'.py': 20, '.c': 10, '.h': 10, '.cpp': 10, '.js': 10, '.ts': 8, '.json': 6, '.md': 4,
+               '.o': 8, '.pyc': 8, '': 6},
+}
+
+def _write_file(filepath, size, sparse=False):
+    with open(filepath, 'wb') as f:
+        if sparse:
+            # Same apparent size without writing the bytes - fast for benchmark trees
+            f.truncate(size)
+        else:
+            f.write(b'X' * size)
+
+def create_test_folder(base_path="test_folder", num_files=200, sparse=False, seed=None):
+    random = _random_module(seed)
     print(f"Creating test folder: {base_path}")
 
     os.makedirs(base_path, exist_ok=True)
@@ -46,8 +90,7 @@ def create_test_folder(base_path="test_folder", num_files=200):
             filename = f"file_{i:03d}{ext}"
             filepath = os.path.join(folder_path, filename)
 
-            with open(filepath, 'wb') as f:
-                f.write(b'X' * size)
+            _write_file(filepath, size, sparse)
 
             # Random modification time (last 3 years)
             days_ago = random.randint(0, 1095)
@@ -64,8 +107,7 @@ def create_test_folder(base_path="test_folder", num_files=200):
         filename = f"readme_{i}{ext}"
         filepath = os.path.join(base_path, filename)
 
-        with open(filepath, 'wb') as f:
-            f.write(b'X' * size)
+        _write_file(filepath, size, sparse)
         files_created += 1
 
     total_size = sum(os.path.getsize(os.path.join(root, file))
@@ -78,7 +120,107 @@ def create_test_folder(base_path="test_folder", num_files=200):
 
     return os.path.abspath(base_path)
 
-if __name__ == "__main__":
+def _random_module(seed):
+    # create_test_folder keeps using the global RNG unless a seed is given
+    return random if seed is None else random.Random(seed)
+
+
+def _directory_paths(base_path, depth, fanout):
+    # Breadth-first, so every parent is listed (and created) before its children
+    paths = [base_path]
+    level = [base_path]
+    for _ in range(depth):
+        level = [os.path.join(parent, f"dir_{i:03d}") for parent in level for i in range(fanout)]
+        paths.extend(level)
+    return paths
+
+
+def _fill_directory(path, index, count, seed, sizes, extensions, weights, sparse, mtime_days):
+    rng = random.Random(f"{seed}/{index}")
+    cum_weights = list(weights)
+    for i in range(1, len(cum_weights)):
+        cum_weights[i] += cum_weights[i - 1]
+    total = 0
+    for i in range(count):
+        size = sizes(rng)
+        ext = rng.choices(extensions, cum_weights=cum_weights)[0]
+        mtime = REFERENCE_TIME - rng.random() * mtime_days * 86400
+        filepath = os.path.join(path, f"file_{i:06d}{ext}")
+        fd = os.open(filepath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            if sparse:
+                os.ftruncate(fd, size)
+            else:
+                remaining = size
+                while remaining > 0:
+                    remaining -= os.write(fd, WRITE_CHUNK[:remaining])
+            if UTIME_FD:
+                os.utime(fd, (mtime, mtime))
+        finally:
+            os.close(fd)
+        if not UTIME_FD:
+            os.utime(filepath, (mtime, mtime))
+        total += size
+    return total
+
+
+def generate_tree(base_path, num_files=100000, depth=3, fanout=8, sizes="lognormal", extensions="desktop",
+                  seed=0, sparse=True, workers=None, mtime_days=1095):
+    # Files are spread evenly over the base folder and its fanout + fanout**2 + ...
+    # + fanout**depth subfolders. sizes: a SIZE_DISTRIBUTIONS name or rng -> size;
+    # extensions: an EXTENSION_MIXES name or {extension: weight}. Sparse files get
+    # their apparent size with ftruncate and take no blocks, so a million-file
+    # tree costs only its inodes. Directories are filled on a thread pool.
+    size_fn = SIZE_DISTRIBUTIONS[sizes] if isinstance(sizes, str) else sizes
+    mix = EXTENSION_MIXES[extensions] if isinstance(extensions, str) else extensions
+    ext_list, weights = list(mix), list(mix.values())
+
+    directories = _directory_paths(base_path, depth, fanout)
+    for path in directories:
+        os.makedirs(path, exist_ok=True)
+    per_dir, extra = divmod(num_files, len(directories))
+
+    workers = workers or min(32, (os.cpu_count() or 1) * 4)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_fill_directory, path, i, per_dir + (i < extra), seed, size_fn,
+                               ext_list, weights, sparse, mtime_days)
+                   for i, path in enumerate(directories)]
+        total_size = sum(future.result() for future in futures)
+
+    return {"path": os.path.abspath(base_path), "files": num_files, "directories": len(directories),
+            "total_size": total_size, "depth": depth, "fanout": fanout,
+            "sizes": sizes if isinstance(sizes, str) else "custom",
+            "extensions": extensions if isinstance(extensions, str) else "custom",
+            "seed": seed, "sparse": sparse}
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Generate a seeded synthetic tree for tests and benchmarks. "
+                                                 "Without arguments, asks interactively for a small test folder.")
+    parser.add_argument("path")
+    parser.add_argument("--files", type=int, default=100000)
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--fanout", type=int, default=8)
+    parser.add_argument("--sizes", choices=sorted(SIZE_DISTRIBUTIONS), default="lognormal")
+    parser.add_argument("--extensions", choices=sorted(EXTENSION_MIXES), default="desktop")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dense", action="store_true", help="Write real bytes instead of sparse files")
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--mtime-days", type=int, default=1095, help="Spread of modification times")
+    return parser
+
+
+if __name__ == "__main__" and len(sys.argv) > 1:
+    args = build_parser().parse_args()
+    start = datetime.now()
+    manifest = generate_tree(args.path, args.files, args.depth, args.fanout, args.sizes, args.extensions,
+                             args.seed, not args.dense, args.workers, args.mtime_days)
+    elapsed = (datetime.now() - start).total_seconds()
+    print(f"Created {manifest['files']:,} files in {manifest['directories']:,} directories "
+          f"({manifest['total_size'] / (1024 ** 3):.2f} GB apparent) in {elapsed:.1f}s")
+    print(f"Tree ready: {manifest['path']}")
+
+elif __name__ == "__main__":
     print("=" * 60)
     print("TEST FOLDER CREATOR")
     print("=" * 60)
@@ -0,0 +1,91 @@
+import os
+
+import numpy as np
+
+from scan_table import as_scan_table
+
+
+# Directory rollup over the tree a scan records (ScanTable.dir_parent/dir_id):
+# own and cumulative bytes (apparent and allocated) and file counts per
+# directory, plus two precomputed orders - directories by depth then
+# cumulative size, and children by parent
+# then cumulative size - so "heaviest K at depth d" and "heaviest K children of
+# this directory" are a slice of an array (after one binary search).
+class DirectoryTree:
+    def __init__(self, file_data):
+        table = as_scan_table(file_data)
+        if table.dir_id is None:
+            raise ValueError("Scan result has no directory columns")
+        parent = table.dir_parent.astype(np.int64)
+        n = len(parent)
+        self.paths = table.dir_paths
+        self.parent = parent
+
+        self.own_bytes = np.zeros(n, dtype=np.int64)
+        np.add.at(self.own_bytes, table.dir_id, table.size)
+        self.own_files = np.bincount(table.dir_id, minlength=n).astype(np.int64)
+        self.own_allocated = np.zeros(n, dtype=np.int64)
+        np.add.at(self.own_allocated, table.dir_id, table.allocated_or_size())
+
+        # Depth of every directory by walking all ancestor pointers one level per step
+        self.depth = np.zeros(n, dtype=np.int32)
+        ancestor = parent.copy()
+        while True:
+            has_parent = ancestor >= 0
+            if not has_parent.any():
+                break
+            self.depth[has_parent] += 1
+            ancestor[has_parent] = parent[ancestor[has_parent]]
+
+        # Roll up deepest level first, so a directory is complete before it is added to its parent
+        self.total_bytes = self.own_bytes.copy()
+        self.total_files = self.own_files.copy()
+        self.total_allocated = self.own_allocated.copy()
+        max_depth = int(self.depth.max()) if n else -1
+        by_depth = np.argsort(self.depth, kind="stable")
+        level_offsets = np.searchsorted(self.depth[by_depth], np.arange(max_depth + 2))
+        for d in range(max_depth, 0, -1):
+            rows = by_depth[level_offsets[d]:level_offsets[d + 1]]
+            np.add.at(self.total_bytes, parent[rows], self.total_bytes[rows])
+            np.add.at(self.total_files, parent[rows], self.total_files[rows])
+            np.add.at(self.total_allocated, parent[rows], self.total_allocated[rows])
+
+        self.level_order = np.lexsort((-self.total_bytes, self.depth))
+        self.level_offsets = np.searchsorted(self.depth[self.level_order], np.arange(max_depth + 2))
+        self.child_order = np.lexsort((-self.total_bytes, parent))
+        # Children of directory p are child_order[child_offsets[p + 1]:child_offsets[p + 2]]; roots use p = -1
+        self.child_offsets = np.searchsorted(parent[self.child_order], np.arange(-1, n + 1))
+        self._index = None
+
+    def __len__(self):
+        return len(self.parent)
+
+    @property
+    def max_depth(self):
+        return len(self.level_offsets) - 2
+
+    def find(self, path):
+        if self._index is None:
+            self._index = {p: i for i, p in enumerate(self.paths)}
+        return self._index.get(os.path.normpath(path), -1)
+
+    def entry(self, dir_id):
+        # (path, cumulative bytes, cumulative files, depth, cumulative allocated bytes)
+        return (self.paths[dir_id], int(self.total_bytes[dir_id]), int(self.total_files[dir_id]),
+                int(self.depth[dir_id]), int(self.total_allocated[dir_id]))
+
+    def top_subtrees(self, depth=1, k=10):
+        if not 0 <= depth <= self.max_depth:
+            return []
+        start = self.level_offsets[depth]
+        end = min(start + k, self.level_offsets[depth + 1])
+        return [self.entry(i) for i in self.level_order[start:end].tolist()]
+
+    def children(self, directory=None, k=10):
+        # Heaviest children of a directory (path or id); the scan roots when None
+        dir_id = -1 if directory is None else directory if isinstance(directory, int) else self.find(directory)
+        if directory is not None and dir_id < 0:
+            return []
+        start = self.child_offsets[dir_id + 1]
+        end = min(start + k, self.child_offsets[dir_id + 2])
+        return [self.entry(i) for i in self.child_order[start:end].tolist()]
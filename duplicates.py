@@ -0,0 +1,200 @@
+import hashlib
+import os
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from scan_table import as_scan_table
+
+# Tiered duplicate detection: only files sharing a size can be identical, only
+# those whose first and last PARTIAL_BYTES also match are read in full, and the
+# full reads stream through one large reusable buffer per call. hashlib and file
+# reads both release the GIL, so a thread pool overlaps I/O and hashing.
+# Hard links are one file: size candidates are stat'ed and collapsed to one row
+# per (st_dev, st_ino) before hashing, and reclaimable space is what deleting a
+# copy frees - its allocated blocks, not its apparent size.
+PARTIAL_BYTES = 4096
+BUFFER_BYTES = 1 << 20
+
+
+def _partial_hash(path, size):
+    h = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        h.update(f.read(PARTIAL_BYTES))
+        if size > 2 * PARTIAL_BYTES:
+            f.seek(size - PARTIAL_BYTES)
+        h.update(f.read(PARTIAL_BYTES))
+    return h.digest()
+
+
+def _full_hash(path):
+    h = hashlib.blake2b(digest_size=16)
+    buf = bytearray(BUFFER_BYTES)
+    view = memoryview(buf)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            n = f.readinto(buf)
+            if not n:
+                break
+            h.update(view[:n])
+    return h.digest()
+
+
+def _inode(path):
+    # (st_dev, st_ino, allocated bytes)
+    st = os.stat(path)
+    blocks = getattr(st, "st_blocks", None)
+    return st.st_dev, st.st_ino, blocks * 512 if blocks is not None else st.st_size
+
+
+def _safe(func, *args):
+    try:
+        return func(*args)
+    except OSError:
+        return None
+
+
+# (path, size, mtime) -> partial/full digests, so unchanged files are never re-read
+class HashCache:
+    def __init__(self, cache_path):
+        self.conn = sqlite3.connect(cache_path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS hashes (
+                path BLOB PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                partial BLOB,
+                full BLOB
+            )""")
+
+    def get(self, path, size, mtime):
+        row = self.conn.execute("SELECT partial, full FROM hashes WHERE path = ? AND size = ? AND mtime = ?",
+                                (os.fsencode(path), size, mtime)).fetchone()
+        return row if row else (None, None)
+
+    def put(self, path, size, mtime, partial, full):
+        self.conn.execute("INSERT OR REPLACE INTO hashes VALUES (?, ?, ?, ?, ?)",
+                          (os.fsencode(path), size, mtime, partial, full))
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+class DuplicateReport:
+    def __init__(self, table, groups, stats, allocated=None, links=None):
+        self.table = table
+        # row -> allocated bytes of its inode; row -> other rows hard-linked to it
+        self.allocated = allocated or {}
+        self.links = links or {}
+        # [(size, row indices)] per set of identical files (one row per inode), most reclaimable first
+        self.groups = sorted(groups, key=lambda group: self.reclaimable(group[1]), reverse=True)
+        self.stats = stats
+
+    def freed(self, row):
+        # Space freed by deleting this copy together with its hard links
+        return self.allocated.get(row, int(self.table.size[row]))
+
+    def reclaimable(self, rows):
+        return sum(self.freed(row) for row in rows[1:])
+
+    @property
+    def duplicate_files(self):
+        return sum(len(rows) - 1 for _, rows in self.groups)
+
+    @property
+    def reclaimable_bytes(self):
+        return sum(self.reclaimable(rows) for _, rows in self.groups)
+
+    def reclaimable_by_extension(self):
+        # Every copy after the first counts against its own extension
+        reclaimable = {}
+        for _, rows in self.groups:
+            for row in rows[1:]:
+                ext = self.table.extension(row) or "no_ext"
+                reclaimable[ext] = reclaimable.get(ext, 0) + self.freed(row)
+        return reclaimable
+
+
+def _group(keys):
+    groups = {}
+    for row, key in keys.items():
+        if key is not None:
+            groups.setdefault(key, []).append(row)
+    return [rows for rows in groups.values() if len(rows) > 1]
+
+
+def find_duplicates(file_data, workers=8, cache_path=None):
+    table = as_scan_table(file_data)
+    stats = {"size_candidates": 0, "hard_links": 0, "partial_hashed": 0, "full_hashed": 0, "cache_hits": 0}
+
+    # Tier 1: files sharing a non-zero size, found with one sort over the size column
+    order = np.argsort(table.size, kind="stable")
+    sizes = table.size[order]
+    same_as_next = sizes[1:] == sizes[:-1]
+    in_run = np.zeros(len(sizes), dtype=bool)
+    in_run[1:] |= same_as_next
+    in_run[:-1] |= same_as_next
+    candidates = order[in_run & (sizes > 0)].tolist()
+    stats["size_candidates"] = len(candidates)
+    if not candidates:
+        return DuplicateReport(table, [], stats)
+
+    info = {row: (table.path(row), int(table.size[row]), float(table.mtime[row])) for row in candidates}
+    allocated = {}
+    links = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Hard links: keep the first row of every inode, and drop sizes left with one row
+        first_row = {}
+        for row, inode in zip(candidates, pool.map(lambda r: _safe(_inode, info[r][0]), candidates)):
+            if inode is None:
+                continue
+            if inode[:2] in first_row:
+                links.setdefault(first_row[inode[:2]], []).append(row)
+                stats["hard_links"] += 1
+            else:
+                first_row[inode[:2]] = row
+                allocated[row] = inode[2]
+        per_size = {}
+        for row in first_row.values():
+            per_size.setdefault(info[row][1], []).append(row)
+        candidates = sorted(row for rows in per_size.values() if len(rows) > 1 for row in rows)
+    if not candidates:
+        return DuplicateReport(table, [], stats, allocated, links)
+
+    cache = HashCache(cache_path) if cache_path else None
+    partial = {}
+    full = {}
+    if cache:
+        for row in candidates:
+            partial[row], full[row] = cache.get(*info[row])
+            stats["cache_hits"] += partial[row] is not None
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Tier 2: first + last PARTIAL_BYTES of every size candidate
+        todo = [row for row in candidates if partial.get(row) is None]
+        for row, digest in zip(todo, pool.map(lambda r: _safe(_partial_hash, info[r][0], info[r][1]), todo)):
+            partial[row] = digest
+        stats["partial_hashed"] = len(todo)
+
+        # Tier 3: full content, only where size and partial digest still collide.
+        # Files of up to 2 * PARTIAL_BYTES were read whole by the partial hash.
+        colliding = [row for rows in _group({row: (info[row][1], partial[row]) for row in candidates})
+                     for row in rows]
+        for row in colliding:
+            if info[row][1] <= 2 * PARTIAL_BYTES:
+                full[row] = partial[row]
+        todo = [row for row in colliding if full.get(row) is None]
+        for row, digest in zip(todo, pool.map(lambda r: _safe(_full_hash, info[r][0]), todo)):
+            full[row] = digest
+        stats["full_hashed"] = len(todo)
+
+    if cache:
+        for row in candidates:
+            if partial.get(row) is not None:
+                cache.put(*info[row], partial[row], full.get(row))
+        cache.close()
+
+    groups = _group({row: (info[row][1], full[row]) for row in colliding})
+    return DuplicateReport(table, [(info[rows[0]][1], rows) for rows in groups], stats, allocated, links)
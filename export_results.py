@@ -1,27 +1,17 @@
 import json
 import platform
 import datetime
-from collections import Counter
 
-def export_to_json(file_data, output_file="scan_results.json"):
-    if not file_data:
-        print("No data to export!")
-        return None
+from aggregate import summarize
+from scan_table import ScanTable
+from snapshot import save_snapshot
 
-    file_sizes = [f["size"] for f in file_data]
-    total_files = len(file_sizes)
-    total_size = sum(file_sizes)
-
-    extensions = [f["extension"] for f in file_data if f["extension"]]
-    no_ext_count = sum(1 for f in file_data if not f["extension"])
-    ext_counter = Counter(extensions)
-    ext_sizes = {}
-    for f in file_data:
-        ext = f["extension"] if f["extension"] else "no_ext"
-        if ext not in ext_sizes:
-            ext_sizes[ext] = {"total_size": 0, "count": 0}
-        ext_sizes[ext]["total_size"] += f["size"]
-        ext_sizes[ext]["count"] += 1
+def build_export_data(file_data, system_info=None):
+    summary = summarize(file_data)
+    total_files = summary.total_files
+    total_size = summary.total_size
+    ext_counter = summary.extension_counter()
+    ext_allocated = summary.extension_allocated()
 
     top_20_by_count = [
         {
@@ -32,14 +22,14 @@ def export_to_json(file_data, output_file="scan_results.json"):
         for ext, count in ext_counter.most_common(20)
     ]
 
-    ext_size_list = [(ext, data["total_size"], data["count"]) for ext, data in ext_sizes.items()]
-    ext_size_list.sort(key=lambda x: x[1], reverse=True)
+    ext_size_list = summary.extension_sizes()
 
     top_20_by_size = [
         {
             "extension": ext,
             "total_size_bytes": size,
             "total_size_gb": round(size / (1024 * 1024 * 1024), 4),
+            "allocated_size_bytes": ext_allocated.get(ext, size),
             "file_count": count,
             "percentage_of_disk": round((size / total_size) * 100, 2),
             "avg_size_kb": round((size / count) / 1024, 2)
@@ -47,8 +37,9 @@ def export_to_json(file_data, output_file="scan_results.json"):
         for ext, size, count in ext_size_list[:20]
     ]
 
-    system_info = {
+    system_info = system_info or {
         "os": platform.system(),
+        "hostname": platform.node(),
         "os_version": platform.version(),
         "platform": platform.platform(),
         "architecture": platform.machine(),
@@ -63,12 +54,26 @@ def export_to_json(file_data, output_file="scan_results.json"):
             "total_files": total_files,
             "total_size_bytes": total_size,
             "total_size_gb": round(total_size / (1024 * 1024 * 1024), 2),
+            "total_allocated_bytes": summary.total_allocated,
+            "total_allocated_gb": round(summary.total_allocated / (1024 * 1024 * 1024), 2),
             "unique_extensions": len(ext_counter),
-            "files_without_extension": no_ext_count
+            "files_without_extension": summary.no_ext_count
         },
         "top_20_extensions_by_count": top_20_by_count,
-        "top_20_extensions_by_size": top_20_by_size
+        "top_20_extensions_by_size": top_20_by_size,
+        # Exact counts, bytes, year histogram, top-K files and size sketch:
+        # what merge_results.py adds up across volumes and hosts
+        "partial_summary": summary.to_dict()
     }
+    return export_data
+
+
+def export_to_json(file_data, output_file="scan_results.json"):
+    if not file_data:
+        print("No data to export!")
+        return None
+
+    export_data = build_export_data(file_data)
 
     with open(output_file, 'w', encoding='utf-8') as f:
         json.dump(export_data, f, indent=2, ensure_ascii=False)
@@ -77,6 +82,19 @@ def export_to_json(file_data, output_file="scan_results.json"):
     return export_data
 
 
+def export_to_snapshot(file_data, output_file="scan_results.fsnap", root=None):
+    # Full per-file table in the binary snapshot format, with the JSON export as its header
+    if not isinstance(file_data, ScanTable) or not file_data:
+        print("No per-file data to export!")
+        return None
+
+    export_data = build_export_data(file_data)
+    save_snapshot(file_data, output_file, export_data, root)
+
+    print(f"\n[SUCCESS] Snapshot exported to: {output_file}")
+    return export_data
+
+
 def create_summary_report(export_data):
     print("\n" + "=" * 70)
     print("EXPORT SUMMARY")
@@ -89,6 +107,8 @@ def create_summary_report(export_data):
     summary = export_data["summary"]
     print(f"\nTotal Files: {summary['total_files']:,}")
     print(f"Total Size: {summary['total_size_gb']:.2f} GB")
+    if "total_allocated_gb" in summary:
+        print(f"Allocated on Disk: {summary['total_allocated_gb']:.2f} GB")
     print(f"Unique Extensions: {summary['unique_extensions']}")
     print(f"Files without Extension: {summary['files_without_extension']}")
 
@@ -0,0 +1,182 @@
+import csv
+import os
+
+import numpy as np
+
+from snapshot import load_snapshot
+
+FNV_OFFSET = np.uint64(0xcbf29ce484222325)
+FNV_PRIME = np.uint64(0x100000001b3)
+CHECK_SEED = np.uint64(0x9e3779b97f4a7c15)
+CHECK_MULTIPLIER = np.uint64(0xff51afd7ed558ccd)
+
+
+def _root_length(root):
+    return len(os.fsencode(os.path.join(root, ""))) if root else 0
+
+
+def path_keys(table, root=None):
+    # Two independent 64-bit hashes (FNV-1a and a multiplicative one) of every
+    # path relative to root, computed column-wise over the path pool: rows are
+    # ordered longest-first so each byte position only touches the rows that are
+    # still that long. The second hash verifies matches on the first.
+    n = len(table)
+    starts = table.path_offsets[:-1] + _root_length(root)
+    lengths = np.maximum(table.path_offsets[1:] - starts, 0)
+    order = np.argsort(-lengths, kind="stable")
+    starts = starts[order]
+    lengths = lengths[order]
+
+    key = np.full(n, FNV_OFFSET, dtype=np.uint64)
+    check = np.full(n, CHECK_SEED, dtype=np.uint64)
+    max_length = int(lengths[0]) if n else 0
+    active_counts = np.searchsorted(-lengths, -np.arange(max_length), side="left")
+    for position, active in enumerate(active_counts.tolist()):
+        byte = table.path_pool[starts[:active] + position].astype(np.uint64)
+        key[:active] ^= byte
+        key[:active] *= FNV_PRIME
+        check[:active] += byte + np.uint64(1)
+        check[:active] *= CHECK_MULTIPLIER
+
+    keys = np.empty(n, dtype=np.uint64)
+    checks = np.empty(n, dtype=np.uint64)
+    keys[order] = key
+    checks[order] = check
+    return keys, checks
+
+
+def _relative_path(table, index, root_length):
+    start, end = table.path_offsets[index] + root_length, table.path_offsets[index + 1]
+    return os.fsdecode(table.path_pool[start:end].tobytes())
+
+
+# Result of joining two scans on their (root-relative) paths. Everything is kept
+# as index arrays into the two tables; rows are only materialized on demand.
+class FileDiff:
+    def __init__(self, old, new, old_root, new_root, removed, added, matched_old, matched_new):
+        self.old = old
+        self.new = new
+        self.old_root_length = _root_length(old_root)
+        self.new_root_length = _root_length(new_root)
+        self.removed = removed
+        self.added = added
+        size_delta = new.size[matched_new] - old.size[matched_old]
+        resized = size_delta != 0
+        touched = ~resized & (new.mtime[matched_new] != old.mtime[matched_old])
+        self.resized_old = matched_old[resized]
+        self.resized_new = matched_new[resized]
+        self.touched_old = matched_old[touched]
+        self.touched_new = matched_new[touched]
+        self.unchanged = int(len(matched_old) - resized.sum() - touched.sum())
+
+    @property
+    def added_bytes(self):
+        return int(self.new.size[self.added].sum())
+
+    @property
+    def removed_bytes(self):
+        return int(self.old.size[self.removed].sum())
+
+    @property
+    def resized_bytes(self):
+        return int(self.new.size[self.resized_new].sum() - self.old.size[self.resized_old].sum())
+
+    @property
+    def net_bytes(self):
+        return self.added_bytes - self.removed_bytes + self.resized_bytes
+
+    def iter_changes(self):
+        # (kind, relative path, old size, new size), generated lazily
+        for i in self.added.tolist():
+            yield "added", _relative_path(self.new, i, self.new_root_length), 0, int(self.new.size[i])
+        for i in self.removed.tolist():
+            yield "removed", _relative_path(self.old, i, self.old_root_length), int(self.old.size[i]), 0
+        for i, j in zip(self.resized_old.tolist(), self.resized_new.tolist()):
+            yield "resized", _relative_path(self.new, j, self.new_root_length), int(self.old.size[i]), int(self.new.size[j])
+        for i, j in zip(self.touched_old.tolist(), self.touched_new.tolist()):
+            yield "touched", _relative_path(self.new, j, self.new_root_length), int(self.old.size[i]), int(self.new.size[j])
+
+    def largest_changes(self, top_n=20):
+        # Biggest absolute byte deltas among added, removed and resized files
+        deltas = np.concatenate((self.new.size[self.added], -self.old.size[self.removed],
+                                 self.new.size[self.resized_new] - self.old.size[self.resized_old]))
+        top = np.argsort(-np.abs(deltas), kind="stable")[:top_n]
+        n_added, n_removed = len(self.added), len(self.removed)
+        changes = []
+        for k in top.tolist():
+            if k < n_added:
+                changes.append(("added", _relative_path(self.new, self.added[k], self.new_root_length), int(deltas[k])))
+            elif k < n_added + n_removed:
+                i = self.removed[k - n_added]
+                changes.append(("removed", _relative_path(self.old, i, self.old_root_length), int(deltas[k])))
+            else:
+                j = self.resized_new[k - n_added - n_removed]
+                changes.append(("resized", _relative_path(self.new, j, self.new_root_length), int(deltas[k])))
+        return changes
+
+    def extension_deltas(self):
+        # extension -> [added files, removed files, byte delta], grouped over extension codes
+        deltas = {}
+
+        def accumulate(table, rows, signed_sizes, count_slot):
+            if not len(rows):
+                return
+            codes = table.ext_code[rows]
+            files = np.bincount(codes, minlength=len(table.extensions))
+            totals = np.bincount(codes, weights=signed_sizes.astype(np.float64), minlength=len(table.extensions))
+            for code in np.nonzero(files)[0].tolist():
+                entry = deltas.setdefault(table.extensions[code] or "no_ext", [0, 0, 0])
+                if count_slot is not None:
+                    entry[count_slot] += int(files[code])
+                entry[2] += int(totals[code])
+
+        accumulate(self.new, self.added, self.new.size[self.added], 0)
+        accumulate(self.old, self.removed, -self.old.size[self.removed], 1)
+        accumulate(self.new, self.resized_new, self.new.size[self.resized_new] - self.old.size[self.resized_old], None)
+        return deltas
+
+    def directory_deltas(self, depth=None):
+        # Directory (first `depth` components of the relative parent, or the whole
+        # parent) -> byte delta; only changed rows are ever turned into strings
+        deltas = {}
+        for kind, path, old_size, new_size in self.iter_changes():
+            if kind == "touched":
+                continue
+            directory = os.path.dirname(path)
+            if depth is not None:
+                directory = os.sep.join(directory.split(os.sep)[:depth])
+            deltas[directory] = deltas.get(directory, 0) + new_size - old_size
+        return deltas
+
+
+def diff_tables(old, new, old_root=None, new_root=None):
+    old_keys, old_checks = path_keys(old, old_root)
+    new_keys, new_checks = path_keys(new, new_root)
+
+    # Sorted merge join on the path keys
+    _, matched_old, matched_new = np.intersect1d(old_keys, new_keys, assume_unique=True, return_indices=True)
+
+    # A pair whose second hash disagrees is a collision: treat it as removed + added
+    same = old_checks[matched_old] == new_checks[matched_new]
+    matched_old = matched_old[same]
+    matched_new = matched_new[same]
+
+    removed = np.ones(len(old), dtype=bool)
+    removed[matched_old] = False
+    added = np.ones(len(new), dtype=bool)
+    added[matched_new] = False
+    return FileDiff(old, new, old_root, new_root, np.nonzero(removed)[0], np.nonzero(added)[0],
+                    matched_old, matched_new)
+
+
+def diff_snapshots(file1, file2):
+    header1, old = load_snapshot(file1)
+    header2, new = load_snapshot(file2)
+    return diff_tables(old, new, header1.get("root"), header2.get("root"))
+
+
+def write_changes_csv(diff, output_file):
+    with open(output_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(["change", "path", "old_size", "new_size"])
+        writer.writerows(diff.iter_changes())
@@ -0,0 +1,439 @@
+import argparse
+import datetime
+import os
+import sqlite3
+import sys
+import time
+
+from aggregate import summarize
+from file_diff import _relative_path, diff_tables
+from snapshot import is_snapshot, load_snapshot, save_snapshot
+
+# Snapshot history: every scan appended to a store directory holding a SQLite
+# database and the latest scan as head.fsnap. Appending joins the new scan
+# against the head on root-relative paths (file_diff) and records only the
+# changed rows. Per-extension and per-directory totals are delta-encoded the
+# same way: a row is written only when a key's value changes, and removed keys
+# get a zero row. The value at any snapshot is the key's latest row at or before
+# it. After the first snapshot the store grows with churn, not with tree size,
+# and trend queries read only the rows of the keys they ask about - no snapshot
+# is ever rebuilt. Directory totals are cumulative over the subtree, as in
+# DirectoryTree.
+DB_NAME = "history.sqlite"
+HEAD_NAME = "head.fsnap"
+CHANGE_KINDS = ("added", "removed", "resized", "touched")
+SECONDS_PER_DAY = 86400
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    id INTEGER PRIMARY KEY,
+    taken_at REAL NOT NULL,
+    root TEXT,
+    label TEXT,
+    files INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    allocated INTEGER NOT NULL,
+    added INTEGER NOT NULL,
+    removed INTEGER NOT NULL,
+    resized INTEGER NOT NULL,
+    touched INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS paths (id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS changes (
+    snapshot INTEGER NOT NULL,
+    path_id INTEGER NOT NULL,
+    kind INTEGER NOT NULL,
+    size INTEGER,
+    mtime REAL
+);
+CREATE INDEX IF NOT EXISTS changes_by_path ON changes (path_id, snapshot);
+CREATE INDEX IF NOT EXISTS changes_by_snapshot ON changes (snapshot);
+CREATE TABLE IF NOT EXISTS extensions (id INTEGER PRIMARY KEY, extension TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS extension_history (
+    extension_id INTEGER NOT NULL,
+    snapshot INTEGER NOT NULL,
+    files INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    allocated INTEGER NOT NULL,
+    PRIMARY KEY (extension_id, snapshot)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS directories (id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE, depth INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS directory_history (
+    directory_id INTEGER NOT NULL,
+    snapshot INTEGER NOT NULL,
+    files INTEGER NOT NULL,
+    bytes INTEGER NOT NULL,
+    allocated INTEGER NOT NULL,
+    PRIMARY KEY (directory_id, snapshot)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS directory_history_by_snapshot ON directory_history (snapshot);
+"""
+
+METRICS = ("files", "bytes", "allocated")
+
+
+def _extension_key(extension):
+    extension = extension.lower()
+    if extension in ("", "no_ext"):
+        return ""
+    return extension if extension.startswith(".") else "." + extension
+
+
+def _relative_directory(path, root):
+    relative = os.path.relpath(path, root) if root else path
+    return "" if relative == os.curdir else relative
+
+
+def _path_key(relative):
+    # Stored form of a root-relative file path; path_history looks paths up the same way
+    return os.path.normpath(relative)
+
+
+def _depth(relative):
+    return relative.count(os.sep) + 1 if relative else 0
+
+
+def extension_totals(table):
+    # extension -> (files, bytes, allocated)
+    summary = summarize(table)
+    return {ext: (summary.ext_counts[ext], summary.ext_sizes[ext], summary.ext_allocated[ext])
+            for ext in summary.ext_counts}
+
+
+def directory_totals(table, root):
+    # root-relative directory ("" for the root) -> cumulative (files, bytes, allocated)
+    if table is None or table.dir_id is None or not len(table.dir_parent):
+        return {}
+    from dir_tree import DirectoryTree
+    tree = DirectoryTree(table)
+    totals = {}
+    for i, (files, total, allocated) in enumerate(zip(tree.total_files.tolist(), tree.total_bytes.tolist(),
+                                                      tree.total_allocated.tolist())):
+        totals[_relative_directory(tree.paths[i], root)] = (files, total, allocated)
+    return totals
+
+
+def _deltas(old, new):
+    # Keys whose value changed, with removed keys going to zero
+    changed = [(key, value) for key, value in new.items() if old.get(key) != value]
+    changed += [(key, (0, 0, 0)) for key in old if key not in new]
+    return changed
+
+
+class SnapshotHistory:
+    def __init__(self, store_path):
+        self.store_path = store_path
+        os.makedirs(store_path, exist_ok=True)
+        self.head_path = os.path.join(store_path, HEAD_NAME)
+        self.conn = sqlite3.connect(os.path.join(store_path, DB_NAME))
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def _load_head(self):
+        last = self.conn.execute("SELECT id, files FROM snapshots ORDER BY id DESC LIMIT 1").fetchone()
+        if last is None:
+            return None, None
+        if not os.path.exists(self.head_path):
+            raise ValueError(f"{self.head_path} is missing; the history cannot take new snapshots")
+        header, head = load_snapshot(self.head_path)
+        if len(head) != last[1]:
+            raise ValueError(f"{self.head_path} does not match snapshot {last[0]}")
+        return head, header.get("root")
+
+    def append(self, table, root, taken_at=None, label=None):
+        # Records `table` (a scan of `root`) as the next snapshot; returns its id.
+        # The table's paths start with `root` exactly as the scan was given it
+        # ("./x/..." for "./x"), so the prefix is stripped using the raw root;
+        # only the snapshots row keeps the normalized form.
+        taken_at = time.time() if taken_at is None else taken_at
+        head, head_root = self._load_head()
+        summary = summarize(table)
+
+        if head is None:
+            added = list(range(len(table)))
+            removed = resized = touched = []
+        else:
+            diff = diff_tables(head, table, head_root, root)
+            added, removed = diff.added.tolist(), diff.removed.tolist()
+            resized, touched = diff.resized_new.tolist(), diff.touched_new.tolist()
+        new_length = len(os.fsencode(os.path.join(root, ""))) if root else 0
+        old_length = len(os.fsencode(os.path.join(head_root, ""))) if head_root else 0
+
+        def rows():
+            for kind, indices in ((0, added), (2, resized), (3, touched)):
+                for i in indices:
+                    yield _path_key(_relative_path(table, i, new_length)), kind, int(table.size[i]), float(table.mtime[i])
+            for i in removed:
+                yield _path_key(_relative_path(head, i, old_length)), 1, None, None
+
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO snapshots (taken_at, root, label, files, bytes, allocated, added, removed, resized, touched) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (taken_at, os.path.normpath(root) if root else root, label, summary.total_files, summary.total_size, summary.total_allocated,
+                 len(added), len(removed), len(resized), len(touched)))
+            snapshot = cursor.lastrowid
+
+            # Changed rows go through a temporary table, so paths are interned with two set-based statements
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS pending (path TEXT, kind INTEGER, size INTEGER, mtime REAL)")
+            self.conn.execute("DELETE FROM pending")
+            self.conn.executemany("INSERT INTO pending VALUES (?, ?, ?, ?)", rows())
+            self.conn.execute("INSERT OR IGNORE INTO paths (path) SELECT path FROM pending")
+            self.conn.execute("INSERT INTO changes SELECT ?, paths.id, kind, size, mtime "
+                              "FROM pending JOIN paths ON paths.path = pending.path", (snapshot,))
+            self.conn.execute("DELETE FROM pending")
+
+            old_extensions = extension_totals(head) if head is not None else {}
+            for ext, (files, total, allocated) in _deltas(old_extensions, extension_totals(table)):
+                self.conn.execute("INSERT OR IGNORE INTO extensions (extension) VALUES (?)", (ext,))
+                self.conn.execute("INSERT INTO extension_history SELECT id, ?, ?, ?, ? FROM extensions "
+                                  "WHERE extension = ?", (snapshot, files, total, allocated, ext))
+
+            old_directories = directory_totals(head, head_root)
+            for directory, (files, total, allocated) in _deltas(old_directories, directory_totals(table, root)):
+                self.conn.execute("INSERT OR IGNORE INTO directories (path, depth) VALUES (?, ?)",
+                                  (directory, _depth(directory)))
+                self.conn.execute("INSERT INTO directory_history SELECT id, ?, ?, ?, ? FROM directories "
+                                  "WHERE path = ?", (snapshot, files, total, allocated, directory))
+
+            # The new head is written before the commit and swapped in right after it
+            tmp_head = self.head_path + ".tmp"
+            save_snapshot(table, tmp_head, {"history_snapshot": snapshot}, root)
+        os.replace(tmp_head, self.head_path)
+        return snapshot
+
+    # --- Queries ---
+    def snapshots(self, last=None):
+        query = ("SELECT id, taken_at, label, files, bytes, allocated, added, removed, resized, touched "
+                 "FROM snapshots ORDER BY id DESC")
+        rows = self.conn.execute(query + (" LIMIT ?" if last else ""), (last,) if last else ()).fetchall()
+        names = ("id", "taken_at", "label", "files", "bytes", "allocated", "added", "removed", "resized", "touched")
+        return [dict(zip(names, row)) for row in reversed(rows)]
+
+    def _window(self, last, per=None):
+        # (snapshot id, taken_at) of the last `last` snapshots, oldest first; with
+        # per="day" or "week" only the latest snapshot of each period is kept
+        rows = self.conn.execute("SELECT id, taken_at FROM snapshots ORDER BY id DESC LIMIT ?", (last,)).fetchall()
+        rows.reverse()
+        if per is None:
+            return rows
+        if per not in ("day", "week"):
+            raise ValueError(f"Unknown period: {per}")
+        periods = {}
+        for snapshot, taken_at in rows:
+            date = datetime.date.fromtimestamp(taken_at)
+            key = date if per == "day" else date - datetime.timedelta(days=date.weekday())
+            periods[key] = (snapshot, taken_at)
+        return list(periods.values())
+
+    def _series(self, history_table, key_column, key_id, window, metric):
+        # Forward-fills a delta-encoded key over the window: the rows inside it
+        # plus the last row before it are all that is read
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+        if not window:
+            return []
+        first, last = window[0][0], window[-1][0]
+        rows = []
+        if key_id is not None:
+            rows = self.conn.execute(
+                f"SELECT snapshot, {metric} FROM {history_table} WHERE {key_column} = ? AND snapshot > ? AND snapshot <= ? "
+                f"ORDER BY snapshot", (key_id, first, last)).fetchall()
+            before = self.conn.execute(
+                f"SELECT snapshot, {metric} FROM {history_table} WHERE {key_column} = ? AND snapshot <= ? "
+                f"ORDER BY snapshot DESC LIMIT 1", (key_id, first)).fetchone()
+            if before:
+                rows.insert(0, before)
+        series = []
+        value = 0
+        position = 0
+        for snapshot, taken_at in window:
+            while position < len(rows) and rows[position][0] <= snapshot:
+                value = rows[position][1]
+                position += 1
+            series.append((snapshot, taken_at, value))
+        return series
+
+    def extension_trend(self, extension, last=90, per=None, metric="bytes"):
+        # [(snapshot id, taken_at, value)] of one extension over the last `last` snapshots
+        row = self.conn.execute("SELECT id FROM extensions WHERE extension = ?", (_extension_key(extension),)).fetchone()
+        return self._series("extension_history", "extension_id", row[0] if row else None,
+                            self._window(last, per), metric)
+
+    def directory_trend(self, directory, last=90, per=None, metric="bytes"):
+        # Root-relative, "" or "." for the root itself
+        directory = os.path.normpath(directory) if directory else os.curdir
+        row = self.conn.execute("SELECT id FROM directories WHERE path = ?",
+                                ("" if directory == os.curdir else directory,)).fetchone()
+        return self._series("directory_history", "directory_id", row[0] if row else None,
+                            self._window(last, per), metric)
+
+    def totals_trend(self, last=90, per=None, metric="bytes"):
+        if metric not in METRICS:
+            raise ValueError(f"Unknown metric: {metric}")
+        window = self._window(last, per)
+        values = dict(self.conn.execute(f"SELECT id, {metric} FROM snapshots WHERE id >= ?",
+                                        (window[0][0] if window else 0,)).fetchall())
+        return [(snapshot, taken_at, values[snapshot]) for snapshot, taken_at in window]
+
+    def _growth(self, history_table, key_table, key_column, label_column, last, top, extra_filter="", params=()):
+        window = self._window(last)
+        if len(window) < 2:
+            return []
+        (first, first_time), (end, end_time) = window[0], window[-1]
+        days = max((end_time - first_time) / SECONDS_PER_DAY, 1e-9)
+        # Only keys with a row inside the window can have changed
+        query = f"""
+            WITH changed AS (SELECT DISTINCT {key_column} AS key FROM {history_table}
+                             WHERE snapshot > :first AND snapshot <= :end)
+            SELECT k.{label_column},
+                   COALESCE((SELECT bytes FROM {history_table} WHERE {key_column} = changed.key AND snapshot <= :first
+                             ORDER BY snapshot DESC LIMIT 1), 0) AS before,
+                   (SELECT bytes FROM {history_table} WHERE {key_column} = changed.key AND snapshot <= :end
+                    ORDER BY snapshot DESC LIMIT 1) AS after
+            FROM changed JOIN {key_table} k ON k.id = changed.key {extra_filter}
+            ORDER BY after - before DESC LIMIT :top"""
+        rows = self.conn.execute(query, {"first": first, "end": end, "top": top, **dict(params)}).fetchall()
+        return [{"key": label, "bytes_before": before, "bytes_after": after, "growth_bytes": after - before,
+                 "growth_bytes_per_day": (after - before) / days,
+                 "growth_ratio": after / before if before else None}
+                for label, before, after in rows]
+
+    def fastest_growing_directories(self, last=30, top=10, depth=None):
+        # Largest byte growth between the first and last of the last `last` snapshots;
+        # depth restricts to directories that many levels below the root
+        extra, params = ("WHERE k.depth = :depth", {"depth": depth}) if depth is not None else ("", {})
+        return self._growth("directory_history", "directories", "directory_id", "path", last, top, extra, params)
+
+    def fastest_growing_extensions(self, last=30, top=10):
+        return self._growth("extension_history", "extensions", "extension_id", "extension", last, top)
+
+    def path_history(self, path):
+        # [(snapshot id, taken_at, kind, size, mtime)] for one root-relative file path
+        rows = self.conn.execute(
+            "SELECT c.snapshot, s.taken_at, c.kind, c.size, c.mtime FROM changes c "
+            "JOIN paths p ON p.id = c.path_id JOIN snapshots s ON s.id = c.snapshot "
+            "WHERE p.path = ? ORDER BY c.snapshot", (_path_key(path),)).fetchall()
+        return [(snapshot, taken_at, CHANGE_KINDS[kind], size, mtime) for snapshot, taken_at, kind, size, mtime in rows]
+
+    def storage_rows(self):
+        # Row counts per table: what the store actually holds
+        tables = ("snapshots", "paths", "changes", "extension_history", "directory_history")
+        return {table: self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0] for table in tables}
+
+
+def add_to_history(store_path, source, label=None, taken_at=None, **scan_kwargs):
+    # source: a folder to scan, or an existing .fsnap snapshot
+    if is_snapshot(source):
+        header, table = load_snapshot(source)
+        root = header.get("root")
+        if taken_at is None:
+            scan_date = (header.get("export") or {}).get("system_info", {}).get("scan_date")
+            taken_at = datetime.datetime.fromisoformat(scan_date).timestamp() if scan_date else os.path.getmtime(source)
+    else:
+        from scanner import scan_files
+        table, root = scan_files(source, **scan_kwargs), source
+    with SnapshotHistory(store_path) as history:
+        return history.append(table, root, taken_at, label)
+
+
+def _format_time(taken_at):
+    return datetime.datetime.fromtimestamp(taken_at).strftime("%Y-%m-%d %H:%M")
+
+
+def _print_series(title, series, metric):
+    print(f"\n=== {title} ===")
+    for snapshot, taken_at, value in series:
+        shown = f"{value / (1024 * 1024):12.2f} MB" if metric != "files" else f"{value:12,} files"
+        print(f"  #{snapshot:<5} {_format_time(taken_at)}  {shown}")
+
+
+def _print_growth(title, rows, empty_key):
+    print(f"\n=== {title} ===")
+    for row in rows:
+        ratio = f"{row['growth_ratio']:.2f}x" if row["growth_ratio"] else "new"
+        print(f"  {row['growth_bytes'] / (1024 * 1024):+12.2f} MB ({row['growth_bytes_per_day'] / (1024 * 1024):+10.2f} MB/day, "
+              f"{ratio:>7}) | {row['key'] or empty_key}")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Snapshot history: append scans, query trends")
+    parser.add_argument("store", help="History store directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="Scan a folder (or load a .fsnap) and append it")
+    add.add_argument("source")
+    add.add_argument("--label")
+
+    listing = commands.add_parser("list", help="Snapshots with their totals and change counts")
+    listing.add_argument("--last", type=int)
+
+    for name, help_text in (("extension", "Trend of one extension"), ("directory", "Trend of one directory"),
+                            ("totals", "Trend of the whole tree")):
+        trend = commands.add_parser(name, help=help_text)
+        if name != "totals":
+            trend.add_argument("key", help="e.g. .wav, or a root-relative directory")
+        trend.add_argument("--last", type=int, default=90)
+        trend.add_argument("--per", choices=["day", "week"])
+        trend.add_argument("--metric", choices=METRICS, default="bytes")
+
+    growth = commands.add_parser("growth", help="Fastest-growing directories and extensions")
+    growth.add_argument("--last", type=int, default=30)
+    growth.add_argument("--top", type=int, default=10)
+    growth.add_argument("--depth", type=int, help="Only directories at this depth below the root")
+
+    path = commands.add_parser("path", help="Change history of one root-relative file")
+    path.add_argument("path")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.command == "add":
+        snapshot = add_to_history(args.store, args.source, args.label)
+        print(f"\nAppended snapshot #{snapshot} to {args.store}")
+        return 0
+
+    if not os.path.exists(os.path.join(args.store, DB_NAME)):
+        print(f"No history at: {args.store}")
+        return 1
+    with SnapshotHistory(args.store) as history:
+        if args.command == "list":
+            print(f"{'#':>5} {'Taken':<17} {'Files':>10} {'Size (GB)':>10} {'Added':>8} {'Removed':>8} "
+                  f"{'Resized':>8} {'Touched':>8}  Label")
+            for s in history.snapshots(args.last):
+                print(f"{s['id']:>5} {_format_time(s['taken_at']):<17} {s['files']:>10,} {s['bytes'] / 1024 ** 3:>10.2f} "
+                      f"{s['added']:>8,} {s['removed']:>8,} {s['resized']:>8,} {s['touched']:>8,}  {s['label'] or ''}")
+        elif args.command == "extension":
+            _print_series(f"{args.key} {args.metric.upper()}",
+                          history.extension_trend(args.key, args.last, args.per, args.metric), args.metric)
+        elif args.command == "directory":
+            _print_series(f"{args.key} {args.metric.upper()}",
+                          history.directory_trend(args.key, args.last, args.per, args.metric), args.metric)
+        elif args.command == "totals":
+            _print_series(f"TOTAL {args.metric.upper()}", history.totals_trend(args.last, args.per, args.metric),
+                          args.metric)
+        elif args.command == "growth":
+            _print_growth(f"FASTEST-GROWING DIRECTORIES (LAST {args.last} SNAPSHOTS)",
+                          history.fastest_growing_directories(args.last, args.top, args.depth), "(root)")
+            _print_growth(f"FASTEST-GROWING EXTENSIONS (LAST {args.last} SNAPSHOTS)",
+                          history.fastest_growing_extensions(args.last, args.top), "no_ext")
+        elif args.command == "path":
+            for snapshot, taken_at, kind, size, mtime in history.path_history(args.path):
+                print(f"  #{snapshot:<5} {_format_time(taken_at)}  {kind:<8} {size if size is not None else '-':>14}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,64 @@
+import threading
+from array import array
+
+# Set of (st_dev, st_ino) pairs, for counting every hard-linked inode once.
+# Devices get small ids, and (device id, inode) packs into one 64-bit key
+# stored in an open-addressing table of raw uint64 slots (0 = empty) kept at
+# most half full: 8-16 bytes per inode, against ~100 for a set of tuples.
+# Scanners only add files with st_nlink > 1, so the table stays small unless
+# the tree really holds tens of millions of hard links. Inode numbers too wide
+# to pack (>= 2**48) fall back to a plain set.
+INODE_BITS = 48
+MAX_DEVICES = 1 << 15
+MULTIPLIER = 0x9E3779B97F4A7C15
+MASK64 = (1 << 64) - 1
+
+
+class InodeSet:
+    def __init__(self, capacity=1024):
+        self.bits = max(capacity - 1, 1).bit_length()
+        self.slots = array('Q', bytes(8 << self.bits))
+        self.count = 0
+        self.devices = {}
+        self.overflow = set()
+        # Parallel crawlers share one set; only hard-linked files ever take the lock
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return self.count + len(self.overflow)
+
+    def add(self, dev, ino):
+        # True when (dev, ino) was not in the set yet
+        with self.lock:
+            dev_id = self.devices.setdefault(dev, len(self.devices) + 1)
+            if ino >> INODE_BITS or dev_id >= MAX_DEVICES:
+                before = len(self.overflow)
+                self.overflow.add((dev, ino))
+                return len(self.overflow) > before
+            return self._insert(dev_id << INODE_BITS | ino)
+
+    def _insert(self, key):
+        slots = self.slots
+        mask = len(slots) - 1
+        slot = ((key * MULTIPLIER) & MASK64) >> (64 - self.bits)
+        while True:
+            current = slots[slot]
+            if current == key:
+                return False
+            if not current:
+                break
+            slot = (slot + 1) & mask
+        slots[slot] = key
+        self.count += 1
+        if self.count * 2 > len(slots):
+            self._grow()
+        return True
+
+    def _grow(self):
+        old = self.slots
+        self.bits += 1
+        self.slots = array('Q', bytes(8 << self.bits))
+        self.count = 0
+        for key in old:
+            if key:
+                self._insert(key)
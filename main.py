@@ -1,13 +1,18 @@
-from scanner import scan_files
-from pdf_cdf import calculate_pdf, calculate_cdf
-from plotter import plot_both, plot_size_distribution_log
-from analyze import (analyze_extensions, analyze_by_extension_size,
-                     calculate_statistics, find_large_files, analyze_time_distribution)
-from export_results import export_to_json, create_summary_report
-import numpy as np
+import argparse
+import contextlib
+import datetime
 import os
 import platform
-import datetime
+import sys
+
+import metrics
+
+# Only the standard library is imported up front. NumPy (through the scanner),
+# matplotlib (through plotter) and the optional engines are imported by the
+# step that needs them, so --help, argument errors and runs without plots do
+# not pay for them. `python benchmark.py startup` keeps an eye on that cost.
+ANALYSES = ("questions", "stats", "extensions", "sizes", "duplicates", "large", "directories", "years", "plots")
+DEFAULT_ANALYSES = [name for name in ANALYSES if name != "duplicates"]
 
 
 # --- Helper Functions ---
@@ -19,120 +24,385 @@ def bytes_to_gb(x):
     return round(x / (1024 * 1024 * 1024), 2)
 
 
-print("\n" + "=" * 70)
-print("FILE SYSTEM ANALYZER - CS350 PROJECT")
-print("=" * 70)
-print(f"\nSystem: {platform.system()}")
-print(f"Date: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-print("=" * 70)
-print("\nScan Options:")
-print("  1. Quick scan - Enter a specific folder path")
-print("  2. Scan current user folder (recommended for project)")
-print("  3. Exit")
-
-choice = input("\nSelect option (1/2/3): ").strip()
-
-if choice == "1":
-    folder = input("\nEnter folder path: ").strip()
-elif choice == "2":
-    folder = os.path.expanduser("~")
-    print(f"\nUser folder selected: {folder}")
-    confirm = input(f"Continue? (y/n): ").strip().lower()
-    if confirm != 'y':
-        print("Cancelled.")
-        exit()
-elif choice == "3":
-    print("Goodbye!")
-    exit()
-else:
-    print("Invalid option.")
-    exit()
-
-if not os.path.isdir(folder):
-    print("\nInvalid directory.\n")
-    exit()
-
-print(f"\nScanning: {folder}\n")
-
-MAX_FILES = None
-file_data = scan_files(folder, max_files=MAX_FILES)
-
-if not file_data:
-    print("No files were found or folders could not be read.!")
-    exit()
-
-file_sizes = [f["size"] for f in file_data]
-
-total_files = len(file_sizes)
-total_size = sum(file_sizes)
-
-print(f"Total files: {total_files}")
-print(f"Total size: {bytes_to_gb(total_size)} GB")
-
-counts, bins = calculate_pdf(file_sizes)
-sorted_sizes, cdf = calculate_cdf(file_sizes)
-
-print("\nCalculating PDF and CDF...\n")
-size_100kb = 100 * 1024
-idx = np.searchsorted(sorted_sizes, size_100kb)
-cdf_100kb = cdf[idx] if idx < len(cdf) else 1.0
-
-answer1 = "YES" if cdf_100kb >= 0.9 else "NO"
-
-print("QUESTION 1: Are 90% of files smaller than 100KB?")
-print(f"CDF(100KB) = {cdf_100kb * 100:.2f}% → ANSWER: {answer1}\n")
-
-# --- Question 2: Do the largest 10% of files use 90% of disk space? ---
-largest_10_count = int(len(file_sizes) * 0.10)
-largest_sizes_sum = sum(sorted_sizes[-largest_10_count:])
-
-percentage = (largest_sizes_sum / total_size) * 100
-answer2 = "YES" if percentage >= 90 else "NO"
-
-print("QUESTION 2: Do the largest 10% of files occupy 90% of disk space?")
-print(f"Largest 10% files = {bytes_to_gb(largest_sizes_sum)} GB ({percentage:.2f}%) → ANSWER: {answer2}")
-
-print("\n" + "=" * 60)
-print("ANALYSIS")
-print("=" * 60)
-
-calculate_statistics(file_sizes)
-analyze_extensions(file_data, top_n=20)
-analyze_by_extension_size(file_data, top_n=20)
-find_large_files(file_data, threshold_mb=50)
-analyze_time_distribution(file_data)
-
-print("\n" + "=" * 60)
-print("CREATING GRAPHS...")
-print("=" * 60)
-
-try:
-    print("\n1. PDF and CDF graphs (normal scale)...")
-    plot_both(counts, bins, sorted_sizes, cdf)
-
-    print("\n2. PDF and CDF graphs (log scale)...")
-    plot_size_distribution_log(counts, bins, sorted_sizes, cdf)
-
-    print("\nGraphs created!")
-except Exception as e:
-    print(f"\nError creating graphs: {e}")
-
-print("\n" + "=" * 60)
-print("SAVING TO JSON...")
-print("=" * 60)
-
-timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
-system_name = platform.system().lower()
-output_filename = f"scan_results_{system_name}_{timestamp}.json"
-
-export_data = export_to_json(file_data, output_filename)
-
-if export_data:
-    create_summary_report(export_data)
-
-print("\n" + "=" * 60)
-print("DONE!")
-print("=" * 60)
-print(f"\nResults saved to: {output_filename}")
-print(f"\nTo compare: python compare_systems.py {output_filename} <other.json>")
-print("=" * 60)
+def build_parser():
+    parser = argparse.ArgumentParser(
+        description="Scan folders, answer the file-size distribution questions and export the results.",
+        epilog="Without ROOT arguments the interactive menu asks for a folder.")
+    parser.add_argument("roots", nargs="*", metavar="ROOT", help="Folders to scan")
+
+    scan = parser.add_argument_group("scanning")
+    scan.add_argument("--engine", choices=["walk", "parallel", "process", "async"], default="walk")
+    scan.add_argument("--workers", type=int, help="Threads/processes, or calls in flight for --engine async")
+    scan.add_argument("--max-files", type=int)
+    scan.add_argument("--index", metavar="PATH", help="Reuse unchanged directories from the previous run's index")
+    scan.add_argument("--checkpoint", metavar="PATH", help="Checkpoint long scans so an interrupted one can be resumed")
+    scan.add_argument("--resume", action="store_true",
+                      help="Continue the interrupted scan saved in --checkpoint instead of starting over")
+    scan.add_argument("--stream", type=int, metavar="BATCH_SIZE",
+                      help="Stream batches into the summary: memory stays constant, no per-file analyses "
+                           "(not with --engine, --index, --checkpoint, --history or --format snapshot/both)")
+    scan.add_argument("--sample", type=float, metavar="TARGET_ERROR",
+                      help="Estimate by sampling directories instead of a full scan (e.g. 0.05)")
+
+    filters = parser.add_argument_group("filters, applied while scanning")
+    filters.add_argument("--include", nargs="+", default=[], metavar="GLOB")
+    filters.add_argument("--exclude", nargs="+", default=[], metavar="GLOB")
+    filters.add_argument("--ignore-file", metavar="PATH", help="gitignore-style rules")
+    filters.add_argument("--min-size", metavar="SIZE", help="e.g. 1KB, 50MB")
+    filters.add_argument("--max-size", metavar="SIZE")
+    filters.add_argument("--modified-after", metavar="DATE", help="YYYY, YYYY-MM or YYYY-MM-DD")
+    filters.add_argument("--modified-before", metavar="DATE")
+    filters.add_argument("--max-depth", type=int)
+
+    analysis = parser.add_argument_group("analysis")
+    analysis.add_argument("--analyses", nargs="+", choices=ANALYSES, default=DEFAULT_ANALYSES, metavar="NAME",
+                          help=f"Any of: {', '.join(ANALYSES)} (default: all but duplicates)")
+    analysis.add_argument("--percentile-mode", choices=["exact", "sketch"], default="exact",
+                          help="sketch: percentiles and CDF from the size sketch (always used with --stream)")
+    analysis.add_argument("--sketch-accuracy", type=float, default=0.01, help="Relative error bound of the size sketch")
+    analysis.add_argument("--directory-depth", type=int, default=1,
+                          help="Depth of the heaviest-directories report (the scan root is depth 0)")
+    analysis.add_argument("--hash-cache", metavar="PATH", help="Skip re-hashing unchanged files on the next run")
+
+    output = parser.add_argument_group("output")
+    output.add_argument("--format", choices=["json", "snapshot", "both", "none"], default="json",
+                        help="snapshot: the full per-file table as a binary .fsnap (not with --stream)")
+    output.add_argument("--output", metavar="PREFIX",
+                        help="Output file name without extension (default: scan_results_<os>_<timestamp>)")
+    output.add_argument("--history", metavar="STORE",
+                        help="Also append this scan to a snapshot history store (see history.py; not with --stream)")
+    output.add_argument("--plot-dir", metavar="DIR",
+                        help="Write the graphs to DIR as files instead of opening windows "
+                             "(default on machines without a display: next to the results)")
+    output.add_argument("--plot-format", choices=["png", "svg"], default="png")
+
+    instrumentation = parser.add_argument_group("instrumentation")
+    instrumentation.add_argument("--metrics", metavar="PATH",
+                                 help="Write phase times, throughput, slowest directories and stat latencies as JSON")
+    instrumentation.add_argument("--profile", choices=metrics.PROFILE_MODES,
+                                 help="Profile the run: cprofile (exact, slower) or sample (stack sampling)")
+    instrumentation.add_argument("--top-dirs", type=int, default=20, help="Slowest directories to keep")
+    return parser
+
+
+def choose_folder():
+    print("\nScan Options:")
+    print("  1. Quick scan - Enter a specific folder path")
+    print("  2. Scan current user folder (recommended for project)")
+    print("  3. Exit")
+
+    choice = input("\nSelect option (1/2/3): ").strip()
+
+    if choice == "1":
+        return input("\nEnter folder path: ").strip()
+    elif choice == "2":
+        folder = os.path.expanduser("~")
+        print(f"\nUser folder selected: {folder}")
+        confirm = input(f"Continue? (y/n): ").strip().lower()
+        if confirm != 'y':
+            print("Cancelled.")
+            return None
+        return folder
+    elif choice == "3":
+        print("Goodbye!")
+    else:
+        print("Invalid option.")
+    return None
+
+
+def build_filter(args):
+    if not (args.include or args.exclude or args.ignore_file or args.max_depth is not None or
+            any(value is not None for value in (args.min_size, args.max_size,
+                                                args.modified_after, args.modified_before))):
+        return None
+    from scan_filter import ScanFilter, load_ignore_file
+    from search_index import parse_date, parse_size
+    return ScanFilter(include=args.include, exclude=args.exclude,
+                      ignore_rules=load_ignore_file(args.ignore_file) if args.ignore_file else (),
+                      min_size=parse_size(args.min_size) if args.min_size else None,
+                      max_size=parse_size(args.max_size) if args.max_size else None,
+                      modified_after=parse_date(args.modified_after) if args.modified_after else None,
+                      modified_before=parse_date(args.modified_before) if args.modified_before else None,
+                      max_depth=args.max_depth)
+
+
+def scan(args, roots, scan_filter):
+    # (file_data, summary): file_data is the ScanTable, or the summary itself when streaming;
+    # (None, None) when a checkpoint cannot be resumed
+    from aggregate import summarize, summarize_stream
+    if args.stream:
+        import itertools
+        from scanner import iter_scan_batches
+        # Streaming: only the summary (with its size sketch) survives the scan
+        batches = itertools.chain.from_iterable(
+            iter_scan_batches(root, args.stream, max_files=args.max_files, scan_filter=scan_filter) for root in roots)
+        summary = summarize_stream(batches, relative_accuracy=args.sketch_accuracy)
+        return summary, summary
+
+    from scan_table import ScanTable
+    from scanner import scan_files
+    tables = []
+    for i, root in enumerate(roots):
+        checkpoint = args.checkpoint
+        if checkpoint and len(roots) > 1:
+            checkpoint = f"{checkpoint}.{i}"
+        try:
+            tables.append(scan_files(root, max_files=args.max_files, engine=args.engine, workers=args.workers,
+                                     index_path=args.index, scan_filter=scan_filter,
+                                     checkpoint_path=checkpoint, resume=args.resume))
+        except ValueError as e:
+            if not checkpoint:
+                raise
+            # Wrong root or not a checkpoint file at all
+            print(f"\nCannot resume: {e}\n")
+            return None, None
+    file_data = ScanTable.concat(tables)
+    # One aggregation pass shared by every report below and by the JSON export
+    return file_data, summarize(file_data, relative_accuracy=args.sketch_accuracy)
+
+
+def answer_questions(summary, file_sizes, use_sketch):
+    import numpy as np
+    from pdf_cdf import calculate_cdf
+
+    print("\nCalculating PDF and CDF...\n")
+    sorted_sizes, cdf = calculate_cdf(file_sizes)
+    size_100kb = 100 * 1024
+    idx = np.searchsorted(sorted_sizes, size_100kb)
+    cdf_100kb = cdf[idx] if idx < len(cdf) else 1.0
+
+    answer1 = "YES" if cdf_100kb >= 0.9 else "NO"
+
+    print("QUESTION 1: Are 90% of files smaller than 100KB?")
+    print(f"CDF(100KB) = {cdf_100kb * 100:.2f}% → ANSWER: {answer1}\n")
+
+    # --- Question 2: Do the largest 10% of files use 90% of disk space? ---
+    if use_sketch:
+        largest_sizes_sum = int(summary.sketch.top_sum(0.10))
+    else:
+        largest_10_count = int(len(file_sizes) * 0.10)
+        largest_sizes_sum = int(sorted_sizes[-largest_10_count:].sum())
+
+    percentage = (largest_sizes_sum / summary.total_size) * 100
+    answer2 = "YES" if percentage >= 90 else "NO"
+
+    print("QUESTION 2: Do the largest 10% of files occupy 90% of disk space?")
+    print(f"Largest 10% files = {bytes_to_gb(largest_sizes_sum)} GB ({percentage:.2f}%) → ANSWER: {answer2}")
+
+
+def run_analyses(args, file_data, summary, file_sizes, use_sketch):
+    from analyze import (analyze_extensions, analyze_by_extension_size, analyze_duplicates, analyze_directories,
+                         calculate_statistics, find_large_files, analyze_time_distribution)
+    selected = set(args.analyses)
+    streaming = bool(args.stream)
+
+    print("\n" + "=" * 60)
+    print("ANALYSIS")
+    print("=" * 60)
+
+    duplicates = None
+    if "duplicates" in selected and not streaming:
+        from duplicates import find_duplicates
+        with metrics.phase("duplicates"):
+            duplicates = find_duplicates(file_data, cache_path=args.hash_cache)
+
+    if "stats" in selected:
+        with metrics.phase("stats"):
+            calculate_statistics(summary if use_sketch else file_sizes)
+    if "extensions" in selected:
+        with metrics.phase("extensions"):
+            analyze_extensions(summary, top_n=20)
+    if "sizes" in selected:
+        with metrics.phase("sizes"):
+            analyze_by_extension_size(summary, top_n=20, duplicates=duplicates)
+    if duplicates:
+        analyze_duplicates(duplicates, top_n=10)
+    if "large" in selected:
+        with metrics.phase("large"):
+            find_large_files(summary, threshold_mb=50)
+    if "directories" in selected and not streaming:
+        with metrics.phase("directories"):
+            analyze_directories(file_data, depth=args.directory_depth, top_n=10)
+    if "years" in selected:
+        with metrics.phase("years"):
+            analyze_time_distribution(summary)
+
+
+def has_display():
+    if sys.platform in ("win32", "darwin"):
+        return True
+    return bool(os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY"))
+
+
+def create_graphs(file_sizes, plot_prefix=None, plot_format="png"):
+    # plot_prefix: render to <plot_prefix>_pdf_cdf.<format> and <plot_prefix>_log.<format>
+    # with the Agg backend instead of opening windows
+    print("\n" + "=" * 60)
+    print("CREATING GRAPHS...")
+    print("=" * 60)
+
+    written = []
+    try:
+        from pdf_cdf import plot_data
+        from plotter import plot_both, plot_size_distribution_log, render_plots
+        # Fixed-size bins and CDF points: the plotter never sees the per-file array
+        data = plot_data(file_sizes)
+
+        if plot_prefix:
+            print(f"\nRendering PDF and CDF graphs (normal and log scale) to {plot_format.upper()} files...")
+            written = render_plots(data, plot_prefix, plot_format)
+        else:
+            print("\n1. PDF and CDF graphs (normal scale)...")
+            plot_both(data["counts"], data["bins"], data["cdf_sizes"], data["cdf"])
+
+            print("\n2. PDF and CDF graphs (log scale)...")
+            plot_size_distribution_log(data["log_counts"], data["log_bins"], data["cdf_sizes"], data["cdf"])
+
+        print("\nGraphs created!")
+    except Exception as e:
+        print(f"\nError creating graphs: {e}")
+    return written
+
+
+def export(args, roots, file_data, summary, prefix):
+    from export_results import export_to_json, export_to_snapshot, create_summary_report
+
+    print("\n" + "=" * 60)
+    print("SAVING TO JSON...")
+    print("=" * 60)
+
+    written = []
+
+    export_data = None
+    if args.format in ("json", "both"):
+        export_data = export_to_json(summary, prefix + ".json")
+        written.append(prefix + ".json")
+    if args.format in ("snapshot", "both"):
+        root = roots[0] if len(roots) == 1 else os.path.commonpath(roots)
+        export_data = export_to_snapshot(file_data, prefix + ".fsnap", root=root) or export_data
+        written.append(prefix + ".fsnap")
+
+    if export_data:
+        create_summary_report(export_data)
+    return written
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.sample and len(args.roots) > 1:
+        parser.error("--sample takes a single root")
+    if args.resume and not args.checkpoint:
+        parser.error("--resume needs --checkpoint")
+    if args.stream:
+        # The streaming crawler is sequential and keeps no per-file table to index,
+        # checkpoint, write as a snapshot or append to a history store
+        for option, given in (("--engine", args.engine != "walk"), ("--index", args.index),
+                              ("--checkpoint", args.checkpoint), ("--history", args.history),
+                              (f"--format {args.format}", args.format in ("snapshot", "both"))):
+            if given:
+                parser.error(f"--stream cannot be combined with {option}")
+
+    print("\n" + "=" * 70)
+    print("FILE SYSTEM ANALYZER - CS350 PROJECT")
+    print("=" * 70)
+    print(f"\nSystem: {platform.system()}")
+    print(f"Date: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+    print("=" * 70)
+
+    roots = args.roots
+    if not roots:
+        folder = choose_folder()
+        if folder is None:
+            return 0
+        roots = [folder]
+
+    for root in roots:
+        if not os.path.isdir(root):
+            print(f"\nInvalid directory: {root}\n")
+            return 1
+
+    recorder = None
+    if args.metrics or args.profile:
+        recorder = metrics.Metrics(top_n=args.top_dirs, profile=args.profile)
+    with recorder or contextlib.nullcontext():
+        status = run_pipeline(args, roots)
+    if recorder:
+        recorder.print_report()
+        if args.metrics:
+            recorder.write(args.metrics)
+    return status
+
+
+def run_pipeline(args, roots):
+    print(f"\nScanning: {', '.join(roots)}\n")
+    scan_filter = build_filter(args)
+
+    if args.sample:
+        # Estimates with 95% confidence intervals only: there is no per-file table to plot or export
+        from sampling import sample_scan, print_estimate
+        with metrics.phase("sample"):
+            estimate = sample_scan(roots[0], target_error=args.sample, scan_filter=scan_filter)
+        print_estimate(estimate)
+        return 0
+
+    with metrics.phase("scan"):
+        file_data, summary = scan(args, roots, scan_filter)
+    if file_data is None:
+        return 1
+    if not file_data:
+        print("No files were found or folders could not be read.!")
+        return 1
+
+    use_sketch = bool(args.stream) or args.percentile_mode == "sketch"
+    file_sizes = summary.sketch if use_sketch else file_data.size
+
+    print(f"Total files: {summary.total_files}")
+    print(f"Total size: {bytes_to_gb(summary.total_size)} GB")
+    print(f"Allocated on disk: {bytes_to_gb(summary.total_allocated)} GB (hard links counted once, like du)")
+
+    if "questions" in args.analyses:
+        with metrics.phase("questions"):
+            answer_questions(summary, file_sizes, use_sketch)
+    with metrics.phase("analysis"):
+        run_analyses(args, file_data, summary, file_sizes, use_sketch)
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    prefix = args.output or f"scan_results_{platform.system().lower()}_{timestamp}"
+
+    plots = []
+    if "plots" in args.analyses:
+        plot_prefix = None
+        if args.plot_dir:
+            os.makedirs(args.plot_dir, exist_ok=True)
+            plot_prefix = os.path.join(args.plot_dir, os.path.basename(prefix))
+        elif not has_display():
+            plot_prefix = prefix
+        with metrics.phase("plots"):
+            plots = create_graphs(file_sizes, plot_prefix, args.plot_format)
+
+    written = []
+    if args.format != "none":
+        with metrics.phase("export"):
+            written = export(args, roots, file_data, summary, prefix)
+    if args.history:
+        from history import SnapshotHistory
+        root = roots[0] if len(roots) == 1 else os.path.commonpath(roots)
+        with metrics.phase("history"), SnapshotHistory(args.history) as history:
+            snapshot = history.append(file_data, root, label=args.output)
+        print(f"\nAppended snapshot #{snapshot} to history: {args.history}")
+
+    print("\n" + "=" * 60)
+    print("DONE!")
+    print("=" * 60)
+    for path in written:
+        print(f"\nResults saved to: {path}")
+        if path.endswith(".json"):
+            print(f"\nTo compare: python compare_systems.py {path} <other.json>")
+    for path in plots:
+        print(f"\nGraph saved to: {path}")
+    print("=" * 60)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
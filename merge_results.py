@@ -0,0 +1,120 @@
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from aggregate import ScanSummary
+from compare_systems import compare_two_systems, load_result
+from export_results import build_export_data, create_summary_report
+
+# Combines results scanned separately (volumes, hosts, disjoint subtrees) into one
+# report without re-reading any raw data. Every JSON export and snapshot header
+# carries a "partial_summary" - the exact ScanSummary: per-extension counts and
+# bytes, year histogram, moments, top-K largest files and size sketch - and every
+# part of it merges by addition, so the merge is associative and commutative.
+# Inputs are split into one chunk per worker, each worker folds its chunk, and the
+# chunk results are folded again. The merged file is a regular export (it has its
+# own partial_summary), so create_summary_report, compare_systems.py and further
+# merges take it like any other result.
+
+
+def load_partial(filepath):
+    # (ScanSummary, [system_info of every scan folded into it])
+    data = load_result(filepath)
+    if not data:
+        raise ValueError(f"Cannot read result: {filepath}")
+    if "partial_summary" not in data:
+        raise ValueError(f"{filepath} has no partial_summary; re-export it with this version")
+    sources = data.get("sources") or [data["system_info"]]
+    return ScanSummary.from_dict(data["partial_summary"]), sources
+
+
+def merge_partials(partials):
+    # Folds (summary, sources) pairs into a new pair; inputs are left unchanged
+    merged, sources = None, []
+    for summary, summary_sources in partials:
+        if merged is None:
+            merged = ScanSummary(summary.top_k, summary.sketch.relative_accuracy)
+        merged.merge(summary)
+        sources.extend(summary_sources)
+    return merged, sources
+
+
+def _merge_chunk(paths):
+    summary, sources = merge_partials(load_partial(path) for path in paths)
+    return summary.to_dict(), sources
+
+
+def merge_files(paths, workers=None):
+    workers = max(1, min(workers or os.cpu_count() or 1, len(paths)))
+    if workers == 1:
+        return merge_partials(load_partial(path) for path in paths)
+    chunks = [paths[i::workers] for i in range(workers)]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_merge_chunk, chunks))
+    return merge_partials((ScanSummary.from_dict(data), sources) for data, sources in results)
+
+
+def build_merged_export(summary, sources):
+    def distinct(key):
+        return ", ".join(sorted({str(source.get(key, "?")) for source in sources}))
+
+    system_info = {
+        "os": distinct("os"),
+        "hostname": distinct("hostname"),
+        "platform": f"merged from {len(sources)} scans",
+        "architecture": distinct("architecture"),
+        "python_version": distinct("python_version"),
+        "scan_date": max(source.get("scan_date", "") for source in sources),
+    }
+    export_data = build_export_data(summary, system_info)
+    export_data["sources"] = sources
+    return export_data
+
+
+def print_merged_details(summary, sources, top_n=10):
+    print(f"\nMerged {len(sources)} scans:")
+    for source in sources:
+        print(f"  {source.get('hostname', '?'):<24} {source.get('os', '?'):<10} {source.get('scan_date', '?')}")
+    if summary.total_files:
+        sketch = summary.sketch
+        print(f"\nSize percentiles (+/-{sketch.relative_accuracy:.0%}): "
+              f"p50 {sketch.quantile(0.50) / 1024:,.1f} KB, p90 {sketch.quantile(0.90) / 1024:,.1f} KB, "
+              f"p99 {sketch.quantile(0.99) / (1024 * 1024):,.2f} MB")
+    print(f"\nLargest files (top-{min(top_n, len(summary.largest))}):")
+    for size, path in summary.largest[:top_n]:
+        print(f"  {size / (1024 * 1024):>12.2f} MB  {path}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge separately scanned results into one report")
+    parser.add_argument("results", nargs="+", help="JSON exports or .fsnap snapshots (or earlier merges)")
+    parser.add_argument("-o", "--output", default="merged_results.json")
+    parser.add_argument("--workers", type=int, help="Processes loading and folding inputs (default: CPU count)")
+    parser.add_argument("--compare", metavar="RESULT", help="Also compare the merged result against this one")
+    args = parser.parse_args(argv)
+
+    try:
+        summary, sources = merge_files(args.results, args.workers)
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    if not summary.total_files:
+        print("No files in the merged results!")
+        return 1
+
+    export_data = build_merged_export(summary, sources)
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(export_data, f, indent=2, ensure_ascii=False)
+    print(f"\n[SUCCESS] Merged results exported to: {args.output}")
+
+    create_summary_report(export_data)
+    print_merged_details(summary, sources)
+    if args.compare:
+        compare_two_systems(args.output, args.compare)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
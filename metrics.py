@@ -0,0 +1,226 @@
+import contextlib
+import heapq
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+# Run instrumentation: per-phase wall times, directory/file/error counters with a
+# per-second timeline, the slowest directories and a stat() latency histogram,
+# written as one JSON document. A Metrics object records only while it is the
+# active one (`with Metrics() as m:`); the scanner asks current() once per
+# directory and skips every measurement when it returns None, so the disabled
+# cost is one global read per directory and one None check per file.
+# Per-directory data comes from the crawlers that run in this process (walk,
+# parallel, streaming, checkpointed, incremental); the process and async engines
+# only show up in the phase times.
+HISTOGRAM_BUCKETS = 40  # stat latency buckets [2**k, 2**(k+1)) ns, k < 40 (~18 minutes)
+PROFILE_MODES = ("cprofile", "sample")
+
+_active = None
+_NULL_PHASE = contextlib.nullcontext()
+
+
+def current():
+    return _active
+
+
+def phase(name):
+    # Times a pipeline phase on the active recorder; a shared no-op context otherwise
+    return _active.phase(name) if _active is not None else _NULL_PHASE
+
+
+class Metrics:
+    def __init__(self, top_n=20, profile=None, sample_interval=0.005):
+        if profile not in (None,) + PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode: {profile}")
+        self.top_n = top_n
+        self.profile = profile
+        self.sample_interval = sample_interval
+        self.lock = threading.Lock()
+        self.phases = {}
+        self.phase_stack = []
+        self.dirs = 0
+        self.files = 0
+        self.errors = 0
+        self.stat_calls = 0
+        self.stat_histogram = [0] * HISTOGRAM_BUCKETS
+        self.timeline = {}
+        self.slowest = []
+        self.started = None
+        self.wall_time = None
+        self._profiler = None
+        self._sampler = None
+        self._samples = Counter()
+        self._stop_sampling = threading.Event()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def start(self):
+        global _active
+        _active = self
+        self.started = time.perf_counter()
+        if self.profile == "cprofile":
+            import cProfile
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        elif self.profile == "sample":
+            self._sampler = threading.Thread(target=self._sample, daemon=True)
+            self._sampler.start()
+        return self
+
+    def stop(self):
+        global _active
+        if self._profiler is not None:
+            self._profiler.disable()
+        if self._sampler is not None:
+            self._stop_sampling.set()
+            self._sampler.join()
+        self.wall_time = time.perf_counter() - self.started
+        if _active is self:
+            _active = None
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        # Nested phases are recorded under dotted names ("analysis.stats")
+        self.phase_stack.append(name)
+        key = ".".join(self.phase_stack)
+        # Registered on entry, so phases are listed in the order they started
+        self.phases.setdefault(key, 0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[key] += time.perf_counter() - start
+            self.phase_stack.pop()
+
+    def record_directory(self, path, seconds, files, errors=0, stat_ns=()):
+        # One listed directory: seconds spent listing and stat'ing it, files kept,
+        # errors hit, and the latency of every stat() call in nanoseconds
+        buckets = Counter(min(ns.bit_length(), HISTOGRAM_BUCKETS) - 1 for ns in stat_ns if ns > 0)
+        second = int(time.perf_counter() - self.started)
+        with self.lock:
+            self.dirs += 1
+            self.files += files
+            self.errors += errors
+            self.stat_calls += len(stat_ns)
+            for bucket, count in buckets.items():
+                self.stat_histogram[bucket] += count
+            row = self.timeline.setdefault(second, [0, 0, 0])
+            row[0] += 1
+            row[1] += files
+            row[2] += errors
+            item = (seconds, path, files)
+            if len(self.slowest) < self.top_n:
+                heapq.heappush(self.slowest, item)
+            elif item > self.slowest[0]:
+                heapq.heapreplace(self.slowest, item)
+
+    def count_error(self, error=None):
+        # Also usable as an os.walk onerror callback
+        with self.lock:
+            self.errors += 1
+            row = self.timeline.setdefault(int(time.perf_counter() - self.started), [0, 0, 0])
+            row[2] += 1
+
+    def _sample(self):
+        # Sampling profiler: every sample_interval, the stack of every other thread
+        # as a folded "outer;...;inner" line (flamegraph.pl / speedscope input)
+        own = threading.get_ident()
+        while not self._stop_sampling.wait(self.sample_interval):
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                self._samples[";".join(reversed(stack))] += 1
+
+    def stat_percentile(self, q):
+        # Upper bound of the histogram bucket holding the q-th quantile, in microseconds
+        total = sum(self.stat_histogram)
+        if not total:
+            return None
+        seen = 0
+        for bucket, count in enumerate(self.stat_histogram):
+            seen += count
+            if seen >= q * total:
+                return (1 << (bucket + 1)) / 1000
+        return None
+
+    def _profile_summary(self, limit=25):
+        if self._profiler is not None:
+            import pstats
+            stats = pstats.Stats(self._profiler).stats
+            rows = sorted(stats.items(), key=lambda item: item[1][3], reverse=True)[:limit]
+            return [{"function": f"{func} ({os.path.basename(filename)}:{line})", "calls": calls,
+                     "total_seconds": round(tottime, 6), "cumulative_seconds": round(cumtime, 6)}
+                    for (filename, line, func), (_, calls, tottime, cumtime, _) in rows]
+        if self._samples:
+            # Self time per innermost function
+            leaves = Counter()
+            for stack, count in self._samples.items():
+                leaves[stack.rsplit(";", 1)[-1]] += count
+            total = sum(leaves.values())
+            return [{"function": func, "samples": count, "share": round(count / total, 4)}
+                    for func, count in leaves.most_common(limit)]
+        return []
+
+    def to_dict(self):
+        scan_seconds = self.phases.get("scan") or self.wall_time or 0.0
+        rate = (lambda n: round(n / scan_seconds, 1)) if scan_seconds else (lambda n: None)
+        return {
+            "wall_seconds": self.wall_time,
+            "phases": {name: round(seconds, 6) for name, seconds in self.phases.items()},
+            "counters": {"directories": self.dirs, "files": self.files, "errors": self.errors,
+                         "stat_calls": self.stat_calls},
+            "throughput": {"directories_per_sec": rate(self.dirs), "files_per_sec": rate(self.files),
+                           "errors_per_sec": rate(self.errors)},
+            "timeline": [{"second": second, "directories": d, "files": f, "errors": e}
+                         for second, (d, f, e) in sorted(self.timeline.items())],
+            "slowest_directories": [{"path": path, "seconds": round(seconds, 6), "files": files}
+                                    for seconds, path, files in sorted(self.slowest, reverse=True)],
+            "stat_latency": {
+                "p50_us": self.stat_percentile(0.50), "p99_us": self.stat_percentile(0.99),
+                "histogram": [{"le_us": (1 << (bucket + 1)) / 1000, "count": count}
+                              for bucket, count in enumerate(self.stat_histogram) if count],
+            },
+            "profile": {"mode": self.profile, "top": self._profile_summary()} if self.profile else None,
+        }
+
+    def write(self, output_file):
+        # The JSON document, plus the raw profile next to it: <output_file>.prof
+        # (pstats/snakeviz) for cProfile, <output_file>.folded for sampling
+        with open(output_file, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, indent=2)
+        if self._profiler is not None:
+            self._profiler.dump_stats(output_file + ".prof")
+        if self._samples:
+            with open(output_file + ".folded", 'w', encoding='utf-8') as f:
+                for stack, count in self._samples.most_common():
+                    f.write(f"{stack} {count}\n")
+        print(f"\nMetrics written to: {output_file}")
+
+    def print_report(self, top_n=5):
+        data = self.to_dict()
+        print("\n=== RUN METRICS ===")
+        for name, seconds in data["phases"].items():
+            print(f"  {name:24} {seconds:9.3f} s")
+        counters, throughput = data["counters"], data["throughput"]
+        if counters["directories"]:
+            print(f"  {counters['directories']:,} dirs, {counters['files']:,} files, {counters['errors']:,} errors "
+                  f"({throughput['directories_per_sec']:,.0f} dirs/s, {throughput['files_per_sec']:,.0f} files/s)")
+        latency = data["stat_latency"]
+        if latency["p50_us"] is not None:
+            print(f"  stat latency: p50 <= {latency['p50_us']:.1f} us, p99 <= {latency['p99_us']:.1f} us")
+        for entry in data["slowest_directories"][:top_n]:
+            print(f"  slow dir: {entry['seconds'] * 1000:9.2f} ms | {entry['files']:7} files | {entry['path']}")
@@ -1,10 +1,89 @@
 import numpy as np
 
-def calculate_pdf(file_sizes, bins=50):
+from sketch import SizeSketch
+
+# Plots get fixed-size summaries, never the per-file array: a histogram of
+# PLOT_BINS bars and a CDF of PLOT_POINTS points cost the same at 10 files or 10M.
+PLOT_BINS = 50
+PLOT_POINTS = 512
+
+def calculate_pdf(file_sizes, bins=PLOT_BINS):
+    if isinstance(file_sizes, SizeSketch):
+        return file_sizes.histogram()
     counts, bin_edges = np.histogram(file_sizes, bins=bins)
     return counts, bin_edges
 
-def calculate_cdf(file_sizes):
-    arr = np.sort(np.array(file_sizes))
+def calculate_log_pdf(file_sizes, bins=PLOT_BINS):
+    # Counts over log-spaced edges from the smallest positive size to the largest,
+    # binned once on log(size) with uniform bins (np.histogram's fast path instead
+    # of a search per file). Zero-size files have no place on a log axis and are left out.
+    if isinstance(file_sizes, SizeSketch):
+        counts, edges = file_sizes.histogram()
+        # Merge adjacent sketch buckets down to about `bins` bars
+        step = max(-(-len(counts) // bins), 1)
+        if step > 1:
+            counts = np.add.reduceat(counts, np.arange(0, len(counts), step))
+            edges = np.append(edges[:-1:step], edges[-1])
+        return counts, edges
+
+    sizes = np.asarray(file_sizes)
+    positive = sizes[sizes > 0]
+    if not len(positive):
+        return np.zeros(bins, dtype=np.int64), np.geomspace(1, 2, bins + 1)
+    low = np.log(float(positive.min()))
+    high = max(np.log(float(positive.max())), low + np.log(2))
+    counts, log_edges = np.histogram(np.log(positive), bins=bins, range=(low, high))
+    return counts, np.exp(log_edges)
+
+def calculate_cdf(file_sizes, mode="exact", relative_accuracy=0.01):
+    # mode="sketch" answers in O(n) time and O(1) memory: the curve is read from a
+    # SizeSketch and is exact to within relative_accuracy on the size axis
+    if mode == "sketch" and not isinstance(file_sizes, SizeSketch):
+        file_sizes = SizeSketch(relative_accuracy).add(file_sizes)
+    if isinstance(file_sizes, SizeSketch):
+        return file_sizes.cdf_curve()
+    arr = np.sort(np.asarray(file_sizes))
     cdf = np.arange(1, len(arr) + 1) / len(arr)
-    return arr, cdf
\ No newline at end of file
+    return arr, cdf
+
+def calculate_percentiles(file_sizes, percentiles=(25, 50, 75, 90, 95, 99), mode="exact", relative_accuracy=0.01):
+    if mode == "sketch" and not isinstance(file_sizes, SizeSketch):
+        file_sizes = SizeSketch(relative_accuracy).add(file_sizes)
+    if isinstance(file_sizes, SizeSketch):
+        return {q: file_sizes.quantile(q / 100) for q in percentiles}
+
+    # Exact: one partition around every rank needed, then the same linear
+    # interpolation np.percentile uses - instead of one selection per percentile
+    sizes = np.asarray(file_sizes)
+    ranks = np.asarray(percentiles, dtype=np.float64) / 100 * (len(sizes) - 1)
+    lower = np.floor(ranks).astype(np.int64)
+    upper = np.minimum(lower + 1, len(sizes) - 1)
+    part = np.partition(sizes, np.unique(np.concatenate((lower, upper))))
+    low_values = part[lower].astype(np.float64)
+    values = low_values + (part[upper] - low_values) * (ranks - lower)
+    return dict(zip(percentiles, values.tolist()))
+
+def cdf_points(file_sizes, points=PLOT_POINTS):
+    # The CDF at `points` evenly spaced ranks: (size at the rank, fraction of files
+    # <= that rank). The first and last ranks are always included, so the curve
+    # spans the whole size range. One sort beats a partition around 512 ranks.
+    if isinstance(file_sizes, SizeSketch):
+        sizes, cdf = file_sizes.cdf_curve()
+    else:
+        sizes = np.asarray(file_sizes)
+        if len(sizes) <= points:
+            return calculate_cdf(sizes)
+        ranks = np.unique(np.linspace(0, len(sizes) - 1, points).round().astype(np.int64))
+        return np.sort(sizes)[ranks], (ranks + 1) / len(sizes)
+    if len(sizes) > points:
+        keep = np.unique(np.linspace(0, len(sizes) - 1, points).round().astype(np.int64))
+        sizes, cdf = sizes[keep], cdf[keep]
+    return sizes, cdf
+
+def plot_data(file_sizes, bins=PLOT_BINS, points=PLOT_POINTS):
+    # Everything plotter needs, computed once: linear and log histograms plus the downsampled CDF
+    counts, edges = calculate_pdf(file_sizes, bins)
+    log_counts, log_edges = calculate_log_pdf(file_sizes, bins)
+    sizes, cdf = cdf_points(file_sizes, points)
+    return {"counts": counts, "bins": edges, "log_counts": log_counts, "log_bins": log_edges,
+            "cdf_sizes": sizes, "cdf": cdf}
@@ -1,70 +1,77 @@
-import matplotlib.pyplot as plt
 import numpy as np
 
-def plot_pdf(counts, bins):
-    plt.figure(figsize=(10, 6))
-    plt.bar(bins[:-1], counts, width=np.diff(bins), edgecolor='black', alpha=0.7, color='steelblue')
-    plt.xlabel('File Size (bytes)', fontsize=12)
-    plt.ylabel('Number of Files', fontsize=12)
-    plt.title('PDF - File Size Distribution', fontsize=14, fontweight='bold')
-    plt.grid(True, alpha=0.3)
-    plt.tight_layout()
-    plt.show()
+# Every plot takes pre-binned data (pdf_cdf.plot_data): histogram counts and
+# edges plus a downsampled CDF, so drawing costs the same for any number of
+# files. With `output` set the figure is rendered by the Agg backend straight to
+# a PNG/SVG file (format from the extension) without importing pyplot, which
+# works on headless machines; without it the figure is shown interactively.
 
-def plot_cdf(sorted_sizes, cdf):
-    plt.figure(figsize=(10, 6))
-    plt.plot(sorted_sizes, cdf, linewidth=2, color='darkred')
-    plt.xlabel('File Size (bytes)', fontsize=12)
-    plt.ylabel('Cumulative Probability', fontsize=12)
-    plt.title('CDF - Cumulative Distribution', fontsize=14, fontweight='bold')
-    plt.grid(True, alpha=0.3)
-    plt.axhline(y=0.9, color='green', linestyle='--', label='90% threshold')
-    plt.legend()
-    plt.tight_layout()
-    plt.show()
+def _figure(figsize, columns, output):
+    if output:
+        from matplotlib.figure import Figure
+        fig = Figure(figsize=figsize)
+        axes = fig.subplots(1, columns)
+    else:
+        import matplotlib.pyplot as plt
+        fig, axes = plt.subplots(1, columns, figsize=figsize)
+    return fig, axes
 
-def plot_both(counts, bins, sorted_sizes, cdf):
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 6))
+def _finish(fig, output):
+    fig.tight_layout()
+    if output:
+        fig.savefig(output)
+        return output
+    import matplotlib.pyplot as plt
+    plt.show()
+    return None
 
-    # PDF
-    ax1.bar(bins[:-1], counts, width=np.diff(bins), edgecolor='black', alpha=0.7, color='steelblue')
-    ax1.set_xlabel('File Size (bytes)', fontsize=11)
-    ax1.set_ylabel('Number of Files', fontsize=11)
-    ax1.set_title('PDF - Histogram', fontsize=13, fontweight='bold')
-    ax1.grid(True, alpha=0.3)
+def _draw_pdf(ax, counts, bins, title, log=False):
+    ax.bar(bins[:-1], counts, width=np.diff(bins), align='edge', edgecolor='black', alpha=0.7, color='steelblue')
+    ax.set_xlabel('File Size (bytes)', fontsize=11)
+    ax.set_ylabel('Number of Files', fontsize=11)
+    ax.set_title(title, fontsize=13, fontweight='bold')
+    if log:
+        ax.set_xscale('log')
+    ax.grid(True, alpha=0.3, which='both' if log else 'major')
 
-    # CDF
-    ax2.plot(sorted_sizes, cdf, linewidth=2, color='darkred')
-    ax2.set_xlabel('File Size (bytes)', fontsize=11)
-    ax2.set_ylabel('Cumulative Probability', fontsize=11)
-    ax2.set_title('CDF - Cumulative Distribution', fontsize=13, fontweight='bold')
-    ax2.grid(True, alpha=0.3)
-    ax2.axhline(y=0.9, color='green', linestyle='--', linewidth=1.5, label='90% threshold')
-    ax2.legend()
+def _draw_cdf(ax, cdf_sizes, cdf, title, log=False):
+    ax.plot(cdf_sizes, cdf, linewidth=2, color='darkred')
+    ax.set_xlabel('File Size (bytes)', fontsize=11)
+    ax.set_ylabel('Cumulative Probability', fontsize=11)
+    ax.set_title(title, fontsize=13, fontweight='bold')
+    if log:
+        # Zero-size files stay in the fractions but cannot be placed on a log axis
+        ax.set_xscale('log')
+    ax.grid(True, alpha=0.3, which='both' if log else 'major')
+    ax.axhline(y=0.9, color='green', linestyle='--', linewidth=1.5, label='90% threshold')
+    ax.legend()
 
-    plt.tight_layout()
-    plt.show()
+def plot_pdf(counts, bins, output=None):
+    fig, ax = _figure((10, 6), 1, output)
+    _draw_pdf(ax, counts, bins, 'PDF - File Size Distribution')
+    return _finish(fig, output)
 
-def plot_size_distribution_log(counts, bins, sorted_sizes, cdf):
-    fig, (ax1, ax2) = plt.subplots(1, 2, figsize=(16, 6))
+def plot_cdf(cdf_sizes, cdf, output=None):
+    fig, ax = _figure((10, 6), 1, output)
+    _draw_cdf(ax, cdf_sizes, cdf, 'CDF - Cumulative Distribution')
+    return _finish(fig, output)
 
-    # PDF - Log scale
-    ax1.bar(bins[:-1], counts, width=np.diff(bins), edgecolor='black', alpha=0.7, color='steelblue')
-    ax1.set_xlabel('File Size (bytes)', fontsize=11)
-    ax1.set_ylabel('Number of Files', fontsize=11)
-    ax1.set_title('PDF - Logarithmic Scale', fontsize=13, fontweight='bold')
-    ax1.set_xscale('log')
-    ax1.grid(True, alpha=0.3, which='both')
+def plot_both(counts, bins, cdf_sizes, cdf, output=None):
+    fig, (ax1, ax2) = _figure((16, 6), 2, output)
+    _draw_pdf(ax1, counts, bins, 'PDF - Histogram')
+    _draw_cdf(ax2, cdf_sizes, cdf, 'CDF - Cumulative Distribution')
+    return _finish(fig, output)
 
-    # CDF - Log scale
-    ax2.plot(sorted_sizes, cdf, linewidth=2, color='darkred')
-    ax2.set_xlabel('File Size (bytes)', fontsize=11)
-    ax2.set_ylabel('Cumulative Probability', fontsize=11)
-    ax2.set_title('CDF - Logarithmic Scale', fontsize=13, fontweight='bold')
-    ax2.set_xscale('log')
-    ax2.grid(True, alpha=0.3, which='both')
-    ax2.axhline(y=0.9, color='green', linestyle='--', linewidth=1.5, label='90% threshold')
-    ax2.legend()
+def plot_size_distribution_log(log_counts, log_bins, cdf_sizes, cdf, output=None):
+    # log_counts/log_bins: the log-spaced histogram from pdf_cdf.calculate_log_pdf
+    fig, (ax1, ax2) = _figure((16, 6), 2, output)
+    _draw_pdf(ax1, log_counts, log_bins, 'PDF - Logarithmic Scale', log=True)
+    _draw_cdf(ax2, cdf_sizes, cdf, 'CDF - Logarithmic Scale', log=True)
+    return _finish(fig, output)
 
-    plt.tight_layout()
-    plt.show()
\ No newline at end of file
+def render_plots(data, prefix, fmt="png"):
+    # Both figures from pdf_cdf.plot_data() as <prefix>_pdf_cdf.<fmt> and <prefix>_log.<fmt>
+    return [plot_both(data["counts"], data["bins"], data["cdf_sizes"], data["cdf"],
+                      output=f"{prefix}_pdf_cdf.{fmt}"),
+            plot_size_distribution_log(data["log_counts"], data["log_bins"], data["cdf_sizes"], data["cdf"],
+                                       output=f"{prefix}_log.{fmt}")]
@@ -0,0 +1,389 @@
+import argparse
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from file_diff import diff_tables
+from pdf_cdf import calculate_percentiles
+from search_index import parse_size
+from snapshot import load_snapshot
+
+# Long-running query service over .fsnap snapshots, on a localhost port or a Unix
+# socket. Snapshots stay memory-mapped between requests, so a query pays neither
+# interpreter start-up nor loading. Every answer is JSON; the encoded bytes are
+# kept in an LRU cache keyed by (query, snapshot versions, parameters) with a byte
+# budget, and a snapshot's version is its file's (mtime, size) - replacing the
+# file reloads it and its old entries simply age out. Connections are served by a
+# fixed thread pool; NumPy releases the GIL in the heavy column operations.
+#   GET /snapshots                         loaded snapshots
+#   GET /summary?snapshot=NAME             export summary from the header
+#   GET /extensions?top=20&by=size|count|allocated
+#   GET /percentiles?q=50,90,99
+#   GET /large?top=20&min_size=50MB&ext=.psd
+#   GET /cdf?size=100KB,1MB                fraction of files <= each size
+#   GET /diff?old=NAME&new=NAME&top=20     file-level diff of two snapshots
+#   GET /stats                             cache and request counters
+# snapshot= may be left out when only one snapshot is served.
+DEFAULT_PORT = 8350
+DEFAULT_CACHE_MB = 64
+
+
+class ResultCache:
+    # LRU of encoded responses, evicting the least recently used ones once the
+    # stored bytes exceed the budget; a response larger than the budget is not kept
+    def __init__(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            body = self.entries.get(key)
+            if body is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return body
+
+    def put(self, key, body):
+        if len(body) > self.budget_bytes:
+            return
+        with self.lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old)
+            self.entries[key] = body
+            self.bytes += len(body)
+            while self.bytes > self.budget_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.bytes -= len(evicted)
+                self.evictions += 1
+
+    def stats(self):
+        with self.lock:
+            return {"entries": len(self.entries), "bytes": self.bytes, "budget_bytes": self.budget_bytes,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class LoadedSnapshot:
+    def __init__(self, name, path, version):
+        self.name = name
+        self.path = path
+        self.version = version
+        self.header, self.table = load_snapshot(path)
+        self.root = self.header.get("root")
+
+
+class SnapshotCatalog:
+    # name -> snapshot file, opened on first use and reopened when the file changes
+    def __init__(self, paths):
+        self.paths = dict(paths)
+        self.loaded = {}
+        self.lock = threading.Lock()
+
+    def get(self, name):
+        if name is None:
+            if len(self.paths) != 1:
+                raise ValueError("snapshot= is required when more than one snapshot is served")
+            name = next(iter(self.paths))
+        if name not in self.paths:
+            raise KeyError(f"Unknown snapshot: {name}")
+        path = self.paths[name]
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        snapshot = self.loaded.get(name)
+        if snapshot is None or snapshot.version != version:
+            with self.lock:
+                snapshot = self.loaded.get(name)
+                if snapshot is None or snapshot.version != version:
+                    snapshot = LoadedSnapshot(name, path, version)
+                    self.loaded[name] = snapshot
+        return snapshot
+
+
+def _int_param(params, name, default):
+    try:
+        return int(params.get(name, default))
+    except ValueError:
+        raise ValueError(f"{name} must be an integer") from None
+
+
+def query_summary(snapshot, params):
+    export = snapshot.header.get("export") or {}
+    return {"root": snapshot.root, "rows": len(snapshot.table), "system_info": export.get("system_info"),
+            "summary": export.get("summary")}
+
+
+def query_extensions(snapshot, params):
+    by = params.get("by", "size")
+    if by not in ("size", "count", "allocated"):
+        raise ValueError("by must be size, count or allocated")
+    table = snapshot.table
+    counts, totals, allocated = table.extension_totals(with_allocated=True)
+    key = {"size": totals, "count": counts, "allocated": allocated}[by]
+    total_files, total_size = max(len(table), 1), max(int(totals.sum()), 1)
+    order = [code for code in np.argsort(-key, kind="stable").tolist() if counts[code]]
+    return [{"extension": table.extensions[code] or "no_ext", "file_count": int(counts[code]),
+             "total_size_bytes": int(totals[code]), "allocated_size_bytes": int(allocated[code]),
+             "percentage_of_files": round(int(counts[code]) / total_files * 100, 2),
+             "percentage_of_disk": round(int(totals[code]) / total_size * 100, 2)}
+            for code in order[:_int_param(params, "top", 20)]]
+
+
+def query_percentiles(snapshot, params):
+    try:
+        percentiles = [float(q) for q in params.get("q", "25,50,75,90,95,99").split(",")]
+    except ValueError:
+        raise ValueError("q must be a comma-separated list of percentiles") from None
+    if not all(0 <= q <= 100 for q in percentiles):
+        raise ValueError("percentiles must be between 0 and 100")
+    if not len(snapshot.table):
+        return {}
+    return {f"{q:g}": value for q, value in calculate_percentiles(snapshot.table.size, percentiles).items()}
+
+
+def query_large(snapshot, params):
+    table = snapshot.table
+    rows = np.arange(len(table))
+    if "min_size" in params:
+        rows = rows[table.size >= parse_size(params["min_size"])]
+    if "ext" in params:
+        code = table.ext_code_of(params["ext"].lower())
+        rows = rows[table.ext_code[rows] == code] if code >= 0 else rows[:0]
+    top = min(_int_param(params, "top", 20), len(rows))
+    if top <= 0:
+        return []
+    rows = rows[np.argpartition(-table.size[rows], top - 1)[:top]]
+    rows = rows[np.argsort(-table.size[rows], kind="stable")]
+    return [{"path": table.path(i), "size": int(table.size[i]), "mtime": float(table.mtime[i])}
+            for i in rows.tolist()]
+
+
+def query_cdf(snapshot, params):
+    if "size" not in params:
+        raise ValueError("size is required, e.g. size=100KB")
+    sizes = snapshot.table.size
+    total = len(sizes)
+    result = {}
+    for text in params["size"].split(","):
+        threshold = parse_size(text)
+        result[text] = int(np.count_nonzero(sizes <= threshold)) / total if total else None
+    return result
+
+
+def query_diff(old, new, params):
+    diff = diff_tables(old.table, new.table, old.root, new.root)
+    top = _int_param(params, "top", 20)
+    ext_deltas = sorted(diff.extension_deltas().items(), key=lambda item: abs(item[1][2]), reverse=True)
+    return {
+        "added": {"files": len(diff.added), "bytes": diff.added_bytes},
+        "removed": {"files": len(diff.removed), "bytes": diff.removed_bytes},
+        "resized": {"files": len(diff.resized_new), "bytes": diff.resized_bytes},
+        "touched": {"files": len(diff.touched_new)},
+        "unchanged": diff.unchanged,
+        "net_bytes": diff.net_bytes,
+        "extensions": [{"extension": ext, "added": added, "removed": removed, "byte_delta": delta}
+                       for ext, (added, removed, delta) in ext_deltas[:top]],
+        "largest_changes": [{"kind": kind, "path": path, "byte_delta": delta}
+                            for kind, path, delta in diff.largest_changes(top)],
+    }
+
+
+QUERIES = {
+    "summary": query_summary,
+    "extensions": query_extensions,
+    "percentiles": query_percentiles,
+    "large": query_large,
+    "cdf": query_cdf,
+    "diff": query_diff,
+}
+
+
+class QueryService:
+    def __init__(self, snapshot_paths, cache_bytes=DEFAULT_CACHE_MB * 1024 * 1024):
+        self.catalog = SnapshotCatalog(snapshot_paths)
+        self.cache = ResultCache(cache_bytes)
+        self.requests = 0
+        self.errors = 0
+        self.started = time.time()
+        self.lock = threading.Lock()
+
+    def snapshots(self):
+        return [{"name": name, "path": path, "loaded": name in self.catalog.loaded}
+                for name, path in self.catalog.paths.items()]
+
+    def stats(self):
+        return {"uptime_seconds": round(time.time() - self.started, 1), "requests": self.requests,
+                "errors": self.errors, "cache": self.cache.stats()}
+
+    def handle(self, kind, params):
+        # (HTTP status, encoded JSON body, served from cache)
+        with self.lock:
+            self.requests += 1
+        try:
+            if kind == "snapshots":
+                return 200, _encode(self.snapshots()), False
+            if kind == "stats":
+                return 200, _encode(self.stats()), False
+            if kind not in QUERIES:
+                raise KeyError(f"Unknown query: {kind}")
+            if kind == "diff":
+                if "old" not in params or "new" not in params:
+                    raise ValueError("diff needs old= and new=")
+                snapshots = [self.catalog.get(params["old"]), self.catalog.get(params["new"])]
+            else:
+                snapshots = [self.catalog.get(params.get("snapshot"))]
+            key = (kind, tuple((s.name, s.version) for s in snapshots), tuple(sorted(params.items())))
+            body = self.cache.get(key)
+            if body is not None:
+                return 200, body, True
+            body = _encode(QUERIES[kind](*snapshots, params))
+            self.cache.put(key, body)
+            return 200, body, False
+        except KeyError as e:
+            return self._error(404, e.args[0])
+        except (ValueError, OSError) as e:
+            return self._error(400, str(e))
+
+    def _error(self, status, message):
+        with self.lock:
+            self.errors += 1
+        return status, _encode({"error": message}), False
+
+
+def _encode(result):
+    return json.dumps(result, ensure_ascii=False).encode("utf-8")
+
+
+class QueryHandler(BaseHTTPRequestHandler):
+    server_version = "fsa-query/1"
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        status, body, cached = self.server.service.handle(url.path.strip("/"), params)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("X-Cache", "hit" if cached else "miss")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket peers have no (host, port)
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class _ThreadPoolMixIn:
+    # Like socketserver.ThreadingMixIn, but connections go to a fixed pool of
+    # workers instead of a new thread each
+    request_queue_size = 128  # socketserver's default backlog of 5 drops bursts of clients
+
+    def init_pool(self, service, workers, verbose):
+        self.service = service
+        self.verbose = verbose
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="query")
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self._process_request, request, client_address)
+
+    def _process_request(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+class PooledHTTPServer(_ThreadPoolMixIn, HTTPServer):
+    pass
+
+
+class PooledUnixHTTPServer(_ThreadPoolMixIn, socketserver.UnixStreamServer):
+    pass
+
+
+def make_server(service, host="127.0.0.1", port=DEFAULT_PORT, socket_path=None, workers=8, verbose=False):
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        server = PooledUnixHTTPServer(socket_path, QueryHandler)
+    else:
+        server = PooledHTTPServer((host, port), QueryHandler)
+    server.init_pool(service, workers, verbose)
+    return server
+
+
+def snapshot_paths(specs):
+    # "NAME=path.fsnap" or "path.fsnap" (named after the file)
+    paths = {}
+    for spec in specs:
+        name, sep, path = spec.partition("=")
+        if not sep:
+            path, name = spec, os.path.splitext(os.path.basename(spec))[0]
+        if not os.path.isfile(path):
+            raise ValueError(f"Snapshot not found: {path}")
+        paths[name] = path
+    return paths
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve aggregate queries over memory-mapped snapshots")
+    parser.add_argument("snapshots", nargs="+", metavar="[NAME=]SNAPSHOT", help=".fsnap files to serve")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--socket", metavar="PATH", help="Listen on a Unix socket instead of a TCP port")
+    parser.add_argument("--workers", type=int, default=8, help="Threads serving connections")
+    parser.add_argument("--cache-mb", type=float, default=DEFAULT_CACHE_MB, help="Result cache budget")
+    parser.add_argument("--preload", action="store_true", help="Open every snapshot before serving")
+    parser.add_argument("--verbose", action="store_true", help="Log every request")
+    args = parser.parse_args(argv)
+
+    try:
+        service = QueryService(snapshot_paths(args.snapshots), int(args.cache_mb * 1024 * 1024))
+    except ValueError as e:
+        print(f"Error: {e}")
+        return 1
+    if args.preload:
+        for name in service.catalog.paths:
+            service.catalog.get(name)
+
+    server = make_server(service, args.host, args.port, args.socket, args.workers, args.verbose)
+    where = args.socket or f"http://{args.host}:{server.server_address[1]}"
+    print(f"Serving {len(service.catalog.paths)} snapshot(s) on {where} ({args.workers} workers)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.remove(args.socket)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
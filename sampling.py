@@ -0,0 +1,348 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from pdf_cdf import calculate_percentiles
+from scanner import DEFAULT_FILTER, _child_dirs, _list_directory
+
+# Sampling scan: estimates instead of a census. Each probe is a random descent
+# from the scan root (Knuth's tree-size estimator): it lists a directory, counts
+# its files with weight 1/P(reaching it), picks one subdirectory uniformly at
+# random and multiplies the weight by the number it could have picked from.
+# Every probe is an unbiased estimate of the whole tree. The root's
+# subdirectories are strata, and new probes go where the byte estimates vary
+# most (Neyman allocation). Listings are cached, so the upper levels are read
+# once however many probes pass through them.
+#   totals and CDF(threshold)        normal intervals from the stratified variance
+#   percentiles, top share, extensions   bootstrap over probes within strata
+PERCENTILES = (25, 50, 75, 90, 95, 99)
+Z_95 = 1.96
+
+
+def _stratified(values, strata, n_strata):
+    # Sum of the per-stratum means and its variance (each stratum needs two probes)
+    counts = np.bincount(strata, minlength=n_strata)
+    means = np.bincount(strata, values, n_strata) / counts
+    spread = np.bincount(strata, np.square(values - means[strata]), n_strata) / (counts - 1)
+    return means.sum(), (spread / counts).sum()
+
+
+class _Listings:
+    def __init__(self, scan_filter):
+        self.scan_filter = scan_filter
+        self.index = {}
+        self.sizes = []
+        self.ext_codes = []
+        self.children = []
+        self.ext_index = {}
+
+    def get(self, dir_path):
+        # Directory id, or None when it cannot be listed
+        dir_id = self.index.get(dir_path, -1)
+        if dir_id != -1:
+            return dir_id
+        listing = _list_directory(dir_path, self.scan_filter)
+        if listing is None:
+            self.index[dir_path] = None
+            return None
+        files, subdirs = listing
+        dir_id = self.index[dir_path] = len(self.sizes)
+        self.sizes.append(np.array([f[1] for f in files], dtype=np.int64))
+        self.ext_codes.append(np.array([self.ext_index.setdefault(os.path.splitext(f[0])[1].lower(), len(self.ext_index))
+                                        for f in files], dtype=np.int32))
+        self.children.append(_child_dirs(dir_path, subdirs, self.scan_filter))
+        return dir_id
+
+
+class SampleEstimate:
+    def __init__(self, **fields):
+        self.__dict__.update(fields)
+
+
+class _Sampler:
+    def __init__(self, folder_path, scan_filter, max_strata, threshold, seed):
+        self.listings = _Listings(scan_filter)
+        self.rng = np.random.default_rng(seed)
+        self.threshold = threshold
+        root = self.listings.get(folder_path)
+        self.root = root
+        children = self.listings.children[root] if root is not None else []
+        # Few top-level directories: one stratum each; many: one stratum over all of them
+        self.strata = [[c] for c in children] if len(children) <= max_strata else [children] if children else []
+        self.probe_stratum = []
+        self.probe_bytes = []
+        self.probe_files = []
+        self.probe_small = []
+        self.entry_probe = []
+        self.entry_dir = []
+        self.entry_weight = []
+
+    def probe(self, stratum):
+        candidates = self.strata[stratum]
+        probe_id = len(self.probe_stratum)
+        weight = float(len(candidates))
+        dir_path = candidates[self.rng.integers(len(candidates))]
+        total_bytes = total_files = small = 0.0
+        while True:
+            dir_id = self.listings.get(dir_path)
+            if dir_id is None:
+                break
+            sizes = self.listings.sizes[dir_id]
+            self.entry_probe.append(probe_id)
+            self.entry_dir.append(dir_id)
+            self.entry_weight.append(weight)
+            total_bytes += weight * int(sizes.sum())
+            total_files += weight * len(sizes)
+            small += weight * int(np.count_nonzero(sizes <= self.threshold))
+            children = self.listings.children[dir_id]
+            if not children:
+                break
+            weight *= len(children)
+            dir_path = children[self.rng.integers(len(children))]
+        self.probe_stratum.append(stratum)
+        self.probe_bytes.append(total_bytes)
+        self.probe_files.append(total_files)
+        self.probe_small.append(small)
+
+    def allocate(self, n):
+        # Greedy Neyman allocation: each probe goes where it cuts the byte variance most
+        strata = np.asarray(self.probe_stratum)
+        values = np.asarray(self.probe_bytes)
+        counts = np.bincount(strata, minlength=len(self.strata)).astype(np.float64)
+        means = np.bincount(strata, values, len(self.strata)) / counts
+        spread = np.bincount(strata, np.square(values - means[strata]), len(self.strata)) / (counts - 1)
+        if not spread.any():
+            return 0
+        for _ in range(n):
+            h = int(np.argmax(spread / (counts * (counts + 1))))
+            self.probe(h)
+            counts[h] += 1
+        return n
+
+    def complete(self):
+        # Every directory under the root is cached: the tree has been read in full
+        index = self.listings.index
+        return all(child in index for children in self.listings.children for child in children)
+
+    def exact_totals(self):
+        sizes = np.concatenate(self.listings.sizes) if self.listings.sizes else np.zeros(0, dtype=np.int64)
+        share = np.count_nonzero(sizes <= self.threshold) / len(sizes) if len(sizes) else 0.0
+        return int(sizes.sum()), 0.0, len(sizes), 0.0, share, 0.0
+
+    def root_totals(self):
+        if self.root is None:
+            return 0, 0, 0
+        sizes = self.listings.sizes[self.root]
+        return int(sizes.sum()), len(sizes), int(np.count_nonzero(sizes <= self.threshold))
+
+    def intervals(self):
+        # (total bytes, its variance, total files, its variance, CDF(threshold), its variance)
+        root_bytes, root_files, root_small = self.root_totals()
+        if not self.probe_stratum:
+            return root_bytes, 0.0, root_files, 0.0, root_small / root_files if root_files else 0.0, 0.0
+        strata = np.asarray(self.probe_stratum)
+        n = len(self.strata)
+        files = np.asarray(self.probe_files)
+        small = np.asarray(self.probe_small)
+        total_bytes, var_bytes = _stratified(np.asarray(self.probe_bytes), strata, n)
+        total_files, var_files = _stratified(files, strata, n)
+        total_small, _ = _stratified(small, strata, n)
+        total_files += root_files
+        share = (total_small + root_small) / total_files if total_files else 0.0
+        # Ratio estimator: linearized variance of small - share * files
+        _, var_residual = _stratified(small - share * files, strata, n)
+        var_share = var_residual / total_files ** 2 if total_files else 0.0
+        return total_bytes + root_bytes, var_bytes, total_files, var_files, share, var_share
+
+
+def _weighted_statistics(sizes, ext_codes, file_weight, order, n_ext, top_fraction):
+    if not file_weight.any():
+        return np.zeros(len(PERCENTILES)), 0.0, np.zeros(n_ext), np.zeros(n_ext)
+    weight = file_weight[order]
+    sorted_sizes = sizes[order]
+    cumulative = np.cumsum(weight)
+    total_weight = cumulative[-1]
+    byte_weight = weight * sorted_sizes
+    total_bytes = byte_weight.sum()
+
+    ranks = np.searchsorted(cumulative, np.asarray(PERCENTILES) / 100 * total_weight)
+    percentiles = sorted_sizes[np.minimum(ranks, len(sorted_sizes) - 1)].astype(np.float64)
+
+    # Bytes held by the largest top_fraction of files, splitting the boundary file's weight
+    larger = total_weight - cumulative
+    top_bytes = (np.clip(top_fraction * total_weight - larger, 0, weight) * sorted_sizes).sum()
+
+    ext_files = np.bincount(ext_codes, file_weight, n_ext) / total_weight
+    ext_bytes = np.bincount(ext_codes, file_weight * sizes, n_ext) / total_bytes if total_bytes else np.zeros(n_ext)
+    return percentiles, top_bytes / total_bytes if total_bytes else 0.0, ext_files, ext_bytes
+
+
+def _distribution(sampler, top_fraction, bootstrap, complete):
+    listings = sampler.listings
+    n_dirs = len(listings.sizes)
+    # An unlistable root leaves no listings at all: an empty estimate
+    sizes = np.concatenate(listings.sizes) if listings.sizes else np.zeros(0, dtype=np.int64)
+    ext_codes = np.concatenate(listings.ext_codes) if listings.ext_codes else np.zeros(0, dtype=np.int32)
+    file_dir = np.repeat(np.arange(n_dirs), [len(s) for s in listings.sizes])
+    order = np.argsort(sizes, kind="stable")
+    n_ext = len(listings.ext_index)
+
+    strata = np.asarray(sampler.probe_stratum, dtype=np.int64)
+    counts = np.bincount(strata, minlength=len(sampler.strata))
+    entry_probe = np.asarray(sampler.entry_probe, dtype=np.int64)
+    entry_dir = np.asarray(sampler.entry_dir, dtype=np.int64)
+    entry_weight = np.asarray(sampler.entry_weight) / counts[strata[entry_probe]] if len(entry_probe) else np.zeros(0)
+
+    def statistics(probe_multiplicity):
+        dir_weight = np.bincount(entry_dir, entry_weight * probe_multiplicity[entry_probe], n_dirs)
+        if sampler.root is not None:
+            dir_weight[sampler.root] = 1.0
+        return _weighted_statistics(sizes, ext_codes, dir_weight[file_dir], order, n_ext, top_fraction)
+
+    if complete:
+        _, top_share, ext_files, ext_bytes = _weighted_statistics(sizes, ext_codes, np.ones(len(sizes)), order,
+                                                                  n_ext, top_fraction)
+        percentiles = calculate_percentiles(sizes, PERCENTILES) if len(sizes) else dict.fromkeys(PERCENTILES, 0.0)
+        return (np.array([percentiles[q] for q in PERCENTILES]), top_share, ext_files, ext_bytes), []
+    estimate = statistics(np.ones(len(strata)))
+    members = [np.nonzero(strata == h)[0] for h in range(len(sampler.strata))]
+    replicates = []
+    for _ in range(bootstrap if len(strata) else 0):
+        multiplicity = np.zeros(len(strata))
+        for probes in members:
+            np.add.at(multiplicity, sampler.rng.choice(probes, len(probes)), 1)
+        replicates.append(statistics(multiplicity))
+    return estimate, replicates
+
+
+def _bootstrap_bounds(estimate, replicates):
+    # 95% percentile intervals of every statistic; no replicates means nothing was sampled
+    bounds = []
+    for i, value in enumerate(estimate):
+        if replicates:
+            low, high = np.percentile(np.asarray([r[i] for r in replicates]), [2.5, 97.5], axis=0)
+        else:
+            low = high = value
+        bounds.append((low, high))
+    return bounds
+
+
+def sample_scan(folder_path, target_error=0.05, min_probes=256, max_probes=20000, time_limit=None, max_strata=64,
+                threshold=100 * 1024, top_fraction=0.10, round_size=64, bootstrap=200, seed=None, scan_filter=None):
+    # Probes in rounds until total bytes are within target_error (relative) and
+    # CDF(threshold) within target_error (absolute), both at 95% confidence.
+    if not os.path.exists(folder_path):
+        print(f"Folder does not exist: {folder_path}")
+        return None
+
+    print(f"Starting sampling scan on: {folder_path} (target error {target_error:.1%})")
+    start = time.perf_counter()
+    scan_filter = (scan_filter or DEFAULT_FILTER).bind(folder_path)
+    sampler = _Sampler(folder_path, scan_filter, max_strata, threshold, seed)
+    # Pilot round: enough probes per stratum for its variance estimate to mean something
+    pilot = max(2, -(-min_probes // max(len(sampler.strata), 1)))
+    for h in range(len(sampler.strata)):
+        for _ in range(pilot):
+            sampler.probe(h)
+
+    converged = True
+    while sampler.probe_stratum and not sampler.complete():
+        total_bytes, var_bytes, _, _, _, var_share = sampler.intervals()
+        bytes_error = Z_95 * var_bytes ** 0.5 / total_bytes if total_bytes else 0.0
+        if bytes_error <= target_error and Z_95 * var_share ** 0.5 <= target_error:
+            break
+        if len(sampler.probe_stratum) >= max_probes or (time_limit and time.perf_counter() - start >= time_limit):
+            converged = False
+            break
+        if not sampler.allocate(min(round_size, max_probes - len(sampler.probe_stratum))):
+            break
+        print(f"\rProbes: {len(sampler.probe_stratum):,}, directories listed: {len(sampler.listings.sizes):,}, "
+              f"byte error: {bytes_error:.1%}", end="", flush=True)
+
+    # A tree small enough to be read in full by the probes gets exact answers
+    complete = sampler.complete()
+    totals = sampler.exact_totals() if complete else sampler.intervals()
+    total_bytes, var_bytes, total_files, var_files, share, var_share = totals
+    estimate, replicates = _distribution(sampler, top_fraction, bootstrap, complete)
+    percentiles, top_share, ext_files, ext_bytes = estimate
+    (p_low, p_high), (top_low, top_high), (ef_low, ef_high), (eb_low, eb_high) = _bootstrap_bounds(estimate, replicates)
+    extensions = list(sampler.listings.ext_index)
+    ext_order = np.argsort(-ext_bytes, kind="stable")
+    elapsed = time.perf_counter() - start
+    print(f"\n\nSampling complete! {len(sampler.probe_stratum):,} probes, "
+          f"{len(sampler.listings.sizes):,} directories listed in {elapsed:.2f}s.")
+
+    def normal(value, variance):
+        half = Z_95 * variance ** 0.5
+        return (value, value - half, value + half)
+
+    return SampleEstimate(
+        total_bytes=normal(total_bytes, var_bytes),
+        total_files=normal(total_files, var_files),
+        threshold=threshold,
+        cdf_threshold=normal(share, var_share),
+        top_fraction=top_fraction,
+        top_share=(top_share, top_low, top_high),
+        percentiles={q: (percentiles[i], p_low[i], p_high[i]) for i, q in enumerate(PERCENTILES)},
+        # (extension, (file share, low, high), (byte share, low, high)), heaviest first
+        extensions=[(extensions[i], (ext_files[i], ef_low[i], ef_high[i]), (ext_bytes[i], eb_low[i], eb_high[i]))
+                    for i in ext_order.tolist() if ext_files[i] > 0],
+        probes=len(sampler.probe_stratum),
+        strata=len(sampler.strata),
+        directories_listed=len(sampler.listings.sizes),
+        files_seen=sum(len(s) for s in sampler.listings.sizes),
+        converged=converged,
+        complete=complete,
+        elapsed=elapsed,
+    )
+
+
+def print_estimate(estimate, top_n=10):
+    def gb(value):
+        return value / (1024 * 1024 * 1024)
+
+    print("\n=== SAMPLED ESTIMATES (95% CONFIDENCE) ===")
+    print(f"Probes: {estimate.probes:,} over {estimate.strata} strata | "
+          f"{estimate.directories_listed:,} directories, {estimate.files_seen:,} files read"
+          + (" | whole tree read, values are exact" if estimate.complete else
+             "" if estimate.converged else " | stopped before reaching the error target"))
+    value, low, high = estimate.total_files
+    print(f"Total files: {value:,.0f}  [{max(low, 0):,.0f} - {high:,.0f}]")
+    value, low, high = estimate.total_bytes
+    print(f"Total size:  {gb(value):.2f} GB  [{gb(max(low, 0)):.2f} - {gb(high):.2f}]")
+
+    value, low, high = estimate.cdf_threshold
+    answer1 = "YES" if low >= 0.9 else "NO" if high < 0.9 else "UNCERTAIN"
+    print(f"\nQUESTION 1: Are 90% of files smaller than {estimate.threshold // 1024}KB?")
+    print(f"CDF({estimate.threshold // 1024}KB) = {value * 100:.2f}%  [{low * 100:.2f}% - {high * 100:.2f}%] → ANSWER: {answer1}")
+    value, low, high = estimate.top_share
+    answer2 = "YES" if low >= 0.9 else "NO" if high < 0.9 else "UNCERTAIN"
+    print(f"\nQUESTION 2: Do the largest {estimate.top_fraction:.0%} of files occupy 90% of disk space?")
+    print(f"Largest {estimate.top_fraction:.0%} files = {value * 100:.2f}%  [{low * 100:.2f}% - {high * 100:.2f}%] → ANSWER: {answer2}")
+
+    print(f"\nPercentiles:")
+    for q, (value, low, high) in estimate.percentiles.items():
+        print(f"  {q}%: {value / 1024:10.2f} KB  [{low / 1024:.2f} - {high / 1024:.2f}]")
+
+    print(f"\nTop {top_n} extensions by size:")
+    for i, (ext, files, size) in enumerate(estimate.extensions[:top_n], 1):
+        print(f"  {i:2}. {ext or '(none)':15} : {size[0] * 100:5.2f}% of bytes [{size[1] * 100:.2f} - {size[2] * 100:.2f}]"
+              f" | {files[0] * 100:5.2f}% of files [{files[1] * 100:.2f} - {files[2] * 100:.2f}]")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Estimate scan statistics by sampling directories")
+    parser.add_argument("folder")
+    parser.add_argument("--target-error", type=float, default=0.05,
+                        help="Stop once total bytes (relative) and CDF(100KB) (absolute) are this tight at 95%%")
+    parser.add_argument("--max-probes", type=int, default=20000)
+    parser.add_argument("--time-limit", type=float, help="Stop after this many seconds")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    estimate = sample_scan(args.folder, args.target_error, max_probes=args.max_probes, time_limit=args.time_limit,
+                           seed=args.seed)
+    if estimate:
+        print_estimate(estimate)
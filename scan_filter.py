@@ -0,0 +1,171 @@
+import copy
+import fnmatch
+import os
+import re
+
+SKIP_DIRS = {'.Trash', 'Library/Caches', '$RECYCLE.BIN', '.git', 'node_modules', '__pycache__'}
+
+
+def _translate_gitignore(pattern):
+    # gitignore glob -> regex over a '/'-separated relative path
+    out = []
+    i = 0
+    while i < len(pattern):
+        c = pattern[i]
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+            continue
+        if pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+            continue
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[" and "]" in pattern[i + 2:]:
+            end = pattern.index("]", i + 2)
+            body = pattern[i + 1:end]
+            out.append("[" + ("^" + body[1:] if body.startswith("!") else body) + "]")
+            i = end
+        else:
+            out.append(re.escape(c))
+        i += 1
+    return "".join(out)
+
+
+def parse_ignore_rules(lines):
+    # gitignore-style lines -> [(regex, negate, dir_only)], in file order
+    rules = []
+    for line in lines:
+        line = line.rstrip("\r\n").rstrip()
+        if not line or line.startswith("#"):
+            continue
+        negate = line.startswith("!")
+        if negate:
+            line = line[1:]
+        if line.startswith("\\"):
+            line = line[1:]
+        dir_only = line.endswith("/")
+        line = line.rstrip("/")
+        # A slash anywhere but the end anchors the pattern to the scan root
+        regex = _translate_gitignore(line.lstrip("/"))
+        if "/" not in line:
+            regex = "(?:.*/)?" + regex
+        rules.append((regex, negate, dir_only))
+    return rules
+
+
+def load_ignore_file(path):
+    with open(path, encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+def _combine(regexes):
+    return re.compile("|".join(f"(?:{r})" for r in regexes)) if regexes else None
+
+
+def _combine_globs(globs):
+    # Globs without a slash match the entry name, the others its path relative to the root
+    names = [fnmatch.translate(g) for g in globs if "/" not in g]
+    paths = [fnmatch.translate(g.strip("/")) for g in globs if "/" in g]
+    return _combine(names), _combine(paths)
+
+
+# Compiled scan filter, evaluated by the crawlers during traversal: a pruned
+# directory is never listed, and a rejected file is never stat'ed (name rules)
+# or never appended (size/mtime rules). All glob lists are merged into one
+# regex per kind at construction. bind(root) returns a copy that knows the
+# scan root, for relative paths and depth.
+#   include / exclude   fnmatch globs; include only applies to files
+#   ignore_rules        gitignore-style lines (negation, dir-only, anchoring, **)
+#   min_size, max_size, modified_after, modified_before   inclusive bounds
+#   max_depth           deepest directory level listed (the root is 0)
+#   skip_dirs           directory names / path suffixes never descended
+class ScanFilter:
+    def __init__(self, include=(), exclude=(), ignore_rules=(), min_size=None, max_size=None,
+                 modified_after=None, modified_before=None, max_depth=None, skip_dirs=SKIP_DIRS):
+        self.include_name, self.include_path = _combine_globs(include)
+        self.exclude_name, self.exclude_path = _combine_globs(exclude)
+        self.has_include = bool(include)
+
+        rules = parse_ignore_rules(ignore_rules)
+        self.ignore_rules = [(re.compile(regex), negate, dir_only) for regex, negate, dir_only in rules]
+        if not any(negate for _, negate, _ in rules):
+            # Without negations no rule order matters: one regex for files, one for directories
+            self.ignore_file = _combine([regex for regex, _, dir_only in rules if not dir_only])
+            self.ignore_dir = _combine([regex for regex, _, _ in rules])
+            self.ignore_rules = None
+
+        # One anchored alternation instead of a substring test per rule
+        self.skip = re.compile(r"(?:^|/)(?:" + "|".join(re.escape(d) for d in skip_dirs) + r")$") if skip_dirs else None
+        self.min_size = min_size
+        self.max_size = max_size
+        self.modified_after = modified_after
+        self.modified_before = modified_before
+        self.max_depth = max_depth
+
+        self.filters_names = bool(include or exclude or rules)
+        self.filters_stat = any(v is not None for v in (min_size, max_size, modified_after, modified_before))
+        self.needs_path = bool(self.include_path or self.exclude_path or rules)
+        self.root_length = None
+
+    def bind(self, root):
+        bound = copy.copy(self)
+        bound.root_length = len(os.path.join(root, ""))
+        return bound
+
+    def _relative(self, path):
+        rel = path[self.root_length:]
+        return rel.replace(os.sep, "/") if os.sep != "/" else rel
+
+    def _ignored(self, rel, is_dir):
+        if self.ignore_rules is None:
+            regex = self.ignore_dir if is_dir else self.ignore_file
+            return bool(regex and regex.fullmatch(rel))
+        # Last matching rule wins
+        for regex, negate, dir_only in reversed(self.ignore_rules):
+            if (is_dir or not dir_only) and regex.fullmatch(rel):
+                return not negate
+        return False
+
+    def keep_dir(self, dir_path):
+        # Called for every subdirectory before it is queued
+        if self.skip and self.skip.search(dir_path if os.sep == "/" else dir_path.replace(os.sep, "/")):
+            return False
+        rel = self._relative(dir_path)
+        if self.max_depth is not None and rel.count("/") + 1 > self.max_depth:
+            return False
+        name = rel.rpartition("/")[2]
+        if self.exclude_name and self.exclude_name.match(name):
+            return False
+        if self.exclude_path and self.exclude_path.match(rel):
+            return False
+        return not self._ignored(rel, True)
+
+    def keep_name(self, dir_path, name):
+        # Name and path rules, checked before the file is stat'ed
+        if not self.filters_names:
+            return True
+        rel = self._relative(os.path.join(dir_path, name)) if self.needs_path else None
+        if self.has_include and not ((self.include_name and self.include_name.match(name)) or
+                                     (self.include_path and self.include_path.match(rel))):
+            return False
+        if self.exclude_name and self.exclude_name.match(name):
+            return False
+        if self.exclude_path and self.exclude_path.match(rel):
+            return False
+        return not (rel is not None and self._ignored(rel, False))
+
+    def keep_stat(self, size, mtime):
+        if not self.filters_stat:
+            return True
+        return ((self.min_size is None or size >= self.min_size) and
+                (self.max_size is None or size <= self.max_size) and
+                (self.modified_after is None or mtime >= self.modified_after) and
+                (self.modified_before is None or mtime <= self.modified_before))
+
+    def filter_files(self, dir_path, files):
+        # For listings that were not filtered while they were read (the incremental index)
+        return [f for f in files if self.keep_name(dir_path, f[0]) and self.keep_stat(f[1], f[2])]
@@ -0,0 +1,88 @@
+import os
+import sqlite3
+from array import array
+
+# Persistent per-directory cache of the previous scan, stored in SQLite.
+# A directory's mtime changes whenever an entry is created, deleted or renamed
+# inside it, so a directory whose mtime still matches the index can reuse the
+# cached listing without a single stat() on its files. Rewriting a file in place
+# does not touch its directory's mtime; delete the index file to force a full rescan.
+
+
+def _pack_names(names):
+    return b"\0".join(os.fsencode(name) for name in names)
+
+
+def _unpack_names(blob):
+    return [os.fsdecode(name) for name in blob.split(b"\0")] if blob else []
+
+
+def _prefix_range(dir_path):
+    prefix = os.fsencode(os.path.join(dir_path, ""))
+    return prefix, prefix[:-1] + bytes([prefix[-1] + 1])
+
+
+class ScanIndex:
+    def __init__(self, index_path):
+        self.index_path = index_path
+        self.conn = sqlite3.connect(index_path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(dirs)")]
+        if columns and "allocated" not in columns:
+            # Index from before allocation was recorded: it is only a cache, start over
+            self.conn.execute("DROP TABLE dirs")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS dirs (
+                path BLOB PRIMARY KEY,
+                mtime_ns INTEGER NOT NULL,
+                names BLOB NOT NULL,
+                sizes BLOB NOT NULL,
+                mtimes BLOB NOT NULL,
+                allocated BLOB NOT NULL,
+                links BLOB NOT NULL,
+                subdirs BLOB NOT NULL
+            )""")
+
+    def get(self, dir_path, mtime_ns):
+        row = self.conn.execute("SELECT names, sizes, mtimes, allocated, links, subdirs FROM dirs "
+                                "WHERE path = ? AND mtime_ns = ?", (os.fsencode(dir_path), mtime_ns)).fetchone()
+        if row is None:
+            return None
+        names, sizes, mtimes, allocated, links, subdirs = row
+        # links: (file index, st_dev, st_ino) triples for the hard-linked files
+        links = array('Q', links)
+        inodes = {links[i]: (links[i + 1], links[i + 2]) for i in range(0, len(links), 3)}
+        files = [(name, size, mtime, alloc, inodes.get(i)) for i, (name, size, mtime, alloc) in
+                 enumerate(zip(_unpack_names(names), array('q', sizes), array('d', mtimes), array('q', allocated)))]
+        return files, _unpack_names(subdirs)
+
+    def put(self, dir_path, mtime_ns, files, subdirs):
+        links = array('Q')
+        for i, (_, _, _, _, inode) in enumerate(files):
+            if inode is not None:
+                links.extend((i, *inode))
+        self.conn.execute("INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?, ?, ?, ?, ?)", (
+            os.fsencode(dir_path),
+            mtime_ns,
+            _pack_names(name for name, *_ in files),
+            array('q', [f[1] for f in files]).tobytes(),
+            array('d', [f[2] for f in files]).tobytes(),
+            array('q', [f[3] for f in files]).tobytes(),
+            links.tobytes(),
+            _pack_names(subdirs)
+        ))
+
+    def prune(self, root, visited):
+        # Forget directories under root that no longer exist (or are now skipped)
+        low, high = _prefix_range(root)
+        rows = self.conn.execute("SELECT path FROM dirs WHERE path = ? OR (path >= ? AND path < ?)",
+                                 (os.fsencode(root), low, high)).fetchall()
+        visited = {os.fsencode(path) for path in visited}
+        stale = [(path,) for (path,) in rows if path not in visited]
+        self.conn.executemany("DELETE FROM dirs WHERE path = ?", stale)
+        return len(stale)
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
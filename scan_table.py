@@ -0,0 +1,295 @@
+import os
+import datetime
+from array import array
+from collections.abc import Mapping
+
+import numpy as np
+
+from inodes import InodeSet
+
+
+def mtime_years(mtimes):
+    # Calendar year (local time, like datetime.fromtimestamp) of every mtime,
+    # computed by bucketing against the local Jan 1st boundaries.
+    mtimes = np.asarray(mtimes, dtype=np.float64)
+    if len(mtimes) == 0:
+        return np.zeros(0, dtype=np.int64)
+    first = datetime.datetime.fromtimestamp(mtimes.min()).year
+    last = datetime.datetime.fromtimestamp(mtimes.max()).year
+    boundaries = np.array([datetime.datetime(year, 1, 1).timestamp() for year in range(first + 1, last + 1)])
+    return first + np.searchsorted(boundaries, mtimes, side="right")
+
+
+# Read-only dict view of one row, for code written against the old list of dicts
+class FileRow(Mapping):
+    __slots__ = ("table", "index")
+    _keys = ("path", "size", "extension", "modified_date")
+
+    def __init__(self, table, index):
+        self.table = table
+        self.index = index
+
+    def __getitem__(self, key):
+        if key == "path":
+            return self.table.path(self.index)
+        if key == "size":
+            return int(self.table.size[self.index])
+        if key == "extension":
+            return self.table.extension(self.index)
+        if key == "modified_date":
+            return datetime.datetime.fromtimestamp(self.table.mtime[self.index])
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(self._keys)
+
+    def __len__(self):
+        return len(self._keys)
+
+    def __repr__(self):
+        return f"FileRow({dict(self)!r})"
+
+
+def _link_directories(dir_paths, dir_parent):
+    # Directories whose parent was registered by another builder (another
+    # worker's subtree) get linked to their nearest known ancestor by path;
+    # what is left with parent -1 is a scan root.
+    unlinked = np.nonzero(dir_parent < 0)[0].tolist()
+    if not unlinked:
+        return
+    index = {}
+    for i, path in enumerate(dir_paths):
+        index.setdefault(path, i)
+    for i in unlinked:
+        path = dir_paths[i]
+        parent = os.path.dirname(path)
+        while parent != path:
+            j = index.get(parent)
+            if j is not None:
+                dir_parent[i] = j
+                break
+            path, parent = parent, os.path.dirname(parent)
+
+
+# Columnar scan result: NumPy columns plus one pooled path buffer indexed by offsets.
+# Scans also record the directory tree: dir_id per file, and per directory its
+# parent directory id (-1 for the scan root) and its path. `allocated` is the
+# space on disk (st_blocks * 512) with every hard-linked inode counted on its
+# first path only; it is None for data that only knows apparent sizes.
+class ScanTable:
+    def __init__(self, size, mtime, ext_code, extensions, path_pool, path_offsets,
+                 dir_id=None, dir_parent=None, dir_paths=None, allocated=None):
+        self.size = size
+        self.mtime = mtime
+        self.ext_code = ext_code
+        self.extensions = extensions
+        self.path_pool = path_pool
+        self.path_offsets = path_offsets
+        self.dir_id = dir_id
+        self.dir_parent = dir_parent
+        self.dir_paths = dir_paths
+        self.allocated = allocated
+
+    def __len__(self):
+        return len(self.size)
+
+    def __bool__(self):
+        return len(self.size) > 0
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [FileRow(self, i) for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("ScanTable index out of range")
+        return FileRow(self, index)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield FileRow(self, i)
+
+    def path(self, index):
+        start, end = self.path_offsets[index], self.path_offsets[index + 1]
+        return os.fsdecode(self.path_pool[start:end].tobytes())
+
+    def paths(self):
+        pool = self.path_pool.tobytes()
+        offsets = self.path_offsets.tolist()
+        for i in range(len(self)):
+            yield os.fsdecode(pool[offsets[i]:offsets[i + 1]])
+
+    def extension(self, index):
+        return self.extensions[self.ext_code[index]]
+
+    def ext_code_of(self, extension):
+        try:
+            return self.extensions.index(extension)
+        except ValueError:
+            return -1
+
+    def extension_counts(self):
+        return np.bincount(self.ext_code, minlength=len(self.extensions))
+
+    def allocated_or_size(self):
+        return self.allocated if self.allocated is not None else self.size
+
+    def extension_totals(self, with_allocated=False):
+        # Per-extension file counts and exact int64 byte totals, one grouped pass;
+        # with_allocated adds the allocated-byte totals from the same sort
+        counts = self.extension_counts()
+        columns = [self.size, self.allocated_or_size()] if with_allocated else [self.size]
+        totals = [np.zeros(len(self.extensions), dtype=np.int64) for _ in columns]
+        present = counts > 0
+        if len(self):
+            order = np.argsort(self.ext_code, kind="stable")
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))[present]
+            for total, column in zip(totals, columns):
+                total[present] = np.add.reduceat(column[order], starts)
+        return (counts, *totals)
+
+    def take(self, indices):
+        if isinstance(indices, slice):
+            indices = np.arange(len(self))[indices]
+        indices = np.asarray(indices, dtype=np.int64)
+        starts = self.path_offsets[indices]
+        lengths = self.path_offsets[indices + 1] - starts
+        offsets = np.zeros(len(indices) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        # Gather every selected path's bytes with one fancy-index instead of a Python loop
+        gather = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1], dtype=np.int64)
+        return ScanTable(self.size[indices], self.mtime[indices], self.ext_code[indices],
+                         self.extensions, self.path_pool[gather], offsets,
+                         self.dir_id[indices] if self.dir_id is not None else None,
+                         self.dir_parent, self.dir_paths,
+                         self.allocated[indices] if self.allocated is not None else None)
+
+    @classmethod
+    def empty(cls):
+        return ScanTableBuilder().build()
+
+    @classmethod
+    def from_records(cls, records):
+        builder = ScanTableBuilder()
+        for f in records:
+            builder.enter_directory(os.path.dirname(f["path"]))
+            builder.append(f["path"], f["size"], f["modified_date"].timestamp(), f["extension"])
+        return builder.build()
+
+    @classmethod
+    def concat(cls, tables):
+        # Tables without files still carry the directories their builder listed
+        tables = [t for t in tables if len(t) or t.dir_paths]
+        if not tables:
+            return cls.empty()
+        if len(tables) == 1:
+            return tables[0]
+
+        ext_index = {}
+        ext_codes = []
+        offsets = [np.zeros(1, dtype=np.int64)]
+        base = 0
+        for t in tables:
+            remap = np.array([ext_index.setdefault(ext, len(ext_index)) for ext in t.extensions], dtype=np.int32)
+            ext_codes.append(remap[t.ext_code])
+            offsets.append(t.path_offsets[1:] + base)
+            base += int(t.path_offsets[-1])
+        extensions = list(ext_index)
+
+        dir_id = dir_parent = dir_paths = None
+        if all(t.dir_id is not None for t in tables):
+            dir_ids = []
+            dir_parents = []
+            dir_paths = []
+            for t in tables:
+                base = len(dir_paths)
+                dir_ids.append(t.dir_id + base)
+                dir_parents.append(np.where(t.dir_parent >= 0, t.dir_parent + base, -1).astype(np.int32))
+                dir_paths.extend(t.dir_paths)
+            dir_id = np.concatenate(dir_ids)
+            dir_parent = np.concatenate(dir_parents)
+            _link_directories(dir_paths, dir_parent)
+        allocated = None
+        if any(t.allocated is not None for t in tables):
+            allocated = np.concatenate([t.allocated_or_size() for t in tables])
+
+        return cls(np.concatenate([t.size for t in tables]),
+                   np.concatenate([t.mtime for t in tables]),
+                   np.concatenate(ext_codes),
+                   extensions,
+                   np.concatenate([t.path_pool for t in tables]),
+                   np.concatenate(offsets),
+                   dir_id, dir_parent, dir_paths, allocated)
+
+
+def as_scan_table(file_data):
+    if isinstance(file_data, ScanTable):
+        return file_data
+    return ScanTable.from_records(file_data)
+
+
+# Append-only row collector backed by compact stdlib arrays; build() hands the columns to NumPy.
+# Builders that fill one result in parallel share `inodes`, so a hard link met by
+# two of them is still counted once; `links` lists the (dev, ino, row) this builder
+# counted, for merging with builders that could not share the set (other processes).
+class ScanTableBuilder:
+    def __init__(self, inodes=None):
+        self.inodes = inodes if inodes is not None else InodeSet()
+        self.links = []
+        self.sizes = array('q')
+        self.allocated = array('q')
+        self.mtimes = array('d')
+        self.ext_codes = array('i')
+        self.path_pool = bytearray()
+        self.path_offsets = array('q', [0])
+        self.ext_index = {}
+        self.dir_ids = array('i')
+        self.dir_parents = array('i')
+        self.dir_paths = []
+        self.dir_index = {}
+        self.current_dir = -1
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def enter_directory(self, dir_path):
+        # Rows appended from here on belong to dir_path. Crawlers enter every
+        # directory they list, files or not, so the tree has no gaps.
+        dir_path = os.path.normpath(dir_path)
+        dir_id = self.dir_index.get(dir_path)
+        if dir_id is None:
+            dir_id = self.dir_index[dir_path] = len(self.dir_paths)
+            self.dir_paths.append(dir_path)
+            self.dir_parents.append(self.dir_index.get(os.path.dirname(dir_path), -1))
+        self.current_dir = dir_id
+
+    def append(self, path, size, mtime, extension, allocated=None, inode=None):
+        # allocated defaults to the apparent size; inode is (st_dev, st_ino) of a file with st_nlink > 1
+        code = self.ext_index.get(extension)
+        if code is None:
+            code = self.ext_index[extension] = len(self.ext_index)
+        if inode is not None:
+            if self.inodes.add(*inode):
+                self.links.append((inode[0], inode[1], len(self.sizes)))
+            else:
+                allocated = 0
+        self.sizes.append(size)
+        self.allocated.append(size if allocated is None else allocated)
+        self.mtimes.append(mtime)
+        self.ext_codes.append(code)
+        self.dir_ids.append(self.current_dir)
+        self.path_pool += os.fsencode(path)
+        self.path_offsets.append(len(self.path_pool))
+
+    def build(self):
+        dir_parent = np.frombuffer(self.dir_parents, dtype=np.int32).copy()
+        _link_directories(self.dir_paths, dir_parent)
+        return ScanTable(np.frombuffer(self.sizes, dtype=np.int64).copy(),
+                         np.frombuffer(self.mtimes, dtype=np.float64).copy(),
+                         np.frombuffer(self.ext_codes, dtype=np.int32).copy(),
+                         list(self.ext_index),
+                         np.frombuffer(bytes(self.path_pool), dtype=np.uint8),
+                         np.frombuffer(self.path_offsets, dtype=np.int64).copy(),
+                         np.frombuffer(self.dir_ids, dtype=np.int32).copy(),
+                         dir_parent, list(self.dir_paths),
+                         np.frombuffer(self.allocated, dtype=np.int64).copy())
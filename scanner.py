@@ -1,50 +1,435 @@
 import os
-import datetime
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 
-def scan_files(folder_path, max_files=None):
-    file_data = []
+import metrics
+from checkpoint import ScanCheckpoint
+from inodes import InodeSet
+from scan_filter import SKIP_DIRS, ScanFilter
+from scan_index import ScanIndex
+from scan_table import ScanTable, ScanTableBuilder
 
+DEFAULT_FILTER = ScanFilter()
+
+
+def scan_files(folder_path, max_files=None, engine="walk", workers=None, index_path=None, scan_filter=None,
+               checkpoint_path=None, resume=False, checkpoint_interval=30.0):
+    # scan_filter (a ScanFilter) is evaluated during traversal; the default only skips SKIP_DIRS.
+    # checkpoint_path: flush progress there every checkpoint_interval seconds; with resume=True an
+    # interrupted scan of the same folder continues from it. Removed once the scan completes.
     if not os.path.exists(folder_path):
         print(f"Folder does not exist: {folder_path}")
-        return file_data
+        return ScanTable.empty()
 
     print(f"Starting scan on: {folder_path}")
     if max_files:
         print(f"Note: Limited to {max_files:,} files")
 
+    scan_filter = (scan_filter or DEFAULT_FILTER).bind(folder_path)
+    if checkpoint_path:
+        if engine != "walk" or index_path:
+            print("Note: checkpointed scans use the sequential crawler")
+        file_data = _scan_checkpointed(folder_path, max_files, scan_filter, checkpoint_path, resume,
+                                       checkpoint_interval)
+    elif index_path:
+        file_data = _scan_incremental(folder_path, max_files, index_path, scan_filter)
+    elif engine == "walk":
+        file_data = _scan_walk(folder_path, max_files, scan_filter)
+    elif engine == "parallel":
+        file_data = _scan_parallel(folder_path, max_files, workers or os.cpu_count() or 1, scan_filter)
+    elif engine == "process":
+        file_data = _scan_processes(folder_path, max_files, workers or os.cpu_count() or 1, scan_filter)
+    elif engine == "async":
+        # For high-latency network mounts: `workers` is the number of calls kept in flight
+        from async_scanner import scan_async
+        file_data = scan_async(folder_path, workers or 64, max_files, scan_filter=scan_filter)
+    else:
+        print(f"Unknown scan engine: {engine}")
+        return ScanTable.empty()
+
+    if max_files and len(file_data) >= max_files:
+        print(f"\n\nReached limit ({max_files:,}). Stopping.")
+        return file_data.take(slice(0, max_files))
+
+    print(f"\n\nScan complete! Found {len(file_data):,} files.")
+    return file_data
+
+
+def iter_scan_batches(folder_path, batch_size=100000, max_files=None, scan_filter=None):
+    # Streaming scan: yields ScanTable batches of about batch_size rows (a batch
+    # closes at the first directory boundary past batch_size), so memory is
+    # bounded by one batch plus the pending-directory stack.
+    if not os.path.exists(folder_path):
+        print(f"Folder does not exist: {folder_path}")
+        return
+
+    print(f"Starting streaming scan on: {folder_path}")
+    scan_filter = (scan_filter or DEFAULT_FILTER).bind(folder_path)
+    # One inode set for the whole stream, so a hard link in two batches counts once
+    inodes = InodeSet()
+    builder = ScanTableBuilder(inodes)
+    count = 0
+    stack = [folder_path]
+
+    while stack:
+        dir_path = stack.pop()
+        listing = _list_directory(dir_path, scan_filter)
+        if listing is None:
+            continue
+        files, subdirs = listing
+        if max_files:
+            files = files[:max_files - count]
+        _append_files(builder, dir_path, files)
+        count += len(files)
+        stack.extend(reversed(_child_dirs(dir_path, subdirs, scan_filter)))
+
+        if len(builder) >= batch_size:
+            print(f"\rScanned {count} files...", end="", flush=True)
+            yield builder.build()
+            builder = ScanTableBuilder(inodes)
+        if max_files and count >= max_files:
+            print(f"\n\nReached limit ({max_files:,}). Stopping.")
+            break
+    else:
+        print(f"\n\nScan complete! Found {count:,} files.")
+
+    if len(builder):
+        yield builder.build()
+
+
+def _scan_walk(folder_path, max_files, scan_filter):
+    builder = ScanTableBuilder()
     count = 0
+    # os.walk lists a directory right before yielding it, so with metrics on, the
+    # time from the end of one directory to the end of the next is that
+    # directory's listing plus its stat calls
+    recorder = metrics.current()
+    last = time.perf_counter() if recorder else 0.0
 
-    skip_dirs = {'.Trash', 'Library/Caches', '$RECYCLE.BIN', '.git', 'node_modules', '__pycache__'}
+    for root, dirs, files in os.walk(folder_path, onerror=recorder.count_error if recorder else None):
+        dirs[:] = [d for d in dirs if scan_filter.keep_dir(os.path.join(root, d))]
+        builder.enter_directory(root)
+        stat_ns = [] if recorder else None
+        before = count
+        errors = 0
 
-    for root, dirs, files in os.walk(folder_path):
-        dirs[:] = [d for d in dirs if not any(skip in os.path.join(root, d) for skip in skip_dirs)]
-        
         for filename in files:
+            if not scan_filter.keep_name(root, filename):
+                continue
             file_path = os.path.join(root, filename)
 
             try:
-                size = os.path.getsize(file_path)
-                modified_time = os.path.getmtime(file_path)
+                if stat_ns is None:
+                    st = os.stat(file_path)
+                else:
+                    start = time.perf_counter_ns()
+                    st = os.stat(file_path)
+                    stat_ns.append(time.perf_counter_ns() - start)
             except:
+                errors += 1
+                continue
+            if not scan_filter.keep_stat(st.st_size, st.st_mtime):
                 continue
 
-            extension = os.path.splitext(filename)[1].lower()
-            modified_date = datetime.datetime.fromtimestamp(modified_time)
-
-            file_data.append({
-                "path": file_path,
-                "size": size,
-                "extension": extension,
-                "modified_date": modified_date
-            })
+            builder.append(file_path, st.st_size, st.st_mtime, os.path.splitext(filename)[1].lower(), *allocation(st))
 
             count += 1
             if count % 5000 == 0:
                 print(f"\rScanned {count} files...", end="", flush=True)
 
-            if max_files and len(file_data) >= max_files:
-                print(f"\n\nReached limit ({max_files:,}). Stopping.")
-                return file_data
+            if max_files and count >= max_files:
+                return builder.build()
 
-    print(f"\n\nScan complete! Found {len(file_data):,} files.")
-    return file_data
\ No newline at end of file
+        if recorder:
+            now = time.perf_counter()
+            recorder.record_directory(root, now - last, count - before, errors, stat_ns)
+            last = now
+
+    return builder.build()
+
+
+def allocation(st):
+    # (allocated bytes, (st_dev, st_ino) when the inode has other links) from one stat result;
+    # without st_blocks (Windows) the apparent size stands in for the allocation
+    blocks = getattr(st, "st_blocks", None)
+    allocated = blocks * 512 if blocks is not None else st.st_size
+    return allocated, (st.st_dev, st.st_ino) if st.st_nlink > 1 else None
+
+
+def _list_directory(dir_path, scan_filter=None):
+    # One scandir pass per directory: the DirEntry already knows the entry type,
+    # and entry.stat() is a single cached syscall for size, mtime and allocation.
+    # With a scan_filter, files rejected by name are never stat'ed.
+    # Files are (name, size, mtime, allocated bytes, inode or None), see allocation().
+    # With a metrics recorder active, the listing time and every stat() latency are reported.
+    recorder = metrics.current()
+    start = time.perf_counter() if recorder else 0.0
+    stat_ns = [] if recorder else None
+    errors = 0
+    files = []
+    subdirs = []
+    try:
+        with os.scandir(dir_path) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir():
+                        # os.walk does not descend into symlinked directories either
+                        if not entry.is_symlink():
+                            subdirs.append(entry.name)
+                        continue
+                    if scan_filter and not scan_filter.keep_name(dir_path, entry.name):
+                        continue
+                    if stat_ns is None:
+                        st = entry.stat()
+                    else:
+                        stat_start = time.perf_counter_ns()
+                        st = entry.stat()
+                        stat_ns.append(time.perf_counter_ns() - stat_start)
+                except OSError:
+                    errors += 1
+                    continue
+                if scan_filter and not scan_filter.keep_stat(st.st_size, st.st_mtime):
+                    continue
+                files.append((entry.name, st.st_size, st.st_mtime, *allocation(st)))
+    except OSError:
+        if recorder:
+            recorder.count_error()
+        return None
+    if recorder:
+        recorder.record_directory(dir_path, time.perf_counter() - start, len(files), errors, stat_ns)
+    return files, subdirs
+
+
+def _append_files(out, dir_path, files):
+    out.enter_directory(dir_path)
+    for name, size, mtime, allocated, inode in files:
+        out.append(os.path.join(dir_path, name), size, mtime, os.path.splitext(name)[1].lower(), allocated, inode)
+
+
+def _child_dirs(dir_path, subdirs, scan_filter):
+    child_paths = (os.path.join(dir_path, name) for name in subdirs)
+    return [path for path in child_paths if scan_filter.keep_dir(path)]
+
+
+def _scan_directory(dir_path, out, scan_filter):
+    listing = _list_directory(dir_path, scan_filter)
+    if listing is None:
+        return []
+    files, subdirs = listing
+    _append_files(out, dir_path, files)
+    return _child_dirs(dir_path, subdirs, scan_filter)
+
+
+def _scan_parallel(folder_path, max_files, workers, scan_filter):
+    # Work-stealing pool: every worker pushes the subdirectories it discovers
+    # onto its own deque and pops from the same end (depth-first, cache friendly).
+    # Idle workers steal from the opposite end of the other deques, which hands
+    # them the oldest - and usually largest - pending subtrees.
+    queues = [deque() for _ in range(workers)]
+    inodes = InodeSet()
+    results = [ScanTableBuilder(inodes) for _ in range(workers)]
+    queues[0].append(folder_path)
+
+    state = {"pending": 1, "count": 0, "stop": False}
+    cond = threading.Condition()
+
+    def next_dir(worker_id):
+        try:
+            return queues[worker_id].pop()
+        except IndexError:
+            pass
+        for offset in range(1, workers):
+            try:
+                return queues[(worker_id + offset) % workers].popleft()
+            except IndexError:
+                continue
+        return None
+
+    def run(worker_id):
+        out = results[worker_id]
+        while True:
+            # A full deque must not keep a worker listing directories past max_files
+            with cond:
+                if state["stop"]:
+                    return
+            dir_path = next_dir(worker_id)
+            if dir_path is None:
+                with cond:
+                    if state["pending"] == 0 or state["stop"]:
+                        return
+                    cond.wait(0.01)
+                continue
+
+            before = len(out)
+            subdirs = _scan_directory(dir_path, out, scan_filter)
+
+            with cond:
+                old_count = state["count"]
+                state["count"] += len(out) - before
+                if state["count"] // 5000 > old_count // 5000:
+                    print(f"\rScanned {state['count']} files...", end="", flush=True)
+                if max_files and state["count"] >= max_files:
+                    state["stop"] = True
+                if state["stop"]:
+                    subdirs = []
+                # Count the new subdirectories before publishing them so that
+                # "pending == 0" can only be observed once the whole tree is done.
+                state["pending"] += len(subdirs) - 1
+                if state["pending"] == 0 or state["stop"]:
+                    cond.notify_all()
+
+            if subdirs:
+                queues[worker_id].extend(subdirs)
+                with cond:
+                    cond.notify(len(subdirs))
+
+    threads = [threading.Thread(target=run, args=(i,), daemon=True) for i in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    return ScanTable.concat([out.build() for out in results])
+
+
+def _scan_incremental(folder_path, max_files, index_path, scan_filter):
+    index = ScanIndex(index_path)
+    builder = ScanTableBuilder()
+    visited = set()
+    reused = rescanned = 0
+    stack = [folder_path]
+
+    while stack:
+        dir_path = stack.pop()
+        try:
+            # Read the mtime before listing: if the directory changes in between,
+            # the stored mtime is older than the listing and the next run rescans it.
+            mtime_ns = os.stat(dir_path).st_mtime_ns
+        except OSError:
+            continue
+
+        listing = index.get(dir_path, mtime_ns)
+        if listing is None:
+            listing = _list_directory(dir_path)
+            if listing is None:
+                continue
+            index.put(dir_path, mtime_ns, *listing)
+            rescanned += 1
+        else:
+            reused += 1
+        visited.add(dir_path)
+
+        # The index keeps unfiltered listings, so a different filter can reuse them
+        files, subdirs = listing
+        if scan_filter.filters_names or scan_filter.filters_stat:
+            files = scan_filter.filter_files(dir_path, files)
+        before = len(builder)
+        _append_files(builder, dir_path, files)
+        stack.extend(reversed(_child_dirs(dir_path, subdirs, scan_filter)))
+
+        if len(builder) // 5000 > before // 5000:
+            print(f"\rScanned {len(builder)} files...", end="", flush=True)
+        if max_files and len(builder) >= max_files:
+            break
+    else:
+        index.prune(folder_path, visited)
+
+    index.close()
+    print(f"\nIndex {index_path}: reused {reused:,} unchanged directories, rescanned {rescanned:,}")
+    return builder.build()
+
+
+def _scan_checkpointed(folder_path, max_files, scan_filter, checkpoint_path, resume, interval):
+    # Depth-first stack crawl whose whole state is the rows scanned so far and
+    # the stack itself, both appended to the checkpoint at directory boundaries.
+    # A directory is always written together with the frontier that follows it,
+    # so a resumed scan lists every directory exactly once.
+    checkpoint = ScanCheckpoint(checkpoint_path, folder_path, resume)
+    tables = checkpoint.tables
+    stack = checkpoint.frontier if checkpoint.frontier is not None else [folder_path]
+    count = sum(len(t) for t in tables)
+    if checkpoint.frontier is not None:
+        print(f"Resuming from {checkpoint_path}: {count:,} files, {len(stack):,} directories pending")
+
+    # Hard links counted before the interruption stay counted
+    inodes = InodeSet()
+    for dev, ino in checkpoint.links:
+        inodes.add(dev, ino)
+    builder = ScanTableBuilder(inodes)
+    last_flush = time.monotonic()
+    try:
+        while stack:
+            # Directories are never cut short, so the checkpoint holds them whole
+            if max_files and count >= max_files:
+                break
+            before = count
+            rows = len(builder)
+            stack.extend(reversed(_scan_directory(stack.pop(), builder, scan_filter)))
+            count += len(builder) - rows
+            if count // 5000 > before // 5000:
+                print(f"\rScanned {count} files...", end="", flush=True)
+            if time.monotonic() - last_flush >= interval:
+                checkpoint.write(builder.build(), stack, builder.links)
+                builder = ScanTableBuilder(inodes)
+                last_flush = time.monotonic()
+        if stack:
+            checkpoint.write(builder.build(), stack, builder.links)
+        else:
+            tables.append(builder.build())
+    finally:
+        checkpoint.close()
+
+    if not stack:
+        os.remove(checkpoint_path)
+    return ScanTable.concat(tables)
+
+
+def _scan_subtree(dir_path, max_files=None, scan_filter=DEFAULT_FILTER):
+    # Runs inside a worker process. The ScanTable goes back to the parent as a
+    # few contiguous NumPy buffers, which pickle far cheaper than per-file dicts,
+    # with the hard links it counted so the parent can dedupe them across shards.
+    builder = ScanTableBuilder()
+    stack = [dir_path]
+    while stack:
+        stack.extend(reversed(_scan_directory(stack.pop(), builder, scan_filter)))
+        if max_files and len(builder) >= max_files:
+            break
+    return builder.build(), builder.links
+
+
+def _split_shards(folder_path, target, builder, scan_filter, max_levels=3):
+    # Breadth-first split of the top of the tree until there are enough subtrees
+    # to keep every worker busy; files met on the way are scanned by the parent.
+    shards = [folder_path]
+    for _ in range(max_levels):
+        if len(shards) >= target:
+            break
+        children = []
+        for dir_path in shards:
+            children.extend(_scan_directory(dir_path, builder, scan_filter))
+        shards = children
+        if not shards:
+            break
+    return shards
+
+
+def _scan_processes(folder_path, max_files, workers, scan_filter):
+    builder = ScanTableBuilder()
+    shards = _split_shards(folder_path, workers * 4, builder, scan_filter)
+    tables = [builder.build()]
+    count = len(tables[0])
+
+    if shards:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for table, links in pool.map(_scan_subtree, shards, [max_files] * len(shards),
+                                         [scan_filter] * len(shards)):
+                for dev, ino, row in links:
+                    if not builder.inodes.add(dev, ino):
+                        table.allocated[row] = 0
+                tables.append(table)
+                count += len(table)
+                print(f"\rScanned {count} files...", end="", flush=True)
+
+    return ScanTable.concat(tables)
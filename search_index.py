@@ -0,0 +1,264 @@
+import datetime
+import fnmatch
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+from scan_table import ScanTable, as_scan_table
+from snapshot import read_columns, write_columns
+
+# Persistent file-name search index, stored in the snapshot container so a
+# query opens it through a read-only mmap and only pages in what it touches:
+#   - the scan columns themselves (size, mtime, ext_code, paths)
+#   - a trigram index over lower-cased file names: sorted trigram keys,
+#     offsets into a postings list of row ids (deduplicated per row)
+#   - row ids sorted by size, by mtime and by extension (+ extension offsets)
+# A query takes the most selective predicate as its candidate list and checks
+# the remaining ones against the columns of those candidates only.
+INDEX_FORMAT = "fsa-search-index"
+BUILD_CHUNK_ROWS = 1_000_000
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+def _name_ranges(table):
+    # Start/end byte offsets of every file name (the part after the last separator)
+    starts = table.path_offsets[:-1]
+    ends = table.path_offsets[1:]
+    seps = np.nonzero((table.path_pool == ord("/")) | (table.path_pool == ord(os.sep)))[0]
+    last_sep = np.searchsorted(seps, ends, side="left") - 1
+    name_starts = np.where(last_sep >= 0, seps[np.maximum(last_sep, 0)] + 1, starts)
+    return np.maximum(name_starts, starts), ends
+
+
+def _lowercase(data):
+    data = data.copy()
+    upper = (data >= ord("A")) & (data <= ord("Z"))
+    data[upper] += 32
+    return data
+
+
+def _trigram_keys(data):
+    data = data.astype(np.uint32)
+    return (data[:-2] << 16) | (data[1:-1] << 8) | data[2:]
+
+
+def _build_trigrams(table):
+    name_starts, name_ends = _name_ranges(table)
+    pool = _lowercase(np.asarray(table.path_pool))
+    pairs = []
+    for chunk_start in range(0, len(table), BUILD_CHUNK_ROWS):
+        rows = np.arange(chunk_start, min(chunk_start + BUILD_CHUNK_ROWS, len(table)), dtype=np.int64)
+        counts = np.maximum(name_ends[rows] - name_starts[rows] - 2, 0)
+        row_ids = np.repeat(rows, counts)
+        first = np.repeat(name_starts[rows], counts)
+        within = np.arange(len(row_ids)) - np.repeat(np.cumsum(counts) - counts, counts)
+        positions = first + within
+        keys = (pool[positions].astype(np.uint64) << np.uint64(16)) | \
+               (pool[positions + 1].astype(np.uint64) << np.uint64(8)) | pool[positions + 2].astype(np.uint64)
+        pairs.append((keys << np.uint64(32)) | row_ids.astype(np.uint64))
+    pairs = np.concatenate(pairs) if pairs else np.zeros(0, dtype=np.uint64)
+    if not len(pairs):
+        # Empty scan, or only names shorter than three bytes
+        return np.zeros(0, dtype=np.uint32), np.zeros(1, dtype=np.int64), np.zeros(0, dtype=np.uint32)
+    pairs.sort()
+    # A trigram repeated within one name is posted once
+    pairs = pairs[np.append(True, pairs[1:] != pairs[:-1])]
+
+    trigrams = (pairs >> np.uint64(32)).astype(np.uint32)
+    postings = (pairs & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+    starts = np.nonzero(np.append(True, trigrams[1:] != trigrams[:-1]))[0]
+    keys = trigrams[starts]
+    offsets = np.append(starts, len(postings)).astype(np.int64)
+    return keys, offsets, postings
+
+
+def build_search_index(file_data, index_file, root=None):
+    table = as_scan_table(file_data)
+    row_dtype = np.int32 if len(table) < 2 ** 31 else np.int64
+
+    trigram_keys, trigram_offsets, postings = _build_trigrams(table)
+    ext_order = np.argsort(table.ext_code, kind="stable").astype(row_dtype)
+    ext_offsets = np.zeros(len(table.extensions) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(table.ext_code, minlength=len(table.extensions)), out=ext_offsets[1:])
+
+    columns = {
+        "size": table.size,
+        "mtime": table.mtime,
+        "ext_code": table.ext_code,
+        "path_pool": table.path_pool,
+        "path_offsets": table.path_offsets,
+        "trigram_keys": trigram_keys,
+        "trigram_offsets": trigram_offsets,
+        "postings": postings,
+        "size_order": np.argsort(table.size, kind="stable").astype(row_dtype),
+        "mtime_order": np.argsort(table.mtime, kind="stable").astype(row_dtype),
+        "ext_order": ext_order,
+        "ext_offsets": ext_offsets,
+    }
+    write_columns(index_file, {"format": INDEX_FORMAT, "version": 1, "root": root,
+                               "extensions": list(table.extensions)}, columns)
+
+
+def parse_size(text):
+    # "50MB", "1.5G", "4096"
+    match = re.fullmatch(r"\s*([\d.]+)\s*([KMGT]?)B?\s*", text.upper())
+    if not match:
+        raise ValueError(f"Invalid size: {text}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
+
+def parse_date(text):
+    # "2025", "2025-03" or a full ISO date, as a local timestamp
+    parts = text.split("-")
+    if len(parts) < 3:
+        return datetime.datetime(int(parts[0]), int(parts[1]) if len(parts) > 1 else 1, 1).timestamp()
+    return datetime.datetime.fromisoformat(text).timestamp()
+
+
+class SearchIndex:
+    def __init__(self, index_file):
+        header, self.columns = read_columns(index_file)
+        if header.get("format") != INDEX_FORMAT:
+            raise ValueError(f"Not a search index: {index_file}")
+        self.header = header
+        c = self.columns
+        self.table = ScanTable(c["size"], c["mtime"], c["ext_code"], header["extensions"],
+                               c["path_pool"], c["path_offsets"])
+
+    def _range(self, order, values, low, high):
+        # Binary search over a sorted permutation, touching O(log n) rows only
+        def bisect(x, strict):
+            lo, hi = 0, len(order)
+            while lo < hi:
+                mid = (lo + hi) // 2
+                value = values[order[mid]]
+                if value < x or (strict and value == x):
+                    lo = mid + 1
+                else:
+                    hi = mid
+            return lo
+        start = bisect(low, False) if low is not None else 0
+        end = bisect(high, True) if high is not None else len(order)
+        return start, end
+
+    def _trigram_candidates(self, pattern):
+        # Rows whose name contains every trigram of every literal run of the glob.
+        # Literals get the index's ASCII-only fold; trigrams with a non-ASCII byte
+        # are skipped, since the final (Unicode-lowercased) match may pair them
+        # with differently cased bytes - the candidates stay a superset.
+        literals = [_lowercase(np.frombuffer(part.encode(), dtype=np.uint8))
+                    for part in re.split(r"[*?]|\[[^\]]*\]", pattern)]
+        trigrams = set()
+        for literal in literals:
+            if len(literal) >= 3:
+                ascii_only = (literal[:-2] < 128) & (literal[1:-1] < 128) & (literal[2:] < 128)
+                trigrams.update(_trigram_keys(literal)[ascii_only].tolist())
+        if not trigrams:
+            return None
+        keys = self.columns["trigram_keys"]
+        offsets = self.columns["trigram_offsets"]
+        lists = []
+        for key in trigrams:
+            pos = int(np.searchsorted(keys, key))
+            if pos == len(keys) or keys[pos] != key:
+                return np.zeros(0, dtype=np.int64)
+            lists.append((int(offsets[pos + 1] - offsets[pos]), pos))
+        result = None
+        for _, pos in sorted(lists):
+            rows = self.columns["postings"][offsets[pos]:offsets[pos + 1]]
+            result = rows if result is None else np.intersect1d(result, rows, assume_unique=True)
+            if not len(result):
+                break
+        return result.astype(np.int64)
+
+    def query(self, name=None, min_size=None, max_size=None, since=None, until=None, limit=100):
+        table = self.table
+        plans = []
+        ext_match = re.fullmatch(r"\*(\.[^*?\[\]/]+)", name) if name else None
+        # The extension column answers "*.ext" only for a recorded extension;
+        # anything else ("*.tar.gz") takes the trigram + fnmatch path
+        code = table.ext_code_of(ext_match.group(1).lower()) if ext_match else -1
+        if code < 0:
+            ext_match = None
+        if ext_match:
+            offsets = self.columns["ext_offsets"]
+            plans.append((int(offsets[code + 1] - offsets[code]), "ext_order", int(offsets[code]), int(offsets[code + 1])))
+        if min_size is not None or max_size is not None:
+            start, end = self._range(self.columns["size_order"], table.size, min_size, max_size)
+            plans.append((end - start, "size_order", start, end))
+        if since is not None or until is not None:
+            start, end = self._range(self.columns["mtime_order"], table.mtime, since, until)
+            plans.append((end - start, "mtime_order", start, end))
+
+        trigram_rows = self._trigram_candidates(name) if name and not ext_match else None
+        if trigram_rows is not None:
+            plans.append((len(trigram_rows), None, 0, 0))
+
+        if plans:
+            count, column, start, end = min(plans, key=lambda plan: plan[0])
+            rows = trigram_rows if column is None else np.asarray(self.columns[column][start:end], dtype=np.int64)
+        else:
+            rows = np.arange(len(table), dtype=np.int64)
+
+        # Check every predicate on the candidates' columns (the chosen one passes trivially)
+        keep = np.ones(len(rows), dtype=bool)
+        if ext_match:
+            keep &= table.ext_code[rows] == code
+        sizes = table.size[rows]
+        if min_size is not None:
+            keep &= sizes >= min_size
+        if max_size is not None:
+            keep &= sizes <= max_size
+        if since is not None or until is not None:
+            mtimes = table.mtime[rows]
+            if since is not None:
+                keep &= mtimes >= since
+            if until is not None:
+                keep &= mtimes <= until
+        rows = rows[keep]
+        rows = rows[np.argsort(-table.size[rows], kind="stable")]
+
+        matcher = re.compile(fnmatch.translate(name.lower())).match if name and not ext_match else None
+        results = []
+        for row in rows.tolist():
+            path = table.path(row)
+            if matcher and not matcher(os.path.basename(path).lower()):
+                continue
+            results.append((path, int(table.size[row]), float(table.mtime[row])))
+            if limit and len(results) >= limit:
+                break
+        return results
+
+
+if __name__ == "__main__":
+    usage = ("Usage:\n"
+             "  python search_index.py build <folder> <index.fsidx>\n"
+             "  python search_index.py query <index.fsidx> [--name GLOB] [--min-size 50MB] [--max-size SIZE]\n"
+             "                               [--since 2025] [--until 2025-06-30] [--limit N]")
+    args = sys.argv[1:]
+    if len(args) >= 3 and args[0] == "build":
+        from scanner import scan_files
+        start_time = time.perf_counter()
+        build_search_index(scan_files(args[1]), args[2], root=args[1])
+        print(f"Index written to {args[2]} in {time.perf_counter() - start_time:.2f}s")
+    elif len(args) >= 2 and args[0] == "query":
+        options = dict(zip(args[2::2], args[3::2]))
+        start_time = time.perf_counter()
+        index = SearchIndex(args[1])
+        results = index.query(name=options.get("--name"),
+                              min_size=parse_size(options["--min-size"]) if "--min-size" in options else None,
+                              max_size=parse_size(options["--max-size"]) if "--max-size" in options else None,
+                              since=parse_date(options["--since"]) if "--since" in options else None,
+                              until=parse_date(options["--until"]) if "--until" in options else None,
+                              limit=int(options.get("--limit", 100)))
+        elapsed = (time.perf_counter() - start_time) * 1000
+        for path, size, mtime in results:
+            modified = datetime.datetime.fromtimestamp(mtime).strftime('%Y-%m-%d')
+            print(f"{size / (1024 * 1024):10.2f} MB  {modified}  {path}")
+        print(f"\n{len(results)} results in {elapsed:.1f} ms")
+    else:
+        print(usage)
+        sys.exit(1)
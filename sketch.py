@@ -0,0 +1,139 @@
+import math
+
+import numpy as np
+
+
+# Mergeable quantile sketch for file sizes (DDSketch): every positive size falls
+# into a log-spaced bucket [gamma^(i-1), gamma^i), so any quantile read back from
+# the bucket counts is within relative_accuracy of the true value. Memory depends
+# on the size range (about 1,400 buckets from 1 byte to 1 TB at 1%), not on the
+# number of files, and two sketches merge by adding their bucket counts.
+class SizeSketch:
+    def __init__(self, relative_accuracy=0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.zero_count = 0
+        self.offset = 0
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    @property
+    def count(self):
+        return self.zero_count + int(self.counts.sum())
+
+    def _index(self, values):
+        return np.ceil(np.log(values) / self.log_gamma).astype(np.int64)
+
+    def _value(self, index):
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def _grow(self, low, high):
+        if not len(self.counts):
+            self.offset = low
+            self.counts = np.zeros(high - low + 1, dtype=np.int64)
+            return
+        new_low = min(low, self.offset)
+        new_high = max(high, self.offset + len(self.counts) - 1)
+        if new_low == self.offset and new_high == self.offset + len(self.counts) - 1:
+            return
+        counts = np.zeros(new_high - new_low + 1, dtype=np.int64)
+        counts[self.offset - new_low:self.offset - new_low + len(self.counts)] = self.counts
+        self.offset = new_low
+        self.counts = counts
+
+    def add(self, values):
+        values = np.asarray(values)
+        positive = values[values > 0]
+        self.zero_count += len(values) - len(positive)
+        if not len(positive):
+            return self
+        index = self._index(positive)
+        low, high = int(index.min()), int(index.max())
+        self._grow(low, high)
+        start = low - self.offset
+        self.counts[start:start + high - low + 1] += np.bincount(index - low, minlength=high - low + 1)
+        return self
+
+    def remove(self, values):
+        # Inverse of add() for values that were added before (live index updates)
+        values = np.asarray(values)
+        positive = values[values > 0]
+        self.zero_count -= len(values) - len(positive)
+        if len(positive):
+            index = self._index(positive) - self.offset
+            np.subtract.at(self.counts, index, 1)
+        return self
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        self.zero_count += other.zero_count
+        if len(other.counts):
+            self._grow(other.offset, other.offset + len(other.counts) - 1)
+            start = other.offset - self.offset
+            self.counts[start:start + len(other.counts)] += other.counts
+        return self
+
+    def to_dict(self):
+        # JSON-safe form; leading and trailing empty buckets are dropped
+        nonzero = np.flatnonzero(self.counts)
+        if len(nonzero):
+            low, high = int(nonzero[0]), int(nonzero[-1]) + 1
+        else:
+            low = high = 0
+        return {"relative_accuracy": self.relative_accuracy, "zero_count": self.zero_count,
+                "offset": self.offset + low, "counts": self.counts[low:high].tolist()}
+
+    @classmethod
+    def from_dict(cls, data):
+        sketch = cls(data["relative_accuracy"])
+        sketch.zero_count = int(data["zero_count"])
+        sketch.offset = int(data["offset"])
+        sketch.counts = np.asarray(data["counts"], dtype=np.int64)
+        return sketch
+
+    def quantile(self, q):
+        total = self.count
+        if not total:
+            return float("nan")
+        rank = q * (total - 1)
+        if rank < self.zero_count:
+            return 0.0
+        cumulative = np.cumsum(self.counts) + self.zero_count
+        bucket = int(np.searchsorted(cumulative, rank, side="right"))
+        return float(self._value(self.offset + bucket))
+
+    def cdf(self, value):
+        # Fraction of sizes <= value, to the bucket containing value
+        total = self.count
+        if not total:
+            return float("nan")
+        if value <= 0:
+            return self.zero_count / total
+        last = int(self._index(np.array([value]))[0]) - self.offset
+        return (self.zero_count + int(self.counts[:max(last + 1, 0)].sum())) / total
+
+    def top_sum(self, fraction):
+        # Approximate number of bytes held by the largest `fraction` of files
+        remaining = int(self.count * fraction)
+        total = 0.0
+        for bucket in range(len(self.counts) - 1, -1, -1):
+            if remaining <= 0:
+                break
+            taken = min(remaining, int(self.counts[bucket]))
+            total += taken * self._value(self.offset + bucket)
+            remaining -= taken
+        return total
+
+    def histogram(self):
+        # Bucket counts and their contiguous log-spaced edges (zero-size files excluded)
+        edges = self.gamma ** np.arange(self.offset - 1, self.offset + len(self.counts), dtype=np.float64)
+        return self.counts.copy(), edges
+
+    def cdf_curve(self):
+        # (bucket upper edge, fraction of sizes <= edge): the sketch's version of a sorted-size CDF
+        total = self.count
+        counts, edges = self.histogram()
+        if not total:
+            return edges[1:], np.zeros(len(counts))
+        return edges[1:], (self.zero_count + np.cumsum(counts)) / total
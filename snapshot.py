@@ -0,0 +1,106 @@
+import json
+import os
+import struct
+
+import numpy as np
+
+from scan_table import ScanTable
+
+# Binary columnar container:
+#   8 bytes magic | uint64 header length | JSON header | columns
+# The header carries the export summary and the dtype/shape/offset of every
+# column, and each column starts on a 64-byte boundary of the file so that it
+# can be viewed straight out of a read-only memory map without copying.
+MAGIC = b"FSASNAP1"
+ALIGN = 64
+SNAPSHOT_COLUMNS = ("size", "mtime", "ext_code", "path_pool", "path_offsets")
+DIRECTORY_COLUMNS = ("dir_id", "dir_parent", "dir_pool", "dir_offsets")
+
+
+def _align(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def is_snapshot(filepath):
+    try:
+        with open(filepath, 'rb') as f:
+            return f.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def write_columns(output_file, header, columns):
+    layout = {}
+    offset = 0
+    for name, arr in columns.items():
+        arr = np.ascontiguousarray(arr)
+        columns[name] = arr
+        layout[name] = {"dtype": arr.dtype.str, "shape": list(arr.shape), "offset": offset}
+        offset = _align(offset + arr.nbytes)
+
+    header_bytes = json.dumps(dict(header, columns=layout), ensure_ascii=False).encode("utf-8")
+    body_start = _align(len(MAGIC) + 8 + len(header_bytes))
+
+    with open(output_file, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<Q", len(header_bytes)))
+        f.write(header_bytes)
+        for name, arr in columns.items():
+            f.write(b"\0" * (body_start + layout[name]["offset"] - f.tell()))
+            f.write(arr.data)
+
+
+def _read_header(f, filepath):
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError(f"Not a snapshot file: {filepath}")
+    (length,) = struct.unpack("<Q", f.read(8))
+    header = json.loads(f.read(length).decode("utf-8"))
+    return header, _align(len(MAGIC) + 8 + length)
+
+
+def read_header(filepath):
+    # Only the header is read - the column data is never touched
+    with open(filepath, 'rb') as f:
+        return _read_header(f, filepath)[0]
+
+
+def read_columns(filepath):
+    with open(filepath, 'rb') as f:
+        header, body_start = _read_header(f, filepath)
+
+    data = np.memmap(filepath, dtype=np.uint8, mode='r')
+    columns = {}
+    for name, spec in header["columns"].items():
+        dtype = np.dtype(spec["dtype"])
+        count = int(np.prod(spec["shape"], dtype=np.int64))
+        start = body_start + spec["offset"]
+        columns[name] = data[start:start + count * dtype.itemsize].view(dtype).reshape(spec["shape"])
+    return header, columns
+
+
+def save_snapshot(file_data, output_file, export_data, root=None):
+    columns = {name: getattr(file_data, name) for name in SNAPSHOT_COLUMNS}
+    if file_data.allocated is not None:
+        columns["allocated"] = file_data.allocated
+    if file_data.dir_id is not None:
+        encoded = [os.fsencode(path) for path in file_data.dir_paths]
+        columns["dir_id"] = file_data.dir_id
+        columns["dir_parent"] = file_data.dir_parent
+        columns["dir_pool"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+        columns["dir_offsets"] = np.cumsum([0] + [len(path) for path in encoded], dtype=np.int64)
+    write_columns(output_file, {"format": "fsa-snapshot", "version": 1, "root": root, "export": export_data,
+                                "extensions": list(file_data.extensions)}, columns)
+
+
+def load_snapshot(filepath):
+    # Returns the header and a ScanTable whose columns are views into a read-only mmap
+    header, columns = read_columns(filepath)
+    table = ScanTable(columns["size"], columns["mtime"], columns["ext_code"], header["extensions"],
+                      columns["path_pool"], columns["path_offsets"], allocated=columns.get("allocated"))
+    if all(name in columns for name in DIRECTORY_COLUMNS):
+        pool = columns["dir_pool"].tobytes()
+        offsets = columns["dir_offsets"].tolist()
+        table.dir_id = columns["dir_id"]
+        table.dir_parent = columns["dir_parent"]
+        table.dir_paths = [os.fsdecode(pool[offsets[i]:offsets[i + 1]]) for i in range(len(offsets) - 1)]
+    return header, table
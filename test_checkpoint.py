@@ -0,0 +1,116 @@
+import os
+
+import pytest
+
+import main
+import scanner
+from create_test_folder import generate_tree
+from scanner import scan_files
+
+LINK_DIR = os.path.join("dir_003", "dir_003")
+
+
+def _make_tree(base):
+    # 21 directories with real (non-sparse) files, plus hard links from the root
+    # (always listed first) into LINK_DIR, so a scan resumed before LINK_DIR must
+    # remember the inodes it already charged
+    manifest = generate_tree(os.path.join(base, "tree"), num_files=210, depth=2, fanout=4,
+                             sizes=lambda rng: rng.randint(1, 20000), sparse=False, seed=3)
+    root = manifest["path"]
+    for name in sorted(entry.name for entry in os.scandir(root) if entry.is_file())[:3]:
+        os.link(os.path.join(root, name), os.path.join(root, LINK_DIR, "link_" + name))
+    return root
+
+
+def _rows(table):
+    return list(zip(table.paths(), table.size.tolist(), table.mtime.tolist(), table.allocated.tolist()))
+
+
+def _interrupt(root, checkpoint_path, monkeypatch, after):
+    # Flushes after every directory and dies when it is about to list directory
+    # number `after` + 1, or the directory `after` when it is a path
+    listed = []
+    scan_directory = scanner._scan_directory
+
+    def dying(dir_path, out, scan_filter):
+        if len(listed) == after or dir_path == after:
+            raise KeyboardInterrupt
+        listed.append(dir_path)
+        return scan_directory(dir_path, out, scan_filter)
+
+    with monkeypatch.context() as patch:
+        patch.setattr(scanner, "_scan_directory", dying)
+        with pytest.raises(KeyboardInterrupt):
+            scan_files(root, checkpoint_path=checkpoint_path, checkpoint_interval=0)
+    assert os.path.exists(checkpoint_path)
+
+
+def _reference(root, tmp_path):
+    checkpoint_path = str(tmp_path / "reference.ckpt")
+    table = scan_files(root, checkpoint_path=checkpoint_path, checkpoint_interval=0)
+    assert not os.path.exists(checkpoint_path)
+    return _rows(table)
+
+
+@pytest.mark.parametrize("after", [1, 8, 20, LINK_DIR])
+def test_resumed_scan_equals_uninterrupted_scan(tmp_path, monkeypatch, after):
+    root = _make_tree(str(tmp_path))
+    if after == LINK_DIR:
+        after = os.path.join(root, LINK_DIR)
+    reference = _reference(root, tmp_path)
+    assert len(reference) == 213
+    # The three links were charged to their first path, not again to the second
+    assert sum(allocated == 0 for *_, allocated in reference) == 3
+
+    checkpoint_path = str(tmp_path / "scan.ckpt")
+    _interrupt(root, checkpoint_path, monkeypatch, after)
+    resumed = scan_files(root, checkpoint_path=checkpoint_path, resume=True, checkpoint_interval=0)
+
+    assert _rows(resumed) == reference
+    assert not os.path.exists(checkpoint_path)
+
+
+@pytest.mark.parametrize("tail", ["torn", "garbage"])
+def test_damaged_tail_is_cut_off(tmp_path, monkeypatch, tail):
+    root = _make_tree(str(tmp_path))
+    reference = _reference(root, tmp_path)
+
+    checkpoint_path = str(tmp_path / "scan.ckpt")
+    _interrupt(root, checkpoint_path, monkeypatch, 8)
+    if tail == "torn":
+        # The last PART record loses its end and fails its CRC; its directories
+        # are still in the frontier of the record before it
+        os.truncate(checkpoint_path, os.path.getsize(checkpoint_path) - 5)
+    else:
+        with open(checkpoint_path, "ab") as f:
+            f.write(b"PART\xff\xff\x00\x00partial")
+    resumed = scan_files(root, checkpoint_path=checkpoint_path, resume=True, checkpoint_interval=0)
+
+    assert _rows(resumed) == reference
+    assert not os.path.exists(checkpoint_path)
+
+
+def test_without_resume_the_checkpoint_starts_over(tmp_path, monkeypatch):
+    root = _make_tree(str(tmp_path))
+    reference = _reference(root, tmp_path)
+
+    checkpoint_path = str(tmp_path / "scan.ckpt")
+    _interrupt(root, checkpoint_path, monkeypatch, 8)
+    assert _rows(scan_files(root, checkpoint_path=checkpoint_path, checkpoint_interval=0)) == reference
+    assert not os.path.exists(checkpoint_path)
+
+
+def test_checkpoint_of_another_root_is_reported(tmp_path, monkeypatch, capsys):
+    root = _make_tree(str(tmp_path))
+    other = tmp_path / "other"
+    other.mkdir()
+    checkpoint_path = str(tmp_path / "scan.ckpt")
+    _interrupt(root, checkpoint_path, monkeypatch, 8)
+
+    with pytest.raises(ValueError, match="belongs to a scan of"):
+        scan_files(str(other), checkpoint_path=checkpoint_path, resume=True)
+    capsys.readouterr()
+    assert main.main([str(other), "--checkpoint", checkpoint_path, "--resume", "--format", "none"]) == 1
+    assert f"Cannot resume: Checkpoint {checkpoint_path} belongs to a scan of {root}" in capsys.readouterr().out
+    # The interrupted scan can still be resumed
+    assert os.path.exists(checkpoint_path)
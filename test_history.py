@@ -0,0 +1,28 @@
+import os
+
+from history import SnapshotHistory
+from scanner import scan_files
+
+
+def _make_tree(base):
+    os.makedirs(os.path.join(base, "x", "sub"))
+    for name, size in (("a.txt", 10), ("b.wav", 200), (os.path.join("sub", "c.txt"), 3000)):
+        with open(os.path.join(base, "x", name), "wb") as f:
+            f.write(b"\0" * size)
+
+
+def test_same_tree_with_differently_spelled_roots(tmp_path, monkeypatch):
+    _make_tree(tmp_path)
+    monkeypatch.chdir(tmp_path)
+    with SnapshotHistory(str(tmp_path / "store")) as history:
+        history.append(scan_files("./x"), "./x", taken_at=1000.0)
+        history.append(scan_files("x"), "x", taken_at=2000.0)
+        first, second = history.snapshots()
+
+        assert first["added"] == 3
+        assert (second["added"], second["removed"], second["resized"], second["touched"]) == (0, 0, 0, 0)
+        assert [row[2] for row in history.path_history("sub/c.txt")] == ["added"]
+        assert [row[2] for row in history.path_history("./sub/c.txt")] == ["added"]
+        assert [point[2] for point in history.totals_trend()] == [3210, 3210]
+        assert [point[2] for point in history.extension_trend(".txt")] == [3010, 3010]
+        assert [point[2] for point in history.directory_trend("sub")] == [3000, 3000]
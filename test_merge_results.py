@@ -0,0 +1,78 @@
+import json
+
+import numpy as np
+import pytest
+
+from aggregate import summarize
+from create_test_folder import generate_tree
+from export_results import export_to_json
+from merge_results import build_merged_export, load_partial, merge_files, merge_partials
+from scanner import scan_files
+
+EXACT_FIELDS = ("total_files", "total_size", "total_allocated", "min_size", "max_size",
+                "ext_counts", "ext_sizes", "ext_allocated", "year_counts")
+
+
+def _assert_equals_one_pass(merged, table):
+    expected = summarize(table)
+    for name in EXACT_FIELDS:
+        assert getattr(merged, name) == getattr(expected, name), name
+    # Chan's pairwise moments agree with the one-pass moments up to rounding
+    assert merged.mean_size == pytest.approx(float(table.size.mean()), rel=1e-12)
+    assert merged.std_size == pytest.approx(float(table.size.std()), rel=1e-9)
+    assert merged.mean_size == pytest.approx(expected.mean_size, rel=1e-12)
+    assert merged.m2_size == pytest.approx(expected.m2_size, rel=1e-9)
+
+    # Equal sizes may be listed in either order, so only the sizes must match
+    assert [size for size, _ in merged.largest] == [size for size, _ in expected.largest]
+    assert set(merged.largest) <= set(zip(table.size.tolist(), table.paths()))
+
+    # The sketches add bucket by bucket: identical to the one-pass sketch, and
+    # within its relative accuracy of the exact quantiles
+    assert merged.sketch.count == len(table)
+    sizes = np.sort(table.size)
+    for q in (0.1, 0.5, 0.9, 0.99):
+        assert merged.sketch.quantile(q) == expected.sketch.quantile(q)
+        exact = sizes[int(q * (len(sizes) - 1))]
+        assert abs(merged.sketch.quantile(q) - exact) <= merged.sketch.relative_accuracy * exact
+
+
+@pytest.fixture(scope="module")
+def shards(tmp_path_factory):
+    # One tree in two parts with different size and extension mixes, scanned
+    # separately and as a whole
+    root = tmp_path_factory.mktemp("merge")
+    generate_tree(str(root / "a"), num_files=3000, depth=2, fanout=4, sizes="lognormal", seed=1)
+    generate_tree(str(root / "b"), num_files=2000, depth=2, fanout=3, sizes="pareto", extensions="source", seed=2)
+    return str(root), [scan_files(str(root / "a")), scan_files(str(root / "b"))]
+
+
+def test_merged_partials_equal_one_pass_summary(shards):
+    root, tables = shards
+    merged, sources = merge_partials((summarize(table), [{"hostname": str(i)}]) for i, table in enumerate(tables))
+    assert [source["hostname"] for source in sources] == ["0", "1"]
+    _assert_equals_one_pass(merged, scan_files(root))
+
+
+def test_merge_is_order_independent_through_exports(shards, tmp_path):
+    root, tables = shards
+    paths = []
+    for i, table in enumerate(tables):
+        paths.append(str(tmp_path / f"shard{i}.json"))
+        export_to_json(summarize(table), paths[-1])
+    whole = scan_files(root)
+
+    for order in (paths, paths[::-1]):
+        merged, _ = merge_files(order, workers=1)
+        _assert_equals_one_pass(merged, whole)
+    # One process per input, folded again in the parent
+    merged, sources = merge_files(paths, workers=2)
+    _assert_equals_one_pass(merged, whole)
+
+    # The merged export is itself a partial summary, with both sources
+    merged_path = str(tmp_path / "merged.json")
+    with open(merged_path, "w", encoding="utf-8") as f:
+        json.dump(build_merged_export(merged, sources), f)
+    summary, sources = load_partial(merged_path)
+    assert len(sources) == 2
+    _assert_equals_one_pass(summary, whole)
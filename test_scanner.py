@@ -0,0 +1,22 @@
+import scanner
+from create_test_folder import generate_tree
+from scanner import scan_files
+
+
+def test_parallel_engine_stops_listing_at_max_files(tmp_path, monkeypatch):
+    manifest = generate_tree(str(tmp_path / "tree"), num_files=4000, depth=3, fanout=6, seed=1)
+    listed = []
+    scan_directory = scanner._scan_directory
+
+    def counting(dir_path, out, scan_filter):
+        listed.append(dir_path)
+        return scan_directory(dir_path, out, scan_filter)
+
+    monkeypatch.setattr(scanner, "_scan_directory", counting)
+    table = scan_files(manifest["path"], max_files=50, engine="parallel", workers=4)
+
+    assert len(table) == 50
+    # About 15 files per directory: four directories reach the limit, and each
+    # worker finishes at most the one listing it had started
+    assert manifest["directories"] == 259
+    assert len(listed) <= 4 + 4
@@ -0,0 +1,46 @@
+import os
+
+from scanner import scan_files
+from search_index import SearchIndex, build_search_index
+
+
+def _index(tmp_path, names):
+    folder = tmp_path / "tree"
+    folder.mkdir()
+    for name in names:
+        with open(folder / name, "wb") as f:
+            f.write(b"\0" * 10)
+    index_file = str(tmp_path / "tree.fsidx")
+    build_search_index(scan_files(str(folder)), index_file, root=str(folder))
+    return SearchIndex(index_file)
+
+
+def _names(results):
+    return sorted(os.path.basename(path) for path, _, _ in results)
+
+
+def test_multi_dot_suffix_is_not_an_extension_lookup(tmp_path):
+    index = _index(tmp_path, ["a.tar.gz", "b.gz", "c.txt"])
+    assert _names(index.query(name="*.tar.gz")) == ["a.tar.gz"]
+    assert _names(index.query(name="*.gz")) == ["a.tar.gz", "b.gz"]
+    assert _names(index.query(name="*.zip")) == []
+
+
+def test_non_ascii_names_match_case_insensitively(tmp_path):
+    index = _index(tmp_path, ["Ébc.txt", "ébd.txt", "ABC.txt"])
+    assert _names(index.query(name="ébc*")) == ["Ébc.txt"]
+    assert _names(index.query(name="*ÉBC*")) == ["Ébc.txt"]
+    assert _names(index.query(name="abc*")) == ["ABC.txt"]
+
+
+def test_empty_folder(tmp_path):
+    index = _index(tmp_path, [])
+    assert _names(index.query(name="*.txt")) == []
+    assert _names(index.query(name="*abc*")) == []
+    assert _names(index.query(min_size=1)) == []
+
+
+def test_names_too_short_for_trigrams(tmp_path):
+    index = _index(tmp_path, ["ab", "c"])
+    assert _names(index.query(name="ab")) == ["ab"]
+    assert _names(index.query(name="*abc*")) == []
@@ -0,0 +1,119 @@
+import os
+
+from aggregate import summarize
+from scanner import allocation, scan_files
+from watcher import LiveIndex
+
+
+def _write(path, size):
+    with open(path, "wb") as f:
+        f.write(b"\1" * size)
+
+
+def _sync(index, *paths):
+    # What the watcher does for the paths an event names: stat and upsert, or remove
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            index.remove(path)
+        else:
+            index.upsert(path, st.st_size, st.st_mtime, *allocation(st))
+    index.flush()
+
+
+def _by_inode(table):
+    # Allocated bytes per inode: links must be charged once between them, whichever path holds it
+    charged = {}
+    for path, allocated in zip(table.paths(), table.allocated.tolist()):
+        st = os.stat(path)
+        key = (st.st_dev, st.st_ino)
+        charged[key] = charged.get(key, 0) + allocated
+    return charged
+
+
+def _assert_matches_rescan(index, root):
+    live, fresh = index.table(), scan_files(root)
+    assert sorted(zip(live.paths(), live.size.tolist(), live.mtime.tolist())) == \
+        sorted(zip(fresh.paths(), fresh.size.tolist(), fresh.mtime.tolist()))
+    assert _by_inode(live) == _by_inode(fresh)
+
+    summary, expected = index.current_summary(), summarize(fresh)
+    for name in ("total_files", "total_size", "total_allocated", "min_size", "max_size", "ext_counts", "ext_sizes"):
+        assert getattr(summary, name) == getattr(expected, name), name
+    # Links tie on size, and ties may be listed in either order
+    assert sorted(summary.largest) == sorted(expected.largest)
+
+
+def test_live_index_follows_links_like_a_rescan(tmp_path):
+    root = str(tmp_path)
+    os.mkdir(tmp_path / "d")
+    for i in range(10):
+        _write(tmp_path / "d" / f"f{i}.bin", 5000 + 1000 * i)
+    # Link pairs that already exist when the base table is scanned
+    os.link(tmp_path / "d" / "f9.bin", tmp_path / "seed_link.bin")
+    os.link(tmp_path / "d" / "f7.bin", tmp_path / "seed_link7.bin")
+    os.link(tmp_path / "d" / "f6.bin", tmp_path / "seed_link6.bin")
+    index = LiveIndex(scan_files(root))
+    _assert_matches_rescan(index, root)
+
+    d = os.path.join(root, "d")
+    new, other = os.path.join(root, "new.txt"), os.path.join(root, "other.dat")
+    _write(new, 9000)
+    _sync(index, new)
+    _assert_matches_rescan(index, root)
+
+    # Links to a scanned file (another directory and extension) and to a new file
+    os.link(os.path.join(d, "f0.bin"), other)
+    os.link(new, os.path.join(d, "new_link.txt"))
+    _sync(index, other, os.path.join(d, "new_link.txt"))
+    _assert_matches_rescan(index, root)
+
+    # A linked file grows through one of its paths: every link changes
+    with open(new, "ab") as f:
+        f.write(b"\2" * 20000)
+    _sync(index, new)
+    _assert_matches_rescan(index, root)
+
+    # Unlinking the path holding the charge moves it to the remaining link
+    for path in (os.path.join(d, "f0.bin"), os.path.join(root, "seed_link.bin"), os.path.join(d, "f9.bin")):
+        os.remove(path)
+        _sync(index, path)
+        _assert_matches_rescan(index, root)
+
+    # Seed links never seen since: one grows through a single path, the other
+    # pair has both paths replaced by a new file
+    with open(os.path.join(d, "f7.bin"), "ab") as f:
+        f.write(b"\2" * 3000)
+    _sync(index, os.path.join(d, "f7.bin"))
+    _assert_matches_rescan(index, root)
+    for path in (os.path.join(d, "f6.bin"), os.path.join(root, "seed_link6.bin")):
+        _write(path + ".tmp", 4000)
+        os.replace(path + ".tmp", path)
+        _sync(index, path)
+        _assert_matches_rescan(index, root)
+
+    # Renamed over by a new link, and plain files removed (the largest among them)
+    os.rename(os.path.join(d, "f1.bin"), os.path.join(d, "moved.bin"))
+    os.link(os.path.join(d, "moved.bin"), os.path.join(d, "f1.bin"))
+    os.remove(os.path.join(d, "f8.bin"))
+    _sync(index, os.path.join(d, "f1.bin"), os.path.join(d, "moved.bin"), os.path.join(d, "f8.bin"))
+    _assert_matches_rescan(index, root)
+
+    # The last link of a new file goes away
+    os.remove(new)
+    os.remove(os.path.join(d, "new_link.txt"))
+    _sync(index, new, os.path.join(d, "new_link.txt"))
+    _assert_matches_rescan(index, root)
+
+
+def test_create_and_replace_in_one_batch(tmp_path):
+    root = str(tmp_path)
+    _write(tmp_path / "a.bin", 100)
+    index = LiveIndex(scan_files(root))
+    # The first version is seen but replaced before the batch is flushed
+    path = os.path.join(root, "x.zzz")
+    index.upsert(path, 10, 1.0, 4096)
+    _write(path, 20)
+    _sync(index, path)
+    _assert_matches_rescan(index, root)
@@ -0,0 +1,496 @@
+import ctypes
+import ctypes.util
+import datetime
+import os
+import select
+import stat
+import struct
+import sys
+import time
+
+import numpy as np
+
+from aggregate import summarize
+from scan_table import ScanTable, ScanTableBuilder
+from scanner import DEFAULT_FILTER, _child_dirs, _list_directory, allocation, scan_files
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+IN_DONT_FOLLOW = 0x02000000
+IN_EXCL_UNLINK = 0x04000000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE |
+              IN_ONLYDIR | IN_DONT_FOLLOW | IN_EXCL_UNLINK)
+EVENT_HEADER = struct.Struct("iIII")
+READ_BYTES = 1 << 16
+COMPACT_FRACTION = 0.25
+
+
+# Scan result kept current under file changes. Rows live in the seed ScanTable
+# plus an append-only overlay; a change tombstones the old row and appends the
+# new one, and compaction folds both back into one table once enough rows are
+# dead or appended. The ScanSummary is updated with each batch of changes, so
+# reports and exports read it without touching the rows.
+# Hard links follow the scanners' rule: an inode's blocks are charged to one of
+# its live paths and every other link gets allocated = 0. The seed table does
+# not keep inodes, so the first time a linked inode shows up, the live rows of
+# the same size and mtime (all links share both) are stat'ed to find its other
+# paths; from then on the links are tracked by path. Likewise, when a seed row
+# holding a charge is removed or replaced before its inode was ever seen, the
+# uncharged seed rows of the same size and mtime are stat'ed again.
+class LiveIndex:
+    def __init__(self, table, top_k=20, relative_accuracy=0.01):
+        self.top_k = top_k
+        self.summary = summarize(table, top_k, relative_accuracy)
+        self._extremes_stale = False
+        # (st_dev, st_ino) -> [allocated bytes, charged path, linked paths]; path -> (st_dev, st_ino)
+        self.links = {}
+        self.link_of = {}
+        self._reset(table)
+
+    def _reset(self, table):
+        self.base = table
+        self.overlay = ScanTableBuilder()
+        self.alive = bytearray(b"\1") * len(table)
+        self.row_of = {}
+        self.dir_files = {}
+        for row, path in enumerate(table.paths()):
+            self.row_of[path] = row
+            dir_path, _, name = path.rpartition(os.sep)
+            self.dir_files.setdefault(dir_path, set()).add(name)
+        self.added = ScanTableBuilder()
+        self.removed = ScanTableBuilder()
+        self._table = table
+        # Rows the seed scan left at allocated = 0: other links of a charged inode (or sparse files)
+        self.uncharged = np.nonzero((table.allocated_or_size() == 0) & (table.size > 0))[0]
+
+    def __len__(self):
+        return len(self.row_of)
+
+    def _row(self, row):
+        # (size, mtime, extension, allocated) of a row in the base table or the overlay
+        if row < len(self.base):
+            return (int(self.base.size[row]), float(self.base.mtime[row]), self.base.extension(row),
+                    int(self.base.allocated_or_size()[row]))
+        i = row - len(self.base)
+        extensions = list(self.overlay.ext_index)
+        return (self.overlay.sizes[i], self.overlay.mtimes[i], extensions[self.overlay.ext_codes[i]],
+                self.overlay.allocated[i])
+
+    def _path(self, row):
+        if row < len(self.base):
+            return self.base.path(row)
+        i = row - len(self.base)
+        offsets = self.overlay.path_offsets
+        return os.fsdecode(bytes(self.overlay.path_pool[offsets[i]:offsets[i + 1]]))
+
+    def _drop(self, path, row):
+        size, mtime, extension, allocated = self._row(row)
+        self.alive[row] = 0
+        self.removed.append(path, size, mtime, extension, allocated)
+
+    def upsert(self, path, size, mtime, allocated=None, inode=None):
+        # inode: (st_dev, st_ino) of a file with other links, as scanner.allocation() reports it
+        seed_key = self._seed_charge(path, self.row_of.get(path))
+        changed = self._upsert(path, size, mtime, allocated, inode)
+        if changed and seed_key:
+            self._recharge(*seed_key)
+        return changed
+
+    def _upsert(self, path, size, mtime, allocated, inode):
+        if self.link_of.get(path) not in (None, inode):
+            self._unlink(path)
+        if inode is None:
+            return self._put(path, size, mtime, allocated)
+        group = self.links.get(inode)
+        if group is None:
+            group = self.links[inode] = [allocated, None, set()]
+            # Other links have the new size and mtime, or still the old ones when the
+            # change was made through this path
+            keys = {(size, mtime)}
+            if path in self.row_of:
+                keys.add(self._row(self.row_of[path])[:2])
+            self._find_links(path, keys, inode, group)
+        group[0] = allocated
+        group[2].add(path)
+        self.link_of[path] = inode
+        if group[1] is None:
+            group[1] = path
+        # The links share one inode: bring every row up to date, charging only one
+        changed = False
+        for link in group[2]:
+            changed |= self._put(link, size, mtime, allocated if link == group[1] else 0)
+        return changed
+
+    def _find_links(self, path, keys, inode, group):
+        base = self.base
+        sizes = np.frombuffer(self.overlay.sizes, dtype=np.int64)
+        mtimes = np.frombuffer(self.overlay.mtimes, dtype=np.float64)
+        rows = []
+        for size, mtime in keys:
+            rows += np.nonzero((base.size == size) & (base.mtime == mtime))[0].tolist()
+            if len(self.overlay):
+                rows += (np.nonzero((sizes == size) & (mtimes == mtime))[0] + len(base)).tolist()
+        for row in rows:
+            if not self.alive[row]:
+                continue
+            other = self._path(row)
+            if other == path or self.row_of.get(other) != row:
+                continue
+            try:
+                st = os.stat(other)
+            except OSError:
+                continue
+            if (st.st_dev, st.st_ino) == inode:
+                group[2].add(other)
+                self.link_of[other] = inode
+                # Keep the charge where the scan put it
+                if group[1] is None and self._row(row)[3]:
+                    group[1] = other
+
+    def _seed_charge(self, path, row):
+        # (size, mtime) of a seed row that holds a charge for an inode not tracked yet
+        if row is None or row >= len(self.base) or path in self.link_of:
+            return None
+        size, mtime, _, allocated = self._row(row)
+        return (size, mtime) if allocated else None
+
+    def _recharge(self, size, mtime):
+        # The seed row charged for an inode is gone: its other links are among the
+        # uncharged seed rows with its size and mtime, and a fresh stat brings them
+        # up to date, charging one of them if the inode lives on
+        base = self.base
+        rows = self.uncharged[(base.size[self.uncharged] == size) & (base.mtime[self.uncharged] == mtime)]
+        for row in rows.tolist():
+            other = base.path(row)
+            if not self.alive[row] or self.row_of.get(other) != row or other in self.link_of:
+                continue
+            try:
+                st = os.stat(other)
+            except OSError:
+                continue
+            self.upsert(other, st.st_size, st.st_mtime, *allocation(st))
+
+    def _unlink(self, path):
+        # path no longer names the inode: move the charge to another live link if it held it
+        inode = self.link_of.pop(path)
+        group = self.links[inode]
+        group[2].discard(path)
+        if not group[2]:
+            del self.links[inode]
+        elif group[1] == path:
+            group[1] = next(iter(group[2]))
+            size, mtime, _, _ = self._row(self.row_of[group[1]])
+            self._put(group[1], size, mtime, group[0])
+
+    def _put(self, path, size, mtime, allocated):
+        row = self.row_of.get(path)
+        if row is not None:
+            old_size, old_mtime, _, old_allocated = self._row(row)
+            if old_size == size and old_mtime == mtime and (allocated is None or old_allocated == allocated):
+                return False
+            self._drop(path, row)
+        dir_path, _, name = path.rpartition(os.sep)
+        extension = os.path.splitext(name)[1].lower()
+        self.row_of[path] = len(self.alive)
+        self.alive.append(1)
+        self.overlay.enter_directory(dir_path)
+        self.overlay.append(path, size, mtime, extension, allocated)
+        self.added.append(path, size, mtime, extension, allocated)
+        self.dir_files.setdefault(dir_path, set()).add(name)
+        return True
+
+    def remove(self, path):
+        row = self.row_of.pop(path, None)
+        if row is None:
+            return False
+        seed_key = self._seed_charge(path, row)
+        self._drop(path, row)
+        if path in self.link_of:
+            self._unlink(path)
+        elif seed_key:
+            self._recharge(*seed_key)
+        dir_path, _, name = path.rpartition(os.sep)
+        names = self.dir_files.get(dir_path)
+        if names is not None:
+            names.discard(name)
+            if not names:
+                del self.dir_files[dir_path]
+        return True
+
+    def flush(self):
+        # Apply the changes since the last flush to the summary, as two small tables.
+        # Additions go first: a path created and replaced within one batch has its
+        # first version in both tables, and it can only be removed once it was added.
+        removed = self.removed.build()
+        added = self.added.build()
+        if not removed and not added:
+            return 0
+        summary = self.summary
+        summary.update(added)
+        if removed:
+            limit = summary.largest[-1][0] if len(summary.largest) == summary.top_k else 0
+            if int(removed.size.max()) >= limit or int(removed.size.min()) <= (summary.min_size or 0):
+                self._extremes_stale = True
+            summary.remove(removed)
+        self.added = ScanTableBuilder()
+        self.removed = ScanTableBuilder()
+        self._table = None
+        if len(self.alive) - len(self.row_of) + len(self.overlay) > COMPACT_FRACTION * max(len(self.base), 1):
+            self._reset(self.table())
+        return len(added) + len(removed)
+
+    def table(self):
+        # The live rows as one ScanTable (materialized once per batch of changes)
+        if self._table is None:
+            combined = ScanTable.concat([self.base, self.overlay.build()])
+            self._table = combined.take(np.nonzero(np.frombuffer(bytes(self.alive), dtype=np.uint8))[0])
+        return self._table
+
+    def current_summary(self):
+        if self._extremes_stale:
+            # A removal touched min/max or the largest files: refill them from the live rows
+            fresh = summarize(self.table(), self.summary.top_k, self.summary.sketch.relative_accuracy)
+            self.summary.min_size = fresh.min_size
+            self.summary.max_size = fresh.max_size
+            self.summary.largest = fresh.largest
+            self._extremes_stale = False
+        return self.summary
+
+
+class Inotify:
+    def __init__(self):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+    def add_watch(self, path, mask=WATCH_MASK):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed: {path}")
+        return wd
+
+    def rm_watch(self, wd):
+        self.libc.inotify_rm_watch(self.fd, wd)
+
+    def read(self, timeout=None):
+        # [(wd, mask, name)] for everything queued, waiting up to timeout seconds
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        events = []
+        while True:
+            try:
+                data = os.read(self.fd, READ_BYTES)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+                offset += length
+                events.append((wd, mask, name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+# Watch mode: one scan_files pass seeds a LiveIndex, then inotify events keep it
+# current. Events only mark paths dirty; each batch is reconciled against the
+# filesystem (a stat for files, a listing for directories), so event order,
+# renames and create-then-delete sequences need no special cases. On a queue
+# overflow only the watched directories whose mtime changed are re-listed.
+class Watcher:
+    def __init__(self, root, scan_filter=None, engine="walk", workers=None, relative_accuracy=0.01):
+        self.root = os.path.normpath(root)
+        self.scan_filter = (scan_filter or DEFAULT_FILTER).bind(self.root)
+        self.inotify = Inotify()
+        self.watches = {}
+        self.watched = {}
+        self.subdirs = {}
+        self.stats = {"events": 0, "batches": 0, "overflows": 0, "rescanned_dirs": 0}
+
+        started = time.time()
+        table = scan_files(self.root, engine=engine, workers=workers, scan_filter=scan_filter)
+        self.index = LiveIndex(table, relative_accuracy=relative_accuracy)
+        for dir_path in sorted(table.dir_paths or [self.root], key=len):
+            self._watch(dir_path)
+        # Directories that changed while the seed scan ran are listed again now that they are watched
+        for dir_path, (_, mtime_ns) in list(self.watched.items()):
+            if mtime_ns >= started * 1e9:
+                self._sync_dir(dir_path)
+        self.index.flush()
+
+    def _watch(self, dir_path):
+        try:
+            mtime_ns = os.stat(dir_path).st_mtime_ns
+            wd = self.inotify.add_watch(dir_path)
+        except OSError as e:
+            print(f"\nCannot watch {dir_path}: {e}")
+            return False
+        self.watches[wd] = dir_path
+        self.watched[dir_path] = (wd, mtime_ns)
+        parent = os.path.dirname(dir_path)
+        if dir_path != self.root:
+            self.subdirs.setdefault(parent, set()).add(dir_path)
+        return True
+
+    def _forget_subtree(self, dir_path):
+        for child in list(self.subdirs.pop(dir_path, ())):
+            self._forget_subtree(child)
+        watch = self.watched.pop(dir_path, None)
+        if watch:
+            self.watches.pop(watch[0], None)
+            self.inotify.rm_watch(watch[0])
+        self.subdirs.get(os.path.dirname(dir_path), set()).discard(dir_path)
+        for name in list(self.index.dir_files.get(dir_path, ())):
+            self.index.remove(os.path.join(dir_path, name))
+
+    def _sync_dir(self, dir_path):
+        # Make the index agree with one directory listing; returns its (filtered) subdirectories
+        try:
+            mtime_ns = os.stat(dir_path).st_mtime_ns
+        except OSError:
+            mtime_ns = None
+        listing = _list_directory(dir_path, self.scan_filter) if mtime_ns is not None else None
+        if listing is None:
+            self._forget_subtree(dir_path)
+            return []
+        files, subdirs = listing
+        present = set()
+        for name, size, mtime, allocated, inode in files:
+            present.add(name)
+            self.index.upsert(os.path.join(dir_path, name), size, mtime, allocated, inode)
+        for name in self.index.dir_files.get(dir_path, set()) - present:
+            self.index.remove(os.path.join(dir_path, name))
+        if dir_path in self.watched:
+            self.watched[dir_path] = (self.watched[dir_path][0], mtime_ns)
+        children = _child_dirs(dir_path, subdirs, self.scan_filter)
+        for gone in self.subdirs.get(dir_path, set()) - set(children):
+            self._forget_subtree(gone)
+        self.stats["rescanned_dirs"] += 1
+        return children
+
+    def _sync_subtree(self, dir_path):
+        if dir_path != self.root and not (os.path.isdir(dir_path) and not os.path.islink(dir_path)
+                                          and self.scan_filter.keep_dir(dir_path)):
+            self._forget_subtree(dir_path)
+            return
+        stack = [dir_path]
+        while stack:
+            current = stack.pop()
+            if current not in self.watched and not self._watch(current):
+                continue
+            stack.extend(self._sync_dir(current))
+
+    def _sync_file(self, path):
+        # Same rules as the scanners: stat follows symlinks, anything but a directory is a file
+        try:
+            st = os.stat(path)
+        except OSError:
+            self.index.remove(path)
+            return
+        dir_path, _, name = path.rpartition(os.sep)
+        if not stat.S_ISDIR(st.st_mode) and self.scan_filter.keep_name(dir_path, name) and \
+                self.scan_filter.keep_stat(st.st_size, st.st_mtime):
+            self.index.upsert(path, st.st_size, st.st_mtime, *allocation(st))
+        else:
+            self.index.remove(path)
+
+    def _recover_overflow(self):
+        # The kernel dropped events: re-list only the directories whose mtime moved
+        self.stats["overflows"] += 1
+        for dir_path, (_, mtime_ns) in list(self.watched.items()):
+            try:
+                changed = os.stat(dir_path).st_mtime_ns != mtime_ns
+            except OSError:
+                changed = True
+            if changed and dir_path in self.watched:
+                self._sync_subtree(dir_path)
+
+    def poll(self, timeout=None):
+        # Wait for events, apply them, return how many index rows changed
+        events = self.inotify.read(timeout)
+        if not events:
+            return 0
+        dirty_dirs = set()
+        dirty_files = set()
+        overflow = False
+        for wd, mask, name in events:
+            if mask & IN_Q_OVERFLOW:
+                overflow = True
+                continue
+            if mask & IN_IGNORED:
+                dir_path = self.watches.pop(wd, None)
+                if dir_path and self.watched.get(dir_path, (None,))[0] == wd:
+                    del self.watched[dir_path]
+                continue
+            dir_path = self.watches.get(wd)
+            if dir_path is None or not name:
+                continue
+            path = os.path.join(dir_path, name)
+            if mask & IN_ISDIR:
+                dirty_dirs.add(path)
+            else:
+                dirty_files.add(path)
+
+        if overflow:
+            self._recover_overflow()
+        for dir_path in sorted(dirty_dirs, key=len):
+            self._sync_subtree(dir_path)
+        for path in dirty_files:
+            self._sync_file(path)
+        self.stats["events"] += len(events)
+        self.stats["batches"] += 1
+        return self.index.flush()
+
+    def close(self):
+        self.inotify.close()
+
+
+def print_status(watcher):
+    summary = watcher.index.current_summary()
+    top = ", ".join(f"{ext}: {size / (1024 * 1024):.1f} MB" for ext, size, _ in summary.extension_sizes()[:5])
+    print(f"[{datetime.datetime.now().strftime('%H:%M:%S')}] {summary.total_files:,} files, "
+          f"{summary.total_size / (1024 * 1024 * 1024):.2f} GB | {watcher.stats['events']:,} events, "
+          f"{watcher.stats['overflows']} overflows | {top}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python watcher.py <folder> [--interval SECONDS] [--export results.json]")
+        sys.exit(1)
+    options = dict(zip(sys.argv[2::2], sys.argv[3::2]))
+    interval = float(options.get("--interval", 10))
+    export_file = options.get("--export")
+
+    watcher = Watcher(sys.argv[1])
+    print(f"\nWatching {len(watcher.watched):,} directories under {watcher.root} (Ctrl-C to stop)")
+    try:
+        next_report = time.monotonic()
+        while True:
+            watcher.poll(max(next_report - time.monotonic(), 0))
+            if time.monotonic() >= next_report:
+                print_status(watcher)
+                if export_file:
+                    from export_results import export_to_json
+                    export_to_json(watcher.index.current_summary(), export_file)
+                next_report = time.monotonic() + interval
+    except KeyboardInterrupt:
+        print("\nStopped.")
+    finally:
+        watcher.close()